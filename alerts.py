@@ -0,0 +1,74 @@
+# Price alert delivery for bot.py.
+# The economy finds triggered alerts when it updates prices and queues them (see Economy._trigger_alerts).
+# AlertSender drains that queue in a background task: alerts are read in batches, grouped so each member
+# gets one DM per batch however many of their alerts fired, and DMs are spaced out so a large price move
+# can't burst through Discord's rate limits. The price tick only has to call wake().
+# An alert leaves the queue only once its DM has been sent (or can never be, e.g. DMs disabled), so a
+# crash or a Discord outage delays alerts instead of losing them; transient failures are retried later.
+# A batch is acknowledged as a whole after its DMs, so a crash mid-batch can repeat that batch's DMs.
+import asyncio
+
+import discord
+
+from money import format_cash
+
+ALERT_BATCH_SIZE = 100
+ALERT_SEND_INTERVAL_SECONDS = 0.5
+ALERT_RETRY_INTERVAL_SECONDS = 30
+
+
+class AlertSender:
+    def __init__(self, bot, economy, batch_size=ALERT_BATCH_SIZE, send_interval=ALERT_SEND_INTERVAL_SECONDS, retry_interval=ALERT_RETRY_INTERVAL_SECONDS):
+        self.bot = bot
+        self.economy = economy
+        self.batch_size = batch_size
+        self.send_interval = send_interval
+        self.retry_interval = retry_interval
+        self.sent = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def wake(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="alert-sender")
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            triggered = await self.economy.pending_alerts(self.batch_size)
+            if not triggered:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            by_user = {}
+            for alert in triggered:
+                by_user.setdefault(alert["user_id"], []).append(alert)
+            delivered, failed = [], []
+            for user_id, alerts in by_user.items():
+                sent = await self._send(user_id, alerts)
+                (delivered if sent else failed).extend(alert["id"] for alert in alerts)
+                await asyncio.sleep(self.send_interval)
+            # One acknowledgement (and so one write of the alerts section) per batch, not one per DM.
+            await self.economy.acknowledge_alerts(delivered, failed=failed)
+            if not delivered:
+                # Nothing in this batch could be sent (Discord is likely down): back off before retrying.
+                await asyncio.sleep(self.retry_interval)
+
+    async def _send(self, user_id, alerts):
+        # Returns False if the DM should be retried later.
+        lines = [
+            f"- {alert['coin']} is now **{format_cash(alert['price'])} dollars**, "
+            f"{'above' if alert['direction'] == 'above' else 'below'} your alert at {format_cash(alert['threshold'])} dollars."
+            for alert in alerts
+        ]
+        message = "🔔 **Price Alert** 🔔\n\n" + "\n".join(lines) + "\n\n*Alerts fire once; use `/alert` to set a new one.*"
+        try:
+            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+            await user.send(message)
+            self.sent += 1
+        except (discord.Forbidden, discord.NotFound):
+            print(f"Could not send price alert DM to user {user_id}. DMs might be disabled.")
+        except Exception as e:
+            print(f"Error sending price alert DM to user {user_id}, will retry: {e}")
+            return False
+        return True
@@ -0,0 +1,125 @@
+# Market announcement bus.
+# An update embed is rendered once and then fanned out concurrently to every configured destination:
+# announcement channels, webhooks and members who opted in to DMs. Each destination has its own rate
+# limiter and failed sends are retried with backoff. Publishing schedules the fan-out in the
+# background, so the caller (the price tick) never waits on Discord.
+# Destinations are stored in their own small JSON file and can be changed at runtime.
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+import discord
+
+DELIVERY_CONCURRENCY = 10
+DELIVERY_RETRIES = 3
+RETRY_BASE_DELAY_SECONDS = 2.0
+DESTINATION_MIN_INTERVAL_SECONDS = 1.0 # per destination, matches Discord's per-channel send budget comfortably
+
+
+class DestinationRateLimiter:
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next_allowed = {}
+        self._locks = {}
+
+    async def wait(self, key):
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            delay = self._next_allowed.get(key, 0.0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_allowed[key] = time.monotonic() + self.min_interval
+
+
+class AnnouncementBus:
+    def __init__(self, bot, config_path, default_channel_ids=()):
+        self.bot = bot
+        self.config_path = config_path
+        self.channel_ids = set(channel_id for channel_id in default_channel_ids if channel_id)
+        self.webhook_urls = set()
+        self.dm_subscribers = set()
+        self.rate_limiter = DestinationRateLimiter(DESTINATION_MIN_INTERVAL_SECONDS)
+        self._semaphore = None
+        self._pending = set()
+
+    def load(self):
+        if not os.path.exists(self.config_path):
+            return
+        with open(self.config_path, 'r') as f:
+            try:
+                config = json.load(f)
+            except json.JSONDecodeError:
+                print(f"Warning: {self.config_path} is corrupted or empty. Using default announcement destinations.")
+                return
+        self.channel_ids = set(config.get("channels", self.channel_ids))
+        self.webhook_urls = set(config.get("webhooks", []))
+        self.dm_subscribers = set(config.get("dm_subscribers", []))
+
+    def save(self):
+        config = {
+            "channels": sorted(self.channel_ids),
+            "webhooks": sorted(self.webhook_urls),
+            "dm_subscribers": sorted(self.dm_subscribers)
+        }
+        tmp_path = self.config_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(config, f, indent=4)
+        os.replace(tmp_path, self.config_path)
+
+    def destinations(self):
+        return ([("channel", channel_id) for channel_id in self.channel_ids] +
+                [("webhook", url) for url in self.webhook_urls] +
+                [("dm", user_id) for user_id in self.dm_subscribers])
+
+    def publish(self, embed):
+        # Returns immediately; delivery happens in a background task.
+        task = asyncio.create_task(self._fan_out(embed, self.destinations()))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return task
+
+    async def _fan_out(self, embed, destinations):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(DELIVERY_CONCURRENCY)
+        results = await asyncio.gather(*(self._deliver(kind, target, embed) for kind, target in destinations))
+        delivered = sum(1 for ok in results if ok)
+        print(f"Market announcement delivered to {delivered}/{len(destinations)} destinations.")
+        return delivered
+
+    async def _deliver(self, kind, target, embed):
+        for attempt in range(DELIVERY_RETRIES + 1):
+            await self.rate_limiter.wait((kind, target))
+            try:
+                async with self._semaphore:
+                    await self._send(kind, target, embed)
+                return True
+            except (discord.Forbidden, discord.NotFound) as e:
+                print(f"Announcement to {kind} {self._label(kind, target)} failed permanently: {e}")
+                return False
+            except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == DELIVERY_RETRIES:
+                    print(f"Announcement to {kind} {self._label(kind, target)} failed after {attempt + 1} attempts: {e}")
+                    return False
+                await asyncio.sleep(RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+            except Exception as e:
+                print(f"Unexpected error announcing to {kind} {self._label(kind, target)}: {e}")
+                return False
+
+    async def _send(self, kind, target, embed):
+        if kind == "channel":
+            channel = self.bot.get_channel(target) or await self.bot.fetch_channel(target)
+            await channel.send(embed=embed)
+        elif kind == "webhook":
+            webhook = discord.Webhook.from_url(target, client=self.bot)
+            await webhook.send(embed=embed)
+        elif kind == "dm":
+            user = self.bot.get_user(target) or await self.bot.fetch_user(target)
+            await user.send(embed=embed)
+
+    @staticmethod
+    def _label(kind, target):
+        if kind == "webhook":
+            return target.split('/')[-2] if target.count('/') >= 2 else "<webhook>" # never log the webhook token
+        return str(target)
@@ -1,34 +1,35 @@
 # Assume this is your 'bot.py' file.
 # Your bot token will be read from Render Environment Variables
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands, ui
-import random
+import io
 import json
 import os # Keep this import for os.environ.get
 import math
 import asyncio
 import datetime
 from datetime import timedelta
+import tempfile
+from member_cache import TrackedMemberCache
+from transcripts import TranscriptArchive
+from purge import PurgeJob
+from verification_registry import VerificationRegistry
+from announcements import AnnouncementBus
+from alerts import AlertSender
+from economy import CAMPTOM_COIN_NAME, CONVERSION_INTERVAL, CONVERSION_JOB
+from money import MAX_AMOUNT, format_cash, format_coins, milli_for_cents, to_cents, to_milli, valid_amount, value_cents
+from engine_client import connect_economy
+from diagnostics import LoopDiagnostics
+from scheduler import JobScheduler
 
 # --- Configuration ---
 TOKEN = os.environ.get('DISCORD_BOT_TOKEN') 
-if TOKEN is None:
-    print("ERROR: DISCORD_BOT_TOKEN environment variable not found. Bot cannot start.")
-    exit()
 
 PREFIX = '!' 
 
-CRYPTO_NAMES = ["Campton Coin"]
-CAMPTOM_COIN_NAME = "Campton Coin" 
-
-DATA_FILE = 'stock_market_data.json'
-
-MIN_PRICE = 50.00
-MAX_PRICE = 230.00
-INITIAL_PRICE = 120.00 
-
-VOLATILITY_LEVELS = [0.10, 0.20, 0.30, 0.40, 0.50, 0.60, 0.70, 0.80, 0.90, 1.00, 1.20, 1.50] 
+VERIFICATION_REGISTRY_FILE = os.environ.get('VERIFICATION_REGISTRY_FILE', 'verification_registry.jsonl')
+ANNOUNCEMENT_CONFIG_FILE = os.environ.get('ANNOUNCEMENT_CONFIG_FILE', 'announcement_destinations.json')
 
 ANNOUNCEMENT_CHANNEL_ID = 1453194843009585326 
 TICKET_CATEGORY_ID = 1453203314689708072 
@@ -38,127 +39,92 @@ VERIFY_CHANNEL_ID = 1453236019427283035
 NEW_ARRIVAL_ROLE_ID = 1453229600594333869 
 CAMPTON_CITIZEN_ROLE_ID = 1453229088507428874 
 MARKET_INVESTOR_ROLE_ID = 1453228326033555520 
-
-def load_data():
-    data = {"coins": {}, "users": {}, "tickets": {}, "next_conversion_timestamp": None}
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'r') as f:
-            try:
-                loaded_data = json.load(f)
-                data.update(loaded_data)
-                if "coins" not in data: data["coins"] = {}
-                if "users" not in data: data["users"] = {}
-                if "tickets" not in data: data["tickets"] = {}
-                if "next_conversion_timestamp" not in data: data["next_conversion_timestamp"] = (discord.utils.utcnow() + timedelta(days=7)).isoformat()
-                for user_id in data["users"]:
-                    if "verification" not in data["users"][user_id]: data["users"][user_id]["verification"] = {}
-                    if "on_buy_cooldown" not in data["users"][user_id]: data["users"][user_id]["on_buy_cooldown"] = False
-            except json.JSONDecodeError:
-                print(f"Warning: {DATA_FILE} is corrupted or empty. Starting with fresh data.")
-    return data
-
-def save_data(data):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=4)
+INVESTOR_BALANCE_CENTS = 2_000_000 # 20000.00 dollars
+INVESTOR_COINS_MILLI = 70_000 # 70.000 coins
+
+# Low-memory mode: skip member chunking at startup and only keep account holders / ticket openers cached.
+LOW_MEMORY_MEMBER_CACHE = os.environ.get('LOW_MEMORY_MEMBER_CACHE', '').lower() in ('1', 'true', 'yes')
+MEMBER_CACHE_TTL_SECONDS = 600
+
+# Opt-in event-loop stall detector and per-handler profile, see diagnostics.py and /diagnostics.
+DIAGNOSTICS_ENABLED = os.environ.get('DIAGNOSTICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+DIAGNOSTICS_STALL_MS = float(os.environ.get('DIAGNOSTICS_STALL_MS', '250'))
+
+# What each periodic job does about runs missed while the bot was down: "once", "all" or "skip" (see scheduler.py).
+# Override with e.g. JOB_CATCH_UP="scheduled_price_update=all,check_investor_roles=once".
+JOB_CATCH_UP = {
+    "scheduled_price_update": "once",
+    "check_investor_roles": "skip",
+    CONVERSION_JOB: "once",
+    "notify_conversion_countdown": "skip",
+    "accrue_interest": "once",
+    "compact_accounts": "skip"
+}
+for entry in filter(None, os.environ.get('JOB_CATCH_UP', '').split(',')):
+    job_name, _, policy = entry.partition('=')
+    JOB_CATCH_UP[job_name.strip()] = policy.strip()
+
+TICKET_CLOSE_DELAY_SECONDS = 5
+TICKET_ARCHIVE_DIR = os.environ.get('TICKET_ARCHIVE_DIR', 'ticket_archives')
+TRANSCRIPT_MAX_UPLOAD_BYTES = 8 * 1024 * 1024
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True 
-bot = commands.Bot(command_prefix=PREFIX, intents=intents)
+if LOW_MEMORY_MEMBER_CACHE:
+    bot = commands.Bot(
+        command_prefix=PREFIX,
+        intents=intents,
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False
+    )
+else:
+    bot = commands.Bot(command_prefix=PREFIX, intents=intents)
 
 bot.owner_id = 357681843790675978 
 
-market_data = load_data()
-
-if "Campton Coin" not in market_data["coins"] or len(market_data["coins"]) != len(CRYPTO_NAMES):
-    market_data["coins"] = {}
-    for name in CRYPTO_NAMES:
-        market_data["coins"][name] = {"price": INITIAL_PRICE}
-    save_data(market_data)
-elif market_data["coins"]["Campton Coin"]["price"] < MIN_PRICE or market_data["coins"]["Campton Coin"]["price"] > MAX_PRICE:
-    print(f"Detected Campton Coin price outside bounds ({market_data['coins']['Campton Coin']['price']:.2f}). Resetting to INITIAL_PRICE.")
-    market_data["coins"]["Campton Coin"]["price"] = INITIAL_PRICE
-    save_data(market_data)
+# All economy state (coins, accounts, tickets, conversion schedule) lives behind this client: either the
+# engine process started by main.py (ECONOMY_ENGINE_ADDRESS) or an in-process Economy when run standalone.
+economy = connect_economy()
+transcript_archive = TranscriptArchive(TICKET_ARCHIVE_DIR)
+active_purges = {} # channel_id -> PurgeJob
+verification_registry = VerificationRegistry(VERIFICATION_REGISTRY_FILE)
+verification_registry.load()
+announcement_bus = AnnouncementBus(bot, ANNOUNCEMENT_CONFIG_FILE, default_channel_ids=[ANNOUNCEMENT_CHANNEL_ID])
+announcement_bus.load()
+
+tracked_members = TrackedMemberCache(economy.tracked_user_ids, ttl_seconds=MEMBER_CACHE_TTL_SECONDS)
+loop_diagnostics = LoopDiagnostics(stall_threshold=DIAGNOSTICS_STALL_MS / 1000) if DIAGNOSTICS_ENABLED else None
+# Periodic jobs keep their next run times in the economy, so restarts don't reset their clocks.
+job_scheduler = JobScheduler(economy.job_schedule, economy.set_job_next_run)
+alert_sender = AlertSender(bot, economy)
+
+async def label_command_for_diagnostics(interaction: discord.Interaction) -> bool:
+    # Runs before every slash command; attributes the rest of the command's task to it in the profile.
+    if interaction.command is not None:
+        loop_diagnostics.label_current_task("/" + interaction.command.qualified_name)
+    return True
+
+if loop_diagnostics is not None:
+    bot.tree.interaction_check = label_command_for_diagnostics
+
+async def get_guild_members(guild, user_ids):
+    # Resolves user IDs to members, skipping anyone who has left the guild.
+    if not LOW_MEMORY_MEMBER_CACHE:
+        members = {}
+        for user_id in user_ids:
+            member = guild.get_member(user_id)
+            if member:
+                members[user_id] = member
+        return members
+    return await tracked_members.fetch_many(guild, user_ids)
 
 async def is_bot_owner_slash(interaction: discord.Interaction) -> bool:
     return interaction.user.id == bot.owner_id
 
-def has_more_than_three_decimals(number: float) -> bool:
-    s = str(f"{number:.4f}") 
-    if '.' in s:
-        decimal_part = s.split('.')[1]
-        return len(decimal_part) > 3
-    return False
-
-def update_prices():
-    for coin_name in market_data["coins"]:
-        current_price = market_data["coins"][coin_name]["price"]
-        chosen_volatility = random.choice(VOLATILITY_LEVELS)
-        change_percent = random.uniform(-chosen_volatility, chosen_volatility)
-        new_price = current_price * (1 + change_percent)
-        new_price = max(MIN_PRICE, min(MAX_PRICE, new_price)) 
-        market_data["coins"][coin_name]["price"] = round(new_price, 2)
-    
-    for user_id_str in market_data["users"]:
-        market_data["users"][user_id_str]["on_buy_cooldown"] = False
-    
-    save_data(market_data)
-    print("Market price updated and buy cooldown cleared for all users.")
-
-def get_user_data(user_id):
-    if str(user_id) not in market_data["users"]:
-        market_data["users"][str(user_id)] = {"balance": 0.0, "portfolio": {}, "verification": {}, "on_buy_cooldown": False}
-    elif "verification" not in market_data["users"][str(user_id)]:
-        market_data["users"][str(user_id)]["verification"] = {}
-    if "on_buy_cooldown" not in market_data["users"][str(user_id)]:
-        market_data["users"][str(user_id)]["on_buy_cooldown"] = False
-    return market_data["users"][str(user_id)]
-
-def buy_coin(user_id, coin_name, quantity_of_coins_to_buy): 
-    user = get_user_data(user_id)
-    if coin_name not in market_data["coins"]:
-        return "Coin not found."
-
-    if user.get("on_buy_cooldown", False):
-        return "You cannot buy Campton Coin until after the next market price update (approximately every 3 days)."
-
-    coin_price = market_data["coins"][coin_name]["price"]
-    cost = quantity_of_coins_to_buy * coin_price 
-
-    if user["balance"] < cost:
-        return f"Insufficient funds. You need {cost:.2f} dollars but only have {user['balance']:.2f} dollars."
-
-    user["balance"] -= cost
-    user["portfolio"][coin_name] = user["portfolio"].get(coin_name, 0.0) + quantity_of_coins_to_buy
-    save_data(market_data)
-    return f"Successfully bought {quantity_of_coins_to_buy:.3f} {coin_name}(s) for {cost:.2f} dollars." 
-
-def sell_coin(user_id, coin_name, quantity):
-    user = get_user_data(user_id)
-    if coin_name not in market_data["coins"]:
-        return "Coin not found."
-    if coin_name not in user["portfolio"] or user["portfolio"][coin_name] < quantity:
-        return f"You don't own {quantity:.3f} {coin_name}(s). You have {user['portfolio'].get(coin_name, 0.0):.3f}."
-
-    coin_price = market_data["coins"][coin_name]["price"]
-    revenue = coin_price * quantity
-
-    user["balance"] += revenue
-    user["portfolio"][coin_name] -= quantity
-    if user["portfolio"][coin_name] <= 0.0001: 
-        del user["portfolio"][coin_name]
-    save_data(market_data)
-    return f"Successfully sold {quantity:.3f} {coin_name}(s) for {revenue:.2f} dollars."
-
-async def _perform_crypto_to_cash_conversion():
+async def _perform_crypto_to_cash_conversion(next_conversion_at=None):
     print("Initiating crypto to cash conversion logic...")
     
-    if CAMPTOM_COIN_NAME not in market_data["coins"]:
-        print(f"Warning: '{CAMPTOM_COIN_NAME}' not found in market data. Skipping conversion.")
-        return 0 
-
-    current_coin_price = market_data["coins"][CAMPTOM_COIN_NAME]["price"]
-    
     target_guild = None
     if bot.guilds:
         target_guild = bot.guilds[0] 
@@ -166,68 +132,46 @@ async def _perform_crypto_to_cash_conversion():
         print(f"Warning: Bot is not in any guild. Cannot perform crypto to cash conversion.")
         return 0
 
-    converted_count = 0
-    for user_id_str, user_data in list(market_data["users"].items()):
-        user_id = int(user_id_str)
-        member = target_guild.get_member(user_id)
-
-        if member and not member.bot: 
-            user_campton_coins = user_data.get("portfolio", {}).get(CAMPTOM_COIN_NAME, 0.0)
-
-            if user_campton_coins > 0.0:
-                cash_received = user_campton_coins * current_coin_price
-                user_data["balance"] += cash_received
-                user_data["portfolio"][CAMPTOM_COIN_NAME] = 0.0
-                del user_data["portfolio"][CAMPTOM_COIN_NAME]
+    holder_ids = await economy.holder_ids(CAMPTOM_COIN_NAME)
+    members = await get_guild_members(target_guild, holder_ids)
+    eligible_ids = [user_id for user_id, member in members.items() if not member.bot]
+    conversions = await economy.convert_holdings(CAMPTOM_COIN_NAME, eligible_ids, next_conversion_at)
 
-                user_data["on_buy_cooldown"] = True 
+    for conversion in conversions:
+        member = members[conversion["user_id"]]
+        print(f"Converted {format_coins(conversion['coins'])} {CAMPTOM_COIN_NAME} for {member.display_name} ({member.id}) to {format_cash(conversion['cash'])} dollars.")
 
-                converted_count += 1
-                print(f"Converted {user_campton_coins:.3f} {CAMPTOM_COIN_NAME} for {member.display_name} ({user_id}) to {cash_received:.2f} dollars.")
-
-                try:
-                    await member.send(
-                        f"🔔 **Automatic Crypto Conversion!** 🔔\n\n"
-                        f"Your {user_campton_coins:.3f} {CAMPTOM_COIN_NAME} holdings have been automatically converted to cash.\n"
-                        f"You received **{cash_received:.2f} dollars** (at a price of {current_coin_price:.2f} dollars per coin).\n"
-                        f"Your new cash balance is: **{user_data['balance']:.2f} dollars**.\n\n"
-                        f"**You are now on a temporary buy cooldown and cannot purchase Campton Coin until after the next market price update.**"
-                    )
-                except discord.Forbidden:
-                    print(f"Could not send DM to {member.display_name} about auto-conversion. DMs might be disabled.")
-                except Exception as e:
-                    print(f"Error sending auto-conversion DM to {member.display_name}: {e}")
+        try:
+            await member.send(
+                f"🔔 **Automatic Crypto Conversion!** 🔔\n\n"
+                f"Your {format_coins(conversion['coins'])} {CAMPTOM_COIN_NAME} holdings have been automatically converted to cash.\n"
+                f"You received **{format_cash(conversion['cash'])} dollars** (at a price of {format_cash(conversion['price'])} dollars per coin).\n"
+                f"Your new cash balance is: **{format_cash(conversion['balance'])} dollars**.\n\n"
+                f"**You are now on a temporary buy cooldown and cannot purchase Campton Coin until after the next market price update.**"
+            )
+        except discord.Forbidden:
+            print(f"Could not send DM to {member.display_name} about auto-conversion. DMs might be disabled.")
+        except Exception as e:
+            print(f"Error sending auto-conversion DM to {member.display_name}: {e}")
     
-    market_data["next_conversion_timestamp"] = (discord.utils.utcnow() + timedelta(days=7)).isoformat()
-    save_data(market_data)
-    print(f"Crypto to cash conversion logic complete. {converted_count} users processed.")
-    return converted_count
+    print(f"Crypto to cash conversion logic complete. {len(conversions)} users processed.")
+    return len(conversions)
 
-@tasks.loop(hours=72)
 async def scheduled_price_update():
     print("Running scheduled price update...")
     await bot.change_presence(activity=discord.Game(name="Updating Market Prices...")) 
-    update_prices() 
+    prices = await economy.update_prices() 
+    alert_sender.wake()
+    current_price = prices[CAMPTOM_COIN_NAME]
+    embed = discord.Embed(
+        title="📈 Market Update: Campton Coin 📉",
+        description=f"The price of Campton Coin has updated to **{format_cash(current_price)} dollars**.",
+        color=discord.Color.blue()
+    )
+    # Fan-out to channels, webhooks and DM subscribers happens in the background.
+    announcement_bus.publish(embed)
     await bot.change_presence(activity=discord.Game(name="Campton Stocks RP")) 
-    if ANNOUNCEMENT_CHANNEL_ID:
-        channel = bot.get_channel(ANNOUNCEMENT_CHANNEL_ID)
-        if channel:
-            current_price = market_data["coins"][CAMPTOM_COIN_NAME]["price"]
-            embed = discord.Embed(
-                title="📈 Market Update: Campton Coin 📉",
-                description=f"The price of Campton Coin has updated to **{current_price:.2f} dollars**.",
-                color=discord.Color.blue()
-            )
-            await channel.send(embed=embed)
-        else:
-            print(f"Warning: Announcement channel with ID {ANNOUNCEMENT_CHANNEL_ID} not found.")
 
-@scheduled_price_update.before_loop
-async def before_scheduled_price_update():
-    await bot.wait_until_ready()
-    print("Scheduled price update task is waiting for bot to be ready...")
-
-@tasks.loop(minutes=5)
 async def check_investor_roles():
     print("Running scheduled check for Market Investor roles...")
     if MARKET_INVESTOR_ROLE_ID is None:
@@ -247,22 +191,32 @@ async def check_investor_roles():
         print(f"Warning: Market Investor role with ID {MARKET_INVESTOR_ROLE_ID} not found in guild {target_guild.name}. Skipping investor role checks.")
         return
 
-    for member in target_guild.members:
-        if member.bot:
-            continue
+    if LOW_MEMORY_MEMBER_CACHE:
+        # Only members whose account reaches a threshold (and whoever the cache knows holds the role) are fetched,
+        # so the number of member requests follows the number of investors, not the size of the ledger.
+        candidate_ids = set(await economy.accounts_reaching(INVESTOR_BALANCE_CENTS, CAMPTOM_COIN_NAME, INVESTOR_COINS_MILLI))
+        candidate_ids.update(member.id for member in investor_role_obj.members)
+        candidates = list((await get_guild_members(target_guild, sorted(candidate_ids))).values())
+        await tracked_members.prune()
+    else:
+        candidates = target_guild.members
 
-        user_data = get_user_data(member.id)
-        user_balance = user_data.get("balance", 0.0)
-        campton_coins = user_data.get("portfolio", {}).get(CAMPTOM_COIN_NAME, 0.0)
+    candidates = [member for member in candidates if not member.bot]
+    accounts = await economy.get_accounts([member.id for member in candidates])
 
-        if (user_balance >= 20000.0 or campton_coins >= 70.0):
+    for member in candidates:
+        user_data = accounts[str(member.id)]
+        user_balance = user_data.get("balance", 0)
+        campton_coins = user_data.get("portfolio", {}).get(CAMPTOM_COIN_NAME, 0)
+
+        if (user_balance >= INVESTOR_BALANCE_CENTS or campton_coins >= INVESTOR_COINS_MILLI):
             if investor_role_obj not in member.roles:
                 try:
                     await member.add_roles(investor_role_obj)
                     print(f"Assigned 'Market Investor' role to {member.display_name} ({member.id}).")
                     try:
                         await member.send(f"Congratulations! You've earned the **Market Investor** role in {target_guild.name} "
-                                          f"for reaching a balance of {user_balance:.2f} dollars or holding {campton_coins:.3f} Campton Coins!")
+                                          f"for reaching a balance of {format_cash(user_balance)} dollars or holding {format_coins(campton_coins)} Campton Coins!")
                     except discord.Forbidden:
                         print(f"Could not send DM to {member.display_name} about Market Investor role. DMs might be disabled.")
                 except discord.Forbidden:
@@ -271,23 +225,12 @@ async def check_investor_roles():
                 except Exception as e:
                     print(f"An unexpected error occurred while assigning 'Market Investor' role to {member.display_name}: {e}")
 
-@check_investor_roles.before_loop
-async def before_check_investor_roles():
-    await bot.wait_until_ready()
-    print("Scheduled Market Investor role check task is waiting for bot to be ready...")
-
-@tasks.loop(hours=168) 
 async def auto_convert_crypto_to_cash():
     print("Running scheduled auto crypto to cash conversion...")
-    await _perform_crypto_to_cash_conversion()
+    # The scheduler has already moved this job to its next due time; the economy's countdown timestamp follows it.
+    await _perform_crypto_to_cash_conversion(job_scheduler.jobs[CONVERSION_JOB].next_run.isoformat())
     print("Scheduled auto crypto to cash conversion task complete.")
 
-@auto_convert_crypto_to_cash.before_loop
-async def before_auto_convert_crypto_to_cash():
-    await bot.wait_until_ready()
-    print("Scheduled crypto to cash conversion task is waiting for bot to be ready...")
-
-@tasks.loop(hours=36)
 async def notify_conversion_countdown():
     print("Running scheduled conversion countdown notification...")
     
@@ -298,12 +241,7 @@ async def notify_conversion_countdown():
         print("Warning: Bot is not in any guild. Cannot send conversion countdown notifications.")
         return
 
-    if "next_conversion_timestamp" not in market_data or market_data["next_conversion_timestamp"] is None:
-        market_data["next_conversion_timestamp"] = (discord.utils.utcnow() + timedelta(days=7)).isoformat()
-        save_data(market_data)
-        print("Initialized next_conversion_timestamp as it was missing.")
-    
-    next_conversion_dt = datetime.datetime.fromisoformat(market_data["next_conversion_timestamp"])
+    next_conversion_dt = datetime.datetime.fromisoformat(await economy.get_next_conversion_timestamp())
     time_left = next_conversion_dt - discord.utils.utcnow()
 
     notification_message_base = (
@@ -335,9 +273,16 @@ async def notify_conversion_countdown():
                 f"**Within the next hour!**"
             )
 
-    full_notification_message = notification_message_base + notification_message_time + "\n\nPlan your trades accordingly!"
+    full_notification_message = (
+        notification_message_base + notification_message_time + "\n\nPlan your trades accordingly!"
+        "\n*Use `/conversionreminders` to turn these reminders off.*"
+    )
 
-    for member in target_guild.members:
+    # Only members holding Campton Coin are affected by the conversion, so only they (minus anyone who opted out) get a DM.
+    recipient_ids = await economy.countdown_recipients(CAMPTOM_COIN_NAME)
+    members = await get_guild_members(target_guild, recipient_ids)
+    print(f"Sending conversion countdown to {len(members)} holders.")
+    for member in members.values():
         if member.bot:
             continue
         if full_notification_message:
@@ -349,10 +294,23 @@ async def notify_conversion_countdown():
             except Exception as e:
                 print(f"Error sending conversion countdown DM to {member.display_name}: {e}")
 
-@notify_conversion_countdown.before_loop
-async def before_notify_conversion_countdown():
-    await bot.wait_until_ready()
-    print("Scheduled conversion countdown notification task is waiting for bot to be ready...")
+async def accrue_interest():
+    # Only moves the global interest/dividend indexes; accounts are brought current when they're next used.
+    # Runs hourly so whole periods missed while the bot was down are caught up promptly.
+    await economy.accrue()
+
+async def compact_accounts():
+    # Drops accounts left empty (no cash, coins, verification or open ticket) so storage tracks active users only.
+    removed = await economy.compact_accounts()
+    if removed and LOW_MEMORY_MEMBER_CACHE:
+        await tracked_members.prune()
+
+job_scheduler.add_job("scheduled_price_update", timedelta(hours=72), scheduled_price_update, JOB_CATCH_UP["scheduled_price_update"])
+job_scheduler.add_job("check_investor_roles", timedelta(minutes=5), check_investor_roles, JOB_CATCH_UP["check_investor_roles"])
+job_scheduler.add_job(CONVERSION_JOB, CONVERSION_INTERVAL, auto_convert_crypto_to_cash, JOB_CATCH_UP[CONVERSION_JOB])
+job_scheduler.add_job("notify_conversion_countdown", timedelta(hours=36), notify_conversion_countdown, JOB_CATCH_UP["notify_conversion_countdown"])
+job_scheduler.add_job("accrue_interest", timedelta(hours=1), accrue_interest, JOB_CATCH_UP["accrue_interest"])
+job_scheduler.add_job("compact_accounts", timedelta(hours=6), compact_accounts, JOB_CATCH_UP["compact_accounts"])
 
 class OpenTicketButton(discord.ui.Button):
     def __init__(self):
@@ -361,18 +319,17 @@ class OpenTicketButton(discord.ui.Button):
     async def callback(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
 
-        global market_data, TICKET_CATEGORY_ID, HELP_DESK_CHANNEL_ID
+        global TICKET_CATEGORY_ID, HELP_DESK_CHANNEL_ID
 
         if not TICKET_CATEGORY_ID:
             await interaction.followup.send("Ticket system is not fully configured. Please contact the bot owner.", ephemeral=True)
             return
 
-        for ticket_id, ticket_info in market_data["tickets"].items():
-            if ticket_info["user_id"] == interaction.user.id and ticket_info["status"] == "open":
-                existing_channel = bot.get_channel(int(ticket_id))
-                if existing_channel:
-                    await interaction.followup.send(f"You already have an open ticket: {existing_channel.mention}. Please use that ticket or close it first.", ephemeral=True)
-                    return
+        for ticket_id in await economy.open_tickets_for(interaction.user.id):
+            existing_channel = bot.get_channel(ticket_id)
+            if existing_channel:
+                await interaction.followup.send(f"You already have an open ticket: {existing_channel.mention}. Please use that ticket or close it first.", ephemeral=True)
+                return
 
         category = bot.get_channel(TICKET_CATEGORY_ID)
         if not category or not isinstance(category, discord.CategoryChannel):
@@ -393,13 +350,9 @@ class OpenTicketButton(discord.ui.Button):
         try:
             new_channel = await category.create_text_channel(ticket_channel_name, overwrites=overwrites)
             
-            market_data["tickets"][str(new_channel.id)] = {
-                "user_id": interaction.user.id,
-                "issue": "No specific issue provided via button.",
-                "status": "open",
-                "created_at": discord.utils.utcnow().isoformat()
-            }
-            save_data(market_data)
+            await economy.open_ticket(new_channel.id, interaction.user.id, "No specific issue provided via button.")
+            if LOW_MEMORY_MEMBER_CACHE and isinstance(interaction.user, discord.Member):
+                tracked_members.remember(interaction.user)
 
             ticket_embed = discord.Embed(
                 title=f"New Ticket for {interaction.user.display_name}",
@@ -455,11 +408,32 @@ class VerificationModal(ui.Modal, title='Project New Campton Verification'):
             await interaction.followup.send("You are already a Campton Citizen!", ephemeral=True)
             return
 
-        user_data = get_user_data(member.id) 
-        user_data["verification"]["roblox_username"] = str(self.roblox_username)
-        user_data["verification"]["pnc_full_name"] = str(self.pnc_full_name)
-        user_data["verification"]["verified_at"] = discord.utils.utcnow().isoformat()
-        save_data(market_data)
+        roblox_owner_id = verification_registry.roblox_owner(str(self.roblox_username))
+        if roblox_owner_id is not None and roblox_owner_id != member.id:
+            await interaction.followup.send(
+                f"The Roblox username '{self.roblox_username}' has already been claimed by another member. "
+                f"If this is your account, please open a support ticket.",
+                ephemeral=True
+            )
+            print(f"WARNING: {member.display_name} ({member.id}) tried to verify with Roblox username '{self.roblox_username}', already claimed by {roblox_owner_id}.")
+            return
+
+        pnc_name_duplicates = verification_registry.pnc_owners(str(self.pnc_full_name)) - {member.id}
+        # The registry is the only record of verifications. It appends a single line to its own file, so no economy
+        # section is rewritten here.
+        verification_registry.register(member.id, str(self.roblox_username), str(self.pnc_full_name), discord.utils.utcnow().isoformat())
+
+        if pnc_name_duplicates:
+            duplicate_mentions = ", ".join(f"<@{user_id}> (`{user_id}`)" for user_id in sorted(pnc_name_duplicates))
+            print(f"WARNING: {member.display_name} ({member.id}) verified with PNC name '{self.pnc_full_name}', also used by {duplicate_mentions}.")
+            try:
+                owner = await bot.fetch_user(bot.owner_id)
+                await owner.send(
+                    f"⚠️ **Duplicate PNC name flagged:** {member.mention} (`{member.id}`) verified as '{self.pnc_full_name}', "
+                    f"which is already registered to {duplicate_mentions}."
+                )
+            except discord.HTTPException:
+                print("Could not DM owner about a duplicate PNC name. DMs might be disabled.")
 
         try:
             if new_arrival_role in member.roles:
@@ -525,18 +499,25 @@ class VerifyView(discord.ui.View):
 @bot.event
 async def on_ready():
     print(f'{bot.user.name} has connected to Discord!')
+    if loop_diagnostics is not None:
+        loop_diagnostics.install(asyncio.get_running_loop())
+    verification_registry.migrate_from_users(await economy.verifications())
+    if LOW_MEMORY_MEMBER_CACHE:
+        print("Low-memory member cache enabled: guild members are not chunked and are fetched on demand.")
     bot.add_view(TicketView())
     bot.add_view(VerifyView())
     await bot.tree.sync()
     print("Slash commands synced!")
-    scheduled_price_update.start()
-    check_investor_roles.start() 
-    auto_convert_crypto_to_cash.start() 
-    notify_conversion_countdown.start() 
-    print("Scheduled price update task started.")
-    print("Scheduled Market Investor role check task started.")
-    print("Scheduled auto crypto to cash conversion task started.")
-    print("Scheduled conversion countdown notification task started.")
+    # on_ready fires again after a reconnect; the scheduler only starts once.
+    if not job_scheduler.running:
+        await job_scheduler.start()
+        print("Job scheduler started.")
+    alert_sender.wake() # delivers any alerts that triggered while the bot was offline
+
+@bot.event
+async def on_raw_member_remove(payload: discord.RawMemberRemoveEvent):
+    if LOW_MEMORY_MEMBER_CACHE:
+        tracked_members.forget(payload.user.id)
 
 @bot.event
 async def on_member_join(member: discord.Member):
@@ -570,10 +551,11 @@ async def on_member_join(member: discord.Member):
 @app_commands.check(is_bot_owner_slash)
 async def prices(interaction: discord.Interaction):
     await interaction.response.defer()
-    update_prices() 
+    current_prices = await economy.update_prices() 
+    alert_sender.wake()
     embed = discord.Embed(title="Current Crypto Market Prices", color=0x00ff00)
-    for coin_name, data in market_data["coins"].items():
-        embed.add_field(name=coin_name, value=f"{data['price']:.2f} dollars", inline=True)
+    for coin_name, price in current_prices.items():
+        embed.add_field(name=coin_name, value=f"{format_cash(price)} dollars", inline=True)
     await interaction.followup.send(embed=embed)
 
 @prices.error
@@ -586,6 +568,44 @@ async def prices_error(interaction: discord.Interaction, error: app_commands.App
         else:
             await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
 
+@bot.tree.command(name='setpricemodel', description='(Owner Only) Chooses the stochastic model used to update a coin\'s price.')
+@app_commands.describe(
+    model='The price model to use.',
+    params='Optional model parameters as JSON, e.g. {"sigma": 0.3}.'
+)
+@app_commands.choices(model=[
+    app_commands.Choice(name='Tiered volatility (original)', value='legacy'),
+    app_commands.Choice(name='Geometric Brownian motion', value='gbm'),
+    app_commands.Choice(name='Mean-reverting (Ornstein-Uhlenbeck)', value='ou'),
+    app_commands.Choice(name='Regime switching', value='regime')
+])
+@app_commands.check(is_bot_owner_slash)
+async def set_price_model(interaction: discord.Interaction, model: app_commands.Choice[str], params: str = None):
+    await interaction.response.defer(ephemeral=True)
+    coin_name = CAMPTOM_COIN_NAME
+
+    try:
+        model_params = json.loads(params) if params else {}
+        if not isinstance(model_params, dict):
+            raise ValueError("parameters must be a JSON object")
+        spec = {"name": model.value, "params": model_params}
+        effective_params = await economy.set_price_model(coin_name, spec)
+    except ValueError as e:
+        await interaction.followup.send(f"Invalid model parameters: {e}", ephemeral=True)
+        return
+
+    await interaction.followup.send(f"{coin_name} now uses the **{model.name}** price model with parameters `{json.dumps(effective_params)}`.", ephemeral=True)
+
+@set_price_model.error
+async def set_price_model_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        await interaction.response.send_message("You must be the bot owner to use this command.", ephemeral=True)
+    else:
+        if interaction.response.is_done():
+            await interaction.followup.send(f"An unexpected error occurred: {error}", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
+
 @bot.tree.command(name='balance', description='Shows your current balance and portfolio, or another member\'s.')
 @app_commands.describe(member='The member whose balance to view (optional).') 
 async def balance(interaction: discord.Interaction, member: discord.Member = None): 
@@ -597,58 +617,96 @@ async def balance(interaction: discord.Interaction, member: discord.Member = Non
         await interaction.followup.send(f"{target_member.display_name} is a bot and does not have a market balance.", ephemeral=True)
         return
 
-    user = get_user_data(target_member.id)
+    user, current_prices = await asyncio.gather(economy.get_account(target_member.id), economy.get_prices())
     embed = discord.Embed(title=f"{target_member.display_name}'s Portfolio", color=0x0099ff)
-    embed.add_field(name="Cash Balance", value=f"{user['balance']:.2f} dollars", inline=False)
+    embed.add_field(name="Cash Balance", value=f"{format_cash(user['balance'])} dollars", inline=False)
+    if user["accrued"]:
+        embed.add_field(name="Interest & Dividends Earned", value=f"{format_cash(user['accrued'])} dollars", inline=False)
 
     if user["portfolio"]:
         portfolio_str = ""
         total_value = 0
         for coin_name, quantity in user["portfolio"].items():
-            current_price = market_data["coins"].get(coin_name, {}).get("price", 0)
-            coin_value = current_price * quantity
+            current_price = current_prices.get(coin_name, 0)
+            coin_value = value_cents(quantity, current_price)
             total_value += coin_value
-            portfolio_str += f"- {coin_name}: **{quantity:.3f}** units (Value: {coin_value:.2f} dollars)\n"
+            portfolio_str += f"- {coin_name}: **{format_coins(quantity)}** units (Value: {format_cash(coin_value)} dollars)\n"
         embed.add_field(name="Holdings", value=portfolio_str, inline=False)
     else:
         embed.add_field(name="Holdings", value="You own no cryptocurrencies." if target_member == interaction.user else f"{target_member.display_name} owns no cryptocurrencies.", inline=False)
 
     await interaction.followup.send(embed=embed)
 
-@bot.tree.command(name='buy', description='Buys Campton Coin with a specified amount of cash (up to 2 decimal places for cash).')
+def format_percent(fraction):
+    return "n/a" if fraction is None else f"{fraction * 100:+.2f}%"
+
+@bot.tree.command(name='performance', description='Shows how your net worth has changed at each market price update, or another member\'s.')
+@app_commands.describe(member='The member whose performance to view (optional).')
+async def performance(interaction: discord.Interaction, member: discord.Member = None):
+    await interaction.response.defer(ephemeral=True)
+
+    target_member = member or interaction.user
+
+    if target_member.bot:
+        await interaction.followup.send(f"{target_member.display_name} is a bot and does not have a market balance.", ephemeral=True)
+        return
+
+    summary = await economy.performance(target_member.id)
+    if not summary["samples"]:
+        await interaction.followup.send(f"There is no performance history for {target_member.display_name} yet. Net worth is recorded at every market price update.", ephemeral=True)
+        return
+
+    embed = discord.Embed(title=f"{target_member.display_name}'s Performance", color=0x0099ff)
+    embed.add_field(name="Net Worth", value=f"{format_cash(summary['net_worth'])} dollars", inline=True)
+    embed.add_field(name="Total Return", value=format_percent(summary["total_return"]), inline=True)
+    embed.add_field(name="Rank", value=f"#{summary['rank']} (best #{summary['best_rank']})", inline=True)
+    embed.add_field(name="Max Drawdown", value=format_percent(summary["max_drawdown"]), inline=True)
+    embed.add_field(name="Current Drawdown", value=format_percent(summary["current_drawdown"]), inline=True)
+    embed.add_field(name="Samples", value=f"{summary['samples']} since {summary['since'][:10]}", inline=True)
+    lines = [f"{'date':<12}{'net worth':>14}{'return':>10}{'rank':>6}"]
+    for sample in summary["history"]:
+        lines.append(f"{sample['at'][:10]:<12}{format_cash(sample['net_worth']):>14}{format_percent(sample['return']):>10}{sample['rank']:>6}")
+    embed.add_field(name="Recent Price Updates", value="```\n" + "\n".join(lines) + "\n```", inline=False)
+    embed.set_footer(text="Returns are changes in net worth, so deposits, withdrawals and transfers count too.")
+    await interaction.followup.send(embed=embed)
+
+@bot.tree.command(name='buy',description='Buys Campton Coin with a specified amount of cash (up to 2 decimal places for cash).')
 @app_commands.describe(amount_of_cash='The amount of cash you want to spend (e.g., 50.00).') 
 async def buy(interaction: discord.Interaction, amount_of_cash: float): 
     await interaction.response.defer(ephemeral=True)
     coin_name = CAMPTOM_COIN_NAME
 
-    user_data = get_user_data(interaction.user.id)
+    user_data, current_coin_price = await asyncio.gather(economy.get_account(interaction.user.id), economy.get_price(coin_name))
     if user_data.get("on_buy_cooldown", False):
         await interaction.followup.send("You cannot buy Campton Coin until after the next market price update (approximately every 3 days).", ephemeral=True)
         return
 
-    if amount_of_cash <= 0:
-        await interaction.followup.send("You must spend a positive amount of cash.", ephemeral=True)
+    cash_cents = to_cents(amount_of_cash)
+    if cash_cents is None:
+        await interaction.followup.send("You can only spend cash with up to 2 decimal places (e.g., 50.00).", ephemeral=True)
+        return
+    if not valid_amount(cash_cents):
+        await interaction.followup.send(f"You must spend between 0.01 and {format_cash(MAX_AMOUNT)} dollars.", ephemeral=True)
         return
-
-    s_cash = str(f"{amount_of_cash:.3f}")
-    if '.' in s_cash:
-        decimal_part_cash = s_cash.split('.')[1]
-        if len(decimal_part_cash) > 2 and amount_of_cash * 100 != int(amount_of_cash * 100):
-            await interaction.followup.send("You can only spend cash with up to 2 decimal places (e.g., 50.00).", ephemeral=True)
-            return
     
-    current_coin_price = market_data["coins"][coin_name]["price"]
     if current_coin_price <= 0: 
         await interaction.followup.send("Cannot buy Campton Coin right now, its price is too low or zero.", ephemeral=True)
         return
 
-    quantity_of_coins_to_buy = amount_of_cash / current_coin_price
-    quantity_of_coins_to_buy = math.floor(quantity_of_coins_to_buy * 1000) / 1000.0
+    quantity_of_coins_to_buy = milli_for_cents(cash_cents, current_coin_price)
+    if quantity_of_coins_to_buy <= 0:
+        await interaction.followup.send(f"{format_cash(cash_cents)} dollars is not enough to buy 0.001 {coin_name}.", ephemeral=True)
+        return
 
-    result = buy_coin(interaction.user.id, coin_name, quantity_of_coins_to_buy)
+    try:
+        result = await economy.buy_coin(interaction.user.id, coin_name, quantity_of_coins_to_buy)
+    except ValueError as e:
+        await interaction.followup.send(f"Could not buy {coin_name}: {e}", ephemeral=True)
+        return
     
     if "Successfully bought" in result:
-        await interaction.followup.send(f"Successfully spent {amount_of_cash:.2f} dollars to buy {quantity_of_coins_to_buy:.3f} {coin_name}(s). Your new cash balance is {get_user_data(interaction.user.id)['balance']:.2f} dollars.", ephemeral=True)
+        new_balance = (await economy.get_account(interaction.user.id))['balance']
+        await interaction.followup.send(f"Successfully spent {format_cash(cash_cents)} dollars to buy {format_coins(quantity_of_coins_to_buy)} {coin_name}(s). Your new cash balance is {format_cash(new_balance)} dollars.", ephemeral=True)
     else:
         await interaction.followup.send(result, ephemeral=True)
 
@@ -658,15 +716,15 @@ async def sell(interaction: discord.Interaction, quantity: float):
     await interaction.response.defer(ephemeral=True)
     coin_name = CAMPTOM_COIN_NAME
 
-    if quantity <= 0:
-        await interaction.followup.send("You must sell a positive amount.", ephemeral=True)
-        return
-
-    if has_more_than_three_decimals(quantity):
+    quantity_milli = to_milli(quantity)
+    if quantity_milli is None:
         await interaction.followup.send("You can only sell Campton Coin with up to 3 decimal places (e.g., 0.123).", ephemeral=True)
         return
+    if not valid_amount(quantity_milli):
+        await interaction.followup.send(f"You must sell between 0.001 and {format_coins(MAX_AMOUNT)} Campton Coin.", ephemeral=True)
+        return
 
-    result = sell_coin(interaction.user.id, coin_name, quantity)
+    result = await economy.sell_coin(interaction.user.id, coin_name, quantity_milli)
     await interaction.followup.send(result, ephemeral=True)
 
 @bot.tree.command(name='addfunds', description='Adds funds to a specified user\'s balance. (Bot Owner Only)')
@@ -678,28 +736,38 @@ async def add_funds(interaction: discord.Interaction, member: discord.Member, am
         await interaction.followup.send("You must be the bot owner to use this command.", ephemeral=True)
         return
 
-    if amount <= 0:
-        await interaction.followup.send("Amount must be greater than 0.", ephemeral=True)
+    amount_cents = to_cents(amount)
+    if amount_cents is None:
+        await interaction.followup.send("Amounts can have at most 2 decimal places (e.g., 50.00).", ephemeral=True)
+        return
+    if not valid_amount(amount_cents):
+        await interaction.followup.send(f"Amount must be between 0.01 and {format_cash(MAX_AMOUNT)} dollars.", ephemeral=True)
         return
 
-    user_data = get_user_data(member.id)
-    user_data["balance"] += amount
-    save_data(market_data)
+    try:
+        new_balance = await economy.add_funds(member.id, amount_cents)
+    except ValueError as e:
+        await interaction.followup.send(f"Could not add funds: {e}", ephemeral=True)
+        return
 
-    await interaction.followup.send(f"Successfully added {amount:.2f} dollars to {member.display_name}'s balance. Their new balance is {user_data['balance']:.2f} dollars.", ephemeral=True)
+    await interaction.followup.send(f"Successfully added {format_cash(amount_cents)} dollars to {member.display_name}'s balance. Their new balance is {format_cash(new_balance)} dollars.", ephemeral=True)
 
 @bot.tree.command(name='withdraw', description='Requests a withdrawal of funds from your balance. Funds are deducted upon owner approval.')
 @app_commands.describe(amount='The amount of funds to request for withdrawal.')
 async def withdraw(interaction: discord.Interaction, amount: float):
     await interaction.response.defer(ephemeral=True)
 
-    if amount <= 0:
-        await interaction.followup.send("You must request a positive amount for withdrawal.", ephemeral=True)
+    amount_cents = to_cents(amount)
+    if amount_cents is None:
+        await interaction.followup.send("Amounts can have at most 2 decimal places (e.g., 50.00).", ephemeral=True)
+        return
+    if not valid_amount(amount_cents):
+        await interaction.followup.send(f"You must request between 0.01 and {format_cash(MAX_AMOUNT)} dollars for withdrawal.", ephemeral=True)
         return
 
-    user_data = get_user_data(interaction.user.id)
-    if user_data["balance"] < amount:
-        await interaction.followup.send(f"Insufficient funds. You only have {user_data['balance']:.2f} dollars.", ephemeral=True)
+    user_data = await economy.get_account(interaction.user.id)
+    if user_data["balance"] < amount_cents:
+        await interaction.followup.send(f"Insufficient funds. You only have {format_cash(user_data['balance'])} dollars.", ephemeral=True)
         return
 
     owner = await bot.fetch_user(bot.owner_id)
@@ -710,12 +778,12 @@ async def withdraw(interaction: discord.Interaction, amount: float):
                 description=f"**{interaction.user.display_name}** (`{interaction.user.id}`) has requested a withdrawal.",
                 color=discord.Color.red()
             )
-            withdrawal_embed.add_field(name="Requested Amount", value=f"{amount:.2f} dollars", inline=False)
-            withdrawal_embed.add_field(name="User's Current Balance", value=f"{user_data['balance']:.2f} dollars", inline=False)
-            withdrawal_embed.set_footer(text=f"To approve, use /approvewithdrawal {interaction.user.id} {amount}")
+            withdrawal_embed.add_field(name="Requested Amount", value=f"{format_cash(amount_cents)} dollars", inline=False)
+            withdrawal_embed.add_field(name="User's Current Balance", value=f"{format_cash(user_data['balance'])} dollars", inline=False)
+            withdrawal_embed.set_footer(text=f"To approve, use /approvewithdrawal {interaction.user.id} {format_cash(amount_cents)}")
 
             await owner.send(embed=withdrawal_embed)
-            await interaction.followup.send(f"Your withdrawal request for {amount:.2f} dollars has been sent to the bot owner for approval. Your balance remains {user_data['balance']:.2f} dollars for now.", ephemeral=True)
+            await interaction.followup.send(f"Your withdrawal request for {format_cash(amount_cents)} dollars has been sent to the bot owner for approval. Your balance remains {format_cash(user_data['balance'])} dollars for now.", ephemeral=True)
         except discord.Forbidden:
             print(f"Could not send DM to owner {owner.name} about withdrawal request. DMs might be disabled.")
             await interaction.followup.send("Could not send the withdrawal request to the bot owner. Please ensure the bot can DM the owner.", ephemeral=True)
@@ -731,8 +799,12 @@ async def approve_withdrawal(interaction: discord.Interaction, user_id: str, amo
         await interaction.followup.send("You must be the bot owner to use this command.", ephemeral=True)
         return
 
-    if amount <= 0:
-        await interaction.followup.send("Amount must be greater than 0.", ephemeral=True)
+    amount_cents = to_cents(amount)
+    if amount_cents is None:
+        await interaction.followup.send("Amounts can have at most 2 decimal places (e.g., 50.00).", ephemeral=True)
+        return
+    if not valid_amount(amount_cents):
+        await interaction.followup.send(f"Amount must be between 0.01 and {format_cash(MAX_AMOUNT)} dollars.", ephemeral=True)
         return
 
     try:
@@ -744,21 +816,18 @@ async def approve_withdrawal(interaction: discord.Interaction, user_id: str, amo
         await interaction.followup.send("User not found with the provided ID.", ephemeral=True)
         return
 
-    user_data = get_user_data(target_user.id)
+    withdrawal = await economy.withdraw_funds(target_user.id, amount_cents)
 
-    if user_data["balance"] < amount:
-        await interaction.followup.send(f"User {target_user.display_name} only has {user_data['balance']:.2f} dollars, which is less than the requested {amount:.2f} dollars. Cannot approve.", ephemeral=True)
+    if not withdrawal["ok"]:
+        await interaction.followup.send(f"User {target_user.display_name} only has {format_cash(withdrawal['balance'])} dollars, which is less than the requested {format_cash(amount_cents)} dollars. Cannot approve.", ephemeral=True)
         return
 
-    user_data["balance"] -= amount
-    save_data(market_data)
-
-    await interaction.followup.send(f"Successfully approved withdrawal of {amount:.2f} dollars for {target_user.display_name}. Their new balance is {user_data['balance']:.2f} dollars.", ephemeral=True)
+    await interaction.followup.send(f"Successfully approved withdrawal of {format_cash(amount_cents)} dollars for {target_user.display_name}. Their new balance is {format_cash(withdrawal['balance'])} dollars.", ephemeral=True)
 
     try:
         user_approved_embed = discord.Embed(
             title="✅ Withdrawal Approved! ✅",
-            description=f"Your withdrawal request for {amount:.2f} dollars has been approved by the bot owner.",
+            description=f"Your withdrawal request for {format_cash(amount_cents)} dollars has been approved by the bot owner.",
             color=discord.Color.green()
         )
         await target_user.send(embed=user_approved_embed)
@@ -778,20 +847,25 @@ async def approve_withdrawal(interaction: discord.Interaction, user_id: str, amo
 async def transfer(interaction: discord.Interaction, recipient: discord.Member, amount: float, currency_type: app_commands.Choice[str]):
     await interaction.response.defer(ephemeral=True)
 
-    if amount <= 0:
-        await interaction.followup.send("You must transfer a positive amount.", ephemeral=True)
-        return
-
-    if currency_type.value == 'campton_coin' and has_more_than_three_decimals(amount):
-        await interaction.followup.send("You can only transfer Campton Coin with up to 3 decimal places (e.g., 0.123).", ephemeral=True)
+    # Cash moves in cents and coins in milli-coins.
+    if currency_type.value == 'campton_coin':
+        fixed_amount = to_milli(amount)
+        if fixed_amount is None:
+            await interaction.followup.send("You can only transfer Campton Coin with up to 3 decimal places (e.g., 0.123).", ephemeral=True)
+            return
+    else:
+        fixed_amount = to_cents(amount)
+        if fixed_amount is None:
+            await interaction.followup.send("You can only transfer cash with up to 2 decimal places (e.g., 50.00).", ephemeral=True)
+            return
+    if not valid_amount(fixed_amount):
+        await interaction.followup.send("You must transfer a positive amount, and no more than the account limit.", ephemeral=True)
         return
 
     if interaction.user.id == recipient.id:
         await interaction.followup.send("You cannot transfer to yourself.", ephemeral=True)
         return
 
-    sender_data = get_user_data(interaction.user.id)
-    recipient_data = get_user_data(recipient.id)
     currency_value = currency_type.value
     currency_name = currency_type.name
 
@@ -799,32 +873,31 @@ async def transfer(interaction: discord.Interaction, recipient: discord.Member,
     feedback_message = ""
     recipient_dm_message = ""
 
-    if currency_value == 'cash':
-        if sender_data["balance"] < amount:
-            feedback_message = f"Insufficient funds. You only have {sender_data['balance']:.2f} dollars."
-        else:
-            sender_data["balance"] -= amount
-            recipient_data["balance"] += amount
-            transfer_successful = True
-            feedback_message = f"Successfully transferred {amount:.2f} dollars to {recipient.display_name}. Your new balance is {sender_data['balance']:.2f} dollars."
-            recipient_dm_message = f"You received {amount:.2f} dollars from {interaction.user.display_name}. Your new balance is {recipient_data['balance']:.2f} dollars."
-    elif currency_value == 'campton_coin':
-        coin_name = CAMPTOM_COIN_NAME
-        if coin_name not in sender_data["portfolio"] or sender_data["portfolio"][coin_name] < amount:
-            feedback_message = f"Insufficient Campton Coins. You only have {sender_data['portfolio'].get(coin_name, 0.0):.3f} {coin_name}(s)."
+    # The economy refuses a transfer that would take the recipient over the account limit.
+    try:
+        if currency_value == 'cash':
+            result = await economy.transfer(interaction.user.id, recipient.id, fixed_amount, currency_value)
+            if not result["ok"]:
+                feedback_message = f"Insufficient funds. You only have {format_cash(result['sender_balance'])} dollars."
+            else:
+                transfer_successful = True
+                feedback_message = f"Successfully transferred {format_cash(fixed_amount)} dollars to {recipient.display_name}. Your new balance is {format_cash(result['sender_balance'])} dollars."
+                recipient_dm_message = f"You received {format_cash(fixed_amount)} dollars from {interaction.user.display_name}. Your new balance is {format_cash(result['recipient_balance'])} dollars."
+        elif currency_value == 'campton_coin':
+            coin_name = CAMPTOM_COIN_NAME
+            result = await economy.transfer(interaction.user.id, recipient.id, fixed_amount, currency_value, coin_name)
+            if not result["ok"]:
+                feedback_message = f"Insufficient Campton Coins. You only have {format_coins(result['sender_coins'])} {coin_name}(s)."
+            else:
+                transfer_successful = True
+                feedback_message = f"Successfully transferred {format_coins(fixed_amount)} {coin_name}(s) to {recipient.display_name}. You now have {format_coins(result['sender_coins'])} {coin_name}(s)."
+                recipient_dm_message = f"You received {format_coins(fixed_amount)} {coin_name}(s) from {interaction.user.display_name}. You now have {format_coins(result['recipient_coins'])} {coin_name}(s)."
         else:
-            sender_data["portfolio"][coin_name] -= amount
-            recipient_data["portfolio"][coin_name] = recipient_data["portfolio"].get(coin_name, 0.0) + amount
-            if sender_data["portfolio"][coin_name] <= 0.0001:
-                del sender_data["portfolio"][coin_name]
-            transfer_successful = True
-            feedback_message = f"Successfully transferred {amount:.3f} {coin_name}(s) to {recipient.display_name}. You now have {sender_data['portfolio'].get(coin_name, 0.0):.3f} {coin_name}(s)."
-            recipient_dm_message = f"You received {amount:.3f} {coin_name}(s) from {interaction.user.display_name}. You now have {recipient_data['portfolio'].get(coin_name, 0.0):.3f} {coin_name}(s)."
-    else:
-        feedback_message = "Invalid currency type specified."
+            feedback_message = "Invalid currency type specified."
+    except ValueError as e:
+        feedback_message = f"Could not transfer: {e}"
 
     if transfer_successful:
-        save_data(market_data)
         await interaction.followup.send(feedback_message, ephemeral=True)
         if recipient_dm_message:
             try:
@@ -840,6 +913,215 @@ async def transfer(interaction: discord.Interaction, recipient: discord.Member,
     else:
         await interaction.followup.send(feedback_message, ephemeral=True)
 
+@bot.tree.command(name='marketupdates', description='Turns direct messages for market price updates on or off.')
+@app_commands.describe(enabled='Whether you want to receive market updates by DM.')
+async def market_updates(interaction: discord.Interaction, enabled: bool):
+    await interaction.response.defer(ephemeral=True)
+
+    if enabled:
+        announcement_bus.dm_subscribers.add(interaction.user.id)
+        message = "You will now receive a DM whenever the Campton Coin price updates."
+    else:
+        announcement_bus.dm_subscribers.discard(interaction.user.id)
+        message = "You will no longer receive market update DMs."
+    announcement_bus.save()
+    await interaction.followup.send(message, ephemeral=True)
+
+ALERT_DIRECTIONS = [
+    app_commands.Choice(name='Above', value='above'),
+    app_commands.Choice(name='Below', value='below')
+]
+
+@bot.tree.command(name='alert', description='Sends you a DM once Campton Coin\'s price rises above or falls below a level.')
+@app_commands.describe(direction='Whether to alert when the price rises above or falls below the level.', price='The price level in dollars (e.g., 150.00).')
+@app_commands.choices(direction=ALERT_DIRECTIONS)
+async def alert(interaction: discord.Interaction, direction: app_commands.Choice[str], price: float):
+    await interaction.response.defer(ephemeral=True)
+    coin_name = CAMPTOM_COIN_NAME
+
+    threshold = to_cents(price)
+    if threshold is None or not valid_amount(threshold):
+        await interaction.followup.send("The price must be a positive amount with up to 2 decimal places (e.g., 150.00).", ephemeral=True)
+        return
+
+    result = await economy.add_alert(interaction.user.id, coin_name, direction.value, threshold)
+    if result["ok"]:
+        message = f"You will get a DM once {coin_name} goes {direction.value} **{format_cash(threshold)} dollars** (currently {format_cash(result['price'])} dollars)."
+    elif result["reason"] == "already_crossed":
+        message = f"{coin_name} is already {direction.value} {format_cash(threshold)} dollars (currently {format_cash(result['price'])} dollars)."
+    elif result["reason"] == "duplicate":
+        message = f"You already have an alert for {coin_name} going {direction.value} {format_cash(threshold)} dollars."
+    elif result["reason"] == "limit":
+        message = f"You can have at most {result['limit']} price alerts. Use `/cancelalert` to remove one first."
+    else:
+        message = "Coin not found."
+    await interaction.followup.send(message, ephemeral=True)
+
+@bot.tree.command(name='alerts', description='Lists your active price alerts.')
+async def alerts(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+
+    active_alerts = await economy.alerts_for(interaction.user.id)
+    if not active_alerts:
+        await interaction.followup.send("You have no active price alerts. Use `/alert` to set one.", ephemeral=True)
+        return
+    lines = [f"- {entry['coin']} {entry['direction']} **{format_cash(entry['threshold'])} dollars**" for entry in active_alerts]
+    await interaction.followup.send("Your active price alerts:\n" + "\n".join(lines), ephemeral=True)
+
+@bot.tree.command(name='cancelalert', description='Removes one of your price alerts.')
+@app_commands.describe(direction='The direction of the alert to remove.', price='The price level of the alert to remove.')
+@app_commands.choices(direction=ALERT_DIRECTIONS)
+async def cancel_alert(interaction: discord.Interaction, direction: app_commands.Choice[str], price: float):
+    await interaction.response.defer(ephemeral=True)
+    coin_name = CAMPTOM_COIN_NAME
+
+    threshold = to_cents(price)
+    if threshold is None or not await economy.remove_alert(interaction.user.id, coin_name, direction.value, threshold):
+        await interaction.followup.send(f"You have no alert for {coin_name} going {direction.value} {price} dollars. Use `/alerts` to list yours.", ephemeral=True)
+        return
+    await interaction.followup.send(f"Removed your alert for {coin_name} going {direction.value} {format_cash(threshold)} dollars.", ephemeral=True)
+
+PLAN_ACTIONS = [
+    app_commands.Choice(name='Buy', value='buy'),
+    app_commands.Choice(name='Sell', value='sell')
+]
+
+@bot.tree.command(name='plan', description='Buys or sells Campton Coin automatically after every market price update.')
+@app_commands.describe(action='Buy a fixed amount of cash worth, or sell a share of your holding.', amount='Cash to spend for Buy (e.g., 100.00), or percent of your holding for Sell (e.g., 10).')
+@app_commands.choices(action=PLAN_ACTIONS)
+async def plan(interaction: discord.Interaction, action: app_commands.Choice[str], amount: float):
+    await interaction.response.defer(ephemeral=True)
+    coin_name = CAMPTOM_COIN_NAME
+
+    # Buy plans are stored in cents and sell plans in basis points, so both take up to 2 decimal places.
+    fixed_amount = to_cents(amount)
+    if action.value == "buy" and (fixed_amount is None or not valid_amount(fixed_amount)):
+        await interaction.followup.send(f"The amount must be between 0.01 and {format_cash(MAX_AMOUNT)} dollars, with up to 2 decimal places (e.g., 100.00).", ephemeral=True)
+        return
+    if action.value == "sell" and (fixed_amount is None or not 0 < fixed_amount <= 10000):
+        await interaction.followup.send("The percentage must be above 0 and at most 100, with up to 2 decimal places (e.g., 10).", ephemeral=True)
+        return
+
+    result = await economy.set_plan(interaction.user.id, coin_name, action.value, fixed_amount)
+    if not result["ok"]:
+        await interaction.followup.send("Coin not found." if result["reason"] == "unknown_coin" else "That amount is not valid.", ephemeral=True)
+        return
+    if action.value == "buy":
+        message = f"After every market price update you will buy **{format_cash(fixed_amount)} dollars** of {coin_name}."
+    else:
+        message = f"After every market price update you will sell **{format_cash(fixed_amount)}%** of your {coin_name}."
+    await interaction.followup.send(message + " Use `/plans` to see how your plans ran and `/cancelplan` to stop.", ephemeral=True)
+
+@bot.tree.command(name='plans', description='Lists your recurring plans and what they did at the last price update.')
+async def plans(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+
+    summary = await economy.plans_for(interaction.user.id)
+    if not summary["plans"]:
+        await interaction.followup.send("You have no recurring plans. Use `/plan` to set one.", ephemeral=True)
+        return
+    lines = ["Your recurring plans:"]
+    for coin_name, coin_plans in summary["plans"].items():
+        if "buy" in coin_plans:
+            lines.append(f"- Buy **{format_cash(coin_plans['buy'])} dollars** of {coin_name}")
+        if "sell" in coin_plans:
+            lines.append(f"- Sell **{format_cash(coin_plans['sell'])}%** of your {coin_name}")
+    last_run = summary["last_run"]
+    if last_run:
+        lines.append(f"\nLast run at {last_run['at']}:")
+        if last_run["bought"]:
+            lines.append(f"- Bought {format_coins(last_run['bought'])} coin(s) for {format_cash(last_run['spent'])} dollars")
+        if last_run["sold"]:
+            lines.append(f"- Sold {format_coins(last_run['sold'])} coin(s) for {format_cash(last_run['received'])} dollars")
+        for skipped in last_run["skipped"]:
+            lines.append(f"- Skipped {skipped}")
+    else:
+        lines.append("\nYour plans will run after the next market price update.")
+    await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+@bot.tree.command(name='cancelplan', description='Stops one of your recurring plans.')
+@app_commands.describe(action='The plan to stop.')
+@app_commands.choices(action=PLAN_ACTIONS)
+async def cancel_plan(interaction: discord.Interaction, action: app_commands.Choice[str]):
+    await interaction.response.defer(ephemeral=True)
+    coin_name = CAMPTOM_COIN_NAME
+
+    if not await economy.cancel_plan(interaction.user.id, coin_name, action.value):
+        await interaction.followup.send(f"You have no {action.value} plan for {coin_name}. Use `/plans` to list yours.", ephemeral=True)
+        return
+    await interaction.followup.send(f"Stopped your recurring {action.value} plan for {coin_name}.", ephemeral=True)
+
+@bot.tree.command(name='conversionreminders', description='Turns the automatic conversion countdown DMs on or off.')
+@app_commands.describe(enabled='Whether you want conversion countdown reminders while you hold Campton Coin.')
+async def conversion_reminders(interaction: discord.Interaction, enabled: bool):
+    await interaction.response.defer(ephemeral=True)
+
+    await economy.set_notifications(interaction.user.id, enabled)
+    if enabled:
+        message = "You will receive conversion countdown reminders while you hold Campton Coin."
+    else:
+        message = "You will no longer receive conversion countdown reminders."
+    await interaction.followup.send(message, ephemeral=True)
+
+@bot.tree.command(name='announcements', description='(Owner Only) Lists or changes where market updates are announced.')
+@app_commands.describe(
+    action='What to do.',
+    channel='The channel to add or remove.',
+    webhook_url='The webhook URL to add or remove.'
+)
+@app_commands.choices(action=[
+    app_commands.Choice(name='List destinations', value='list'),
+    app_commands.Choice(name='Add channel', value='add_channel'),
+    app_commands.Choice(name='Remove channel', value='remove_channel'),
+    app_commands.Choice(name='Add webhook', value='add_webhook'),
+    app_commands.Choice(name='Remove webhook', value='remove_webhook')
+])
+@app_commands.check(is_bot_owner_slash)
+async def announcements(interaction: discord.Interaction, action: app_commands.Choice[str], channel: discord.TextChannel = None, webhook_url: str = None):
+    await interaction.response.defer(ephemeral=True)
+
+    if action.value in ('add_channel', 'remove_channel') and channel is None:
+        await interaction.followup.send("Please specify a channel.", ephemeral=True)
+        return
+    if action.value in ('add_webhook', 'remove_webhook') and not webhook_url:
+        await interaction.followup.send("Please specify a webhook URL.", ephemeral=True)
+        return
+
+    if action.value == 'add_channel':
+        announcement_bus.channel_ids.add(channel.id)
+    elif action.value == 'remove_channel':
+        announcement_bus.channel_ids.discard(channel.id)
+    elif action.value == 'add_webhook':
+        try:
+            discord.Webhook.from_url(webhook_url, client=bot)
+        except ValueError:
+            await interaction.followup.send("That doesn't look like a valid Discord webhook URL.", ephemeral=True)
+            return
+        announcement_bus.webhook_urls.add(webhook_url)
+    elif action.value == 'remove_webhook':
+        announcement_bus.webhook_urls.discard(webhook_url)
+    if action.value != 'list':
+        announcement_bus.save()
+
+    channels_str = ", ".join(f"<#{channel_id}>" for channel_id in sorted(announcement_bus.channel_ids)) or "None"
+    await interaction.followup.send(
+        f"**Market update destinations**\n"
+        f"Channels: {channels_str}\n"
+        f"Webhooks: {len(announcement_bus.webhook_urls)}\n"
+        f"DM subscribers: {len(announcement_bus.dm_subscribers)}",
+        ephemeral=True
+    )
+
+@announcements.error
+async def announcements_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        await interaction.response.send_message("You must be the bot owner to use this command.", ephemeral=True)
+    else:
+        if interaction.response.is_done():
+            await interaction.followup.send(f"An unexpected error occurred: {error}", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
+
 @bot.tree.command(name='sendticketbutton', description='(Owner Only) Sends the "Open Ticket" button to the current channel.')
 @app_commands.check(is_bot_owner_slash)
 async def send_ticket_button(interaction: discord.Interaction):
@@ -900,12 +1182,11 @@ async def close(interaction: discord.Interaction):
         await interaction.followup.send("Ticket system is not fully configured. Please contact the bot owner.", ephemeral=True)
         return
 
-    if str(interaction.channel.id) not in market_data["tickets"]:
+    ticket_info = await economy.get_ticket(interaction.channel.id)
+    if ticket_info is None:
         await interaction.followup.send("This command can only be used in a ticket channel.", ephemeral=True)
         return
 
-    ticket_info = market_data["tickets"][str(interaction.channel.id)]
-    
     if interaction.user.id != ticket_info["user_id"] and interaction.user.id != bot.owner_id:
         await interaction.followup.send("You must be the ticket creator or bot owner to close this ticket.", ephemeral=True)
         return
@@ -920,13 +1201,29 @@ async def close(interaction: discord.Interaction):
             await button_interaction.followup.send("Only the person who initiated the close can confirm.", ephemeral=True)
             return
 
-        ticket_info["status"] = "closed"
-        ticket_info["closed_at"] = discord.utils.utcnow().isoformat()
-        save_data(market_data)
+        closed_ticket = await economy.close_ticket(interaction.channel.id)
+        if closed_ticket is None:
+            await button_interaction.followup.send("This ticket has already been closed.", ephemeral=True)
+            return
+
+        ticket_id = str(interaction.channel.id)
+        try:
+            entry = await transcript_archive.archive(interaction.channel, ticket_id, closed_ticket, closed_by=button_interaction.user.id)
+        except Exception as e:
+            # Without a transcript the channel is the only copy of the conversation, so it stays until archiving works.
+            # The ticket record stays too, so /close can simply be run again.
+            print(f"ERROR archiving transcript for ticket {interaction.channel.name} ({ticket_id}): {e}")
+            await button_interaction.followup.send(
+                f"The transcript could not be archived ({e}), so this channel was not deleted. Please try `/close` again later.",
+                ephemeral=True
+            )
+            return
+        # The transcript and its index entry now hold everything about this ticket, so drop it from the hot state.
+        await economy.remove_ticket(ticket_id)
+        print(f"Archived {entry['message_count']} messages from ticket {interaction.channel.name} ({ticket_id}).")
 
         await interaction.channel.send("Ticket closed. This channel will be deleted shortly.")
-        
-        await asyncio.sleep(5)
+        await asyncio.sleep(TICKET_CLOSE_DELAY_SECONDS)
         
         try:
             await interaction.channel.delete()
@@ -945,29 +1242,161 @@ async def close(interaction: discord.Interaction):
 
     await interaction.followup.send("Are you sure you want to close this ticket?", view=confirm_view, ephemeral=True)
 
-@bot.tree.command(name='clearmessages', description='(Owner Only) Clears a specified number of messages from the current channel.')
-@app_commands.describe(amount='The number of messages to clear (1-100).')
+@bot.tree.command(name='transcript', description='(Owner Only) Retrieves the archived transcript of a closed ticket.')
+@app_commands.describe(
+    ticket_id='The ticket (channel) ID of the transcript to retrieve.',
+    member='List or retrieve transcripts of tickets opened by this member.',
+    date='List or retrieve transcripts of tickets closed on this date (YYYY-MM-DD).'
+)
 @app_commands.check(is_bot_owner_slash)
-async def clearmessages(interaction: discord.Interaction, amount: int):
+async def transcript(interaction: discord.Interaction, ticket_id: str = None, member: discord.User = None, date: str = None):
     await interaction.response.defer(ephemeral=True)
 
-    if not (1 <= amount <= 100):
-        await interaction.followup.send("You can only clear between 1 and 100 messages.", ephemeral=True)
+    if ticket_id:
+        entry = transcript_archive.get(ticket_id)
+        matches = [entry] if entry else []
+    elif member or date:
+        matches = transcript_archive.find(user_id=member.id if member else None, date=date)
+    else:
+        await interaction.followup.send("Please provide a ticket ID, a member, or a date.", ephemeral=True)
         return
 
-    try:
-        deleted = await interaction.channel.purge(limit=amount)
-        await interaction.followup.send(f"Successfully cleared {len(deleted)} messages.", ephemeral=True)
-        print(f"Cleared {len(deleted)} messages in #{interaction.channel.name} by {interaction.user.display_name}.")
-    except discord.Forbidden:
+    if not matches:
+        await interaction.followup.send("No archived transcripts matched.", ephemeral=True)
+        return
+
+    if len(matches) > 1:
+        lines = [f"- `{e['ticket_id']}` by <@{e['user_id']}>, closed {e['closed_at'][:10]} ({e['message_count']} messages)" for e in matches[-20:]]
         await interaction.followup.send(
-            "I do not have permission to manage messages in this channel. Please ensure I have 'Manage Messages' permission.",
+            f"Found {len(matches)} transcripts (showing the latest {len(lines)}). Use `/transcript ticket_id:<id>` to retrieve one.\n" + "\n".join(lines),
             ephemeral=True
         )
-        print(f"ERROR: Bot lacks 'Manage Messages' permission in #{interaction.channel.name} for clearmessages.")
-    except Exception as e:
-        await interaction.followup.send(f"An unexpected error occurred: {e}", ephemeral=True)
-        print(f"ERROR clearing messages in #{interaction.channel.name}: {e}")
+        return
+
+    entry = matches[0]
+    spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+b')
+    for chunk in transcript_archive.iter_text(entry["ticket_id"]):
+        spool.write(chunk.encode('utf-8'))
+    size = spool.tell()
+    spool.seek(0)
+
+    if size > TRANSCRIPT_MAX_UPLOAD_BYTES:
+        spool.close()
+        transcript_file = discord.File(transcript_archive.transcript_path(entry["ticket_id"]), filename=entry["file"])
+    else:
+        transcript_file = discord.File(spool, filename=f"transcript-{entry['ticket_id']}.txt")
+    await interaction.followup.send(
+        f"Transcript for ticket `{entry['ticket_id']}` opened by <@{entry['user_id']}> ({entry['message_count']} messages).",
+        file=transcript_file,
+        ephemeral=True
+    )
+
+@transcript.error
+async def transcript_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        await interaction.response.send_message("You must be the bot owner to use this command.", ephemeral=True)
+    else:
+        if interaction.response.is_done():
+            await interaction.followup.send(f"An unexpected error occurred: {error}", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
+
+@bot.tree.command(name='whois', description='(Owner Only) Looks up a verified member by Roblox username or PNC name, or vice versa.')
+@app_commands.describe(
+    member='The member whose verification details to show.',
+    roblox_username='The Roblox username to look up.',
+    pnc_full_name='The Project New Campton full name to look up.'
+)
+@app_commands.check(is_bot_owner_slash)
+async def whois(interaction: discord.Interaction, member: discord.User = None, roblox_username: str = None, pnc_full_name: str = None):
+    await interaction.response.defer(ephemeral=True)
+
+    if member is None and not roblox_username and not pnc_full_name:
+        await interaction.followup.send("Please provide a member, a Roblox username, or a PNC full name.", ephemeral=True)
+        return
+
+    if member is not None:
+        user_ids = [member.id]
+    elif roblox_username:
+        owner_id = verification_registry.roblox_owner(roblox_username)
+        user_ids = [owner_id] if owner_id is not None else []
+    else:
+        user_ids = sorted(verification_registry.pnc_owners(pnc_full_name))
+
+    records = [verification_registry.get(user_id) for user_id in user_ids]
+    records = [record for record in records if record]
+    if not records:
+        await interaction.followup.send("No verified member matched.", ephemeral=True)
+        return
+
+    embed = discord.Embed(title="Verification Lookup", color=discord.Color.purple())
+    for record in records[:10]:
+        embed.add_field(
+            name=f"{record['roblox_username']}",
+            value=f"Member: <@{record['user_id']}> (`{record['user_id']}`)\n"
+                  f"PNC Name: {record['pnc_full_name']}\n"
+                  f"Verified: {(record.get('verified_at') or 'unknown')[:10]}",
+            inline=False
+        )
+    if len(records) > 1:
+        embed.set_footer(text=f"{len(records)} members share this name.")
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+@whois.error
+async def whois_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        await interaction.response.send_message("You must be the bot owner to use this command.", ephemeral=True)
+    else:
+        if interaction.response.is_done():
+            await interaction.followup.send(f"An unexpected error occurred: {error}", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
+
+@bot.tree.command(name='clearmessages', description='(Owner Only) Clears messages from the current channel in the background.')
+@app_commands.describe(
+    amount='The maximum number of messages to clear.',
+    member='Only clear messages sent by this member.',
+    bots_only='Only clear messages sent by bots.',
+    older_than_days='Only clear messages at least this many days old.',
+    newer_than_days='Only clear messages at most this many days old.'
+)
+@app_commands.check(is_bot_owner_slash)
+async def clearmessages(interaction: discord.Interaction, amount: int, member: discord.User = None, bots_only: bool = False,
+                        older_than_days: float = None, newer_than_days: float = None):
+    await interaction.response.defer(ephemeral=True)
+
+    if amount < 1:
+        await interaction.followup.send("You must clear at least 1 message.", ephemeral=True)
+        return
+
+    channel = interaction.channel
+    existing_job = active_purges.get(channel.id)
+    if existing_job and existing_job.state == "running":
+        await interaction.followup.send(f"A purge is already running in this channel. {existing_job.describe()} Use `/cancelpurge` to stop it.", ephemeral=True)
+        return
+
+    job = PurgeJob(
+        channel,
+        amount,
+        author_id=member.id if member else None,
+        older_than=timedelta(days=older_than_days) if older_than_days is not None else None,
+        newer_than=timedelta(days=newer_than_days) if newer_than_days is not None else None,
+        bots_only=bots_only,
+        requested_by=interaction.user.id
+    )
+    active_purges[channel.id] = job
+    progress_message = await interaction.followup.send(f"Started clearing up to {amount} messages. Use `/cancelpurge` to stop.", ephemeral=True, wait=True)
+
+    async def on_progress(purge_job):
+        try:
+            await progress_message.edit(content=purge_job.describe())
+        except discord.HTTPException:
+            pass # Interaction followups expire after 15 minutes; the final result is still printed.
+        if purge_job.state != "running" and active_purges.get(channel.id) is purge_job:
+            del active_purges[channel.id]
+
+    job.start(on_progress)
+    print(f"Started purge of up to {amount} messages in #{channel.name} by {interaction.user.display_name}.")
 
 @clearmessages.error
 async def clearmessages_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
@@ -983,6 +1412,31 @@ async def clearmessages_error(interaction: discord.Interaction, error: app_comma
         else:
             await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
 
+@bot.tree.command(name='cancelpurge', description='(Owner Only) Cancels the running message purge in the current or a specified channel.')
+@app_commands.describe(channel='The channel whose purge to cancel (defaults to current channel).')
+@app_commands.check(is_bot_owner_slash)
+async def cancel_purge(interaction: discord.Interaction, channel: discord.TextChannel = None):
+    await interaction.response.defer(ephemeral=True)
+    target_channel = channel or interaction.channel
+
+    job = active_purges.get(target_channel.id)
+    if job is None or not job.cancel():
+        await interaction.followup.send(f"There is no purge running in {target_channel.mention}.", ephemeral=True)
+        return
+
+    await interaction.followup.send(f"Cancelling the purge in {target_channel.mention}. {job.deleted} messages were deleted so far.", ephemeral=True)
+    print(f"Purge in #{target_channel.name} cancelled by {interaction.user.display_name}.")
+
+@cancel_purge.error
+async def cancel_purge_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        await interaction.response.send_message("You must be the bot owner to use this command.", ephemeral=True)
+    else:
+        if interaction.response.is_done():
+            await interaction.followup.send(f"An unexpected error occurred: {error}", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
+
 @bot.tree.command(name='lockdown', description='(Owner Only) Locks down the current channel or a specified channel.')
 @app_commands.describe(channel='The channel to lock down (defaults to current channel).')
 @app_commands.check(is_bot_owner_slash)
@@ -1068,6 +1522,9 @@ async def manual_convert(interaction: discord.Interaction):
     print(f"Manual crypto to cash conversion triggered by {interaction.user.display_name} ({interaction.user.id}).")
     
     converted_count = await _perform_crypto_to_cash_conversion()
+    if job_scheduler.running:
+        # The conversion set the next one an interval from now; move the scheduled job along with it.
+        await job_scheduler.reschedule(CONVERSION_JOB, datetime.datetime.fromisoformat(await economy.get_next_conversion_timestamp()))
     
     await interaction.followup.send(f"Manual crypto to cash conversion initiated. {converted_count} users had their Campton Coin converted. All affected users are now on a buy cooldown until the next price update.", ephemeral=True)
 
@@ -1081,6 +1538,38 @@ async def manual_convert_error(interaction: discord.Interaction, error: app_comm
         else:
             await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
 
-# This bot.py file is designed to be run via main.py, which starts the bot.
-# The `if __name__ == '__main__':` block is removed as main.py handles execution.
-bot.run(TOKEN)
+@bot.tree.command(name='diagnostics', description='(Owner Only) Shows event-loop lag, slow handlers and recent stalls.')
+@app_commands.check(is_bot_owner_slash)
+async def diagnostics(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
+
+    if loop_diagnostics is None:
+        await interaction.followup.send("Diagnostics are off. Start the bot with `DIAGNOSTICS_ENABLED=1` to collect them.", ephemeral=True)
+        return
+
+    report = loop_diagnostics.report()
+    if len(report) > 1900:
+        await interaction.followup.send(file=discord.File(io.BytesIO(report.encode()), filename="diagnostics.txt"), ephemeral=True)
+    else:
+        await interaction.followup.send(f"```\n{report}\n```", ephemeral=True)
+
+@diagnostics.error
+async def diagnostics_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if isinstance(error, app_commands.CheckFailure):
+        await interaction.response.send_message("You must be the bot owner to use this command.", ephemeral=True)
+    else:
+        if interaction.response.is_done():
+            await interaction.followup.send(f"An unexpected error occurred: {error}", ephemeral=True)
+        else:
+            await interaction.response.send_message(f"An unexpected error occurred: {error}", ephemeral=True)
+
+def main():
+    if TOKEN is None:
+        print("ERROR: DISCORD_BOT_TOKEN environment variable not found. Bot cannot start.")
+        exit()
+    bot.run(TOKEN)
+
+# This bot.py file is designed to be run via main.py, which starts the bot as a script.
+# Importing it (e.g. from loadtest.py) only sets up the bot and its commands without connecting.
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+# Event-loop diagnostics for bot.py (opt-in with DIAGNOSTICS_ENABLED=1).
+# - A sampler task measures how late the event loop wakes it up (event-loop lag).
+# - Every callback the loop runs is timed. Its wall and CPU time are attributed to the command or background
+#   task that owns it, giving a rolling per-handler profile of how long each one holds the loop. The profile
+#   is kept in fixed one-minute buckets and only the last few are kept, so /diagnostics shows recent behaviour
+#   rather than totals since startup.
+# - A watchdog thread notices when a single callback has held the loop longer than the stall threshold and
+#   captures the loop thread's stack while it is still stuck; the stall is logged with that stack and the
+#   handler responsible once the callback returns.
+# The per-callback cost is two clock reads and a dictionary update, so it is meant to be left on in production.
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+TASK_LOOP_PREFIX = "discord-ext-tasks: "
+JOB_TASK_PREFIX = "job:" # jobs run by scheduler.py
+
+
+class HandlerStats:
+    __slots__ = ("calls", "errors", "wall_total", "wall_max", "loop_time", "cpu_time", "block_max")
+
+    def __init__(self):
+        self.calls = 0 # commands that finished
+        self.errors = 0
+        self.wall_total = 0.0 # start to finish, including time spent awaiting
+        self.wall_max = 0.0
+        self.loop_time = 0.0 # time spent actually running on the event loop
+        self.cpu_time = 0.0
+        self.block_max = 0.0 # longest single uninterrupted run on the loop
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.wall_total += other.wall_total
+        self.wall_max = max(self.wall_max, other.wall_max)
+        self.loop_time += other.loop_time
+        self.cpu_time += other.cpu_time
+        self.block_max = max(self.block_max, other.block_max)
+
+
+class LoopDiagnostics:
+    def __init__(self, stall_threshold=0.25, sample_interval=0.1, history=600, max_stalls=20, bucket_seconds=60, buckets=15):
+        self.stall_threshold = stall_threshold
+        self.sample_interval = sample_interval
+        self.lag_samples = deque(maxlen=history)
+        self.stalls = deque(maxlen=max_stalls)
+        self.bucket_seconds = bucket_seconds
+        self.buckets = deque([{}], maxlen=buckets) # handler label -> HandlerStats, one dict per bucket, newest last
+        self._bucket_started = time.perf_counter()
+        self.started_at = None
+        self._labels = {} # asyncio.Task -> handler label
+        self._loop = None
+        self._loop_thread_id = None
+        self._original_run = None
+        self._callback_started = None # perf_counter() when the running callback started, None when idle
+        self._callback_serial = 0
+        self._captured = None # (serial, stack) captured by the watchdog for a callback that is still running
+        self._sampler = None
+        self._watchdog = None
+        self._stopping = threading.Event()
+
+    # --- Setup ---
+
+    def install(self, loop):
+        if self._loop is not None:
+            return
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self._original_run = asyncio.events.Handle._run
+        diagnostics = self
+
+        def timed_run(handle):
+            return diagnostics._run_handle(handle)
+        asyncio.events.Handle._run = timed_run
+        self._sampler = loop.create_task(self._sample_lag(), name="diagnostics-lag-sampler")
+        self._watchdog = threading.Thread(target=self._watch, name="diagnostics-watchdog", daemon=True)
+        self._watchdog.start()
+        print(f"Event-loop diagnostics enabled (stall threshold {self.stall_threshold * 1000:.0f} ms).")
+
+    def uninstall(self):
+        if self._loop is None:
+            return
+        asyncio.events.Handle._run = self._original_run
+        self._stopping.set()
+        if self._sampler is not None:
+            self._sampler.cancel()
+        self._loop = None
+
+    # --- Attribution ---
+
+    def label_current_task(self, label):
+        # Called when a command starts; the label sticks to the task until it finishes.
+        task = asyncio.current_task()
+        if task is None:
+            return
+        self._labels[task] = label
+        started = time.perf_counter()
+
+        def finished(done_task):
+            now = time.perf_counter()
+            wall = now - started
+            # Counted in the bucket the command finished in, like the rest of its loop time.
+            stats = self._stats_for(label, now)
+            stats.calls += 1
+            stats.wall_total += wall
+            stats.wall_max = max(stats.wall_max, wall)
+            if not done_task.cancelled() and done_task.exception() is not None:
+                stats.errors += 1
+            self._labels.pop(done_task, None)
+        task.add_done_callback(finished)
+
+    def _label_for(self, handle):
+        task = getattr(handle._callback, "__self__", None)
+        if not isinstance(task, asyncio.Task):
+            # Plain call_soon/call_later callbacks (e.g. batched economy commits) are grouped by function.
+            return "callback:" + getattr(handle._callback, "__qualname__", "other")
+        label = self._labels.get(task)
+        if label is not None:
+            return label
+        name = task.get_name()
+        if name.startswith(TASK_LOOP_PREFIX):
+            return "task:" + name[len(TASK_LOOP_PREFIX):]
+        if name.startswith(JOB_TASK_PREFIX):
+            return "task:" + name[len(JOB_TASK_PREFIX):]
+        if name.startswith("Task-"):
+            return "other tasks"
+        return name
+
+    def _rotate(self, now):
+        if now - self._bucket_started >= self.bucket_seconds:
+            # After an idle stretch, push one empty bucket per interval that passed, so each bucket covers one interval.
+            elapsed = int((now - self._bucket_started) // self.bucket_seconds)
+            for _ in range(min(elapsed, self.buckets.maxlen)):
+                self.buckets.append({})
+            self._bucket_started += elapsed * self.bucket_seconds
+
+    def _stats_for(self, label, now):
+        self._rotate(now)
+        bucket = self.buckets[-1]
+        stats = bucket.get(label)
+        if stats is None:
+            stats = bucket[label] = HandlerStats()
+        return stats
+
+    # --- Timing ---
+
+    def _run_handle(self, handle):
+        self._callback_serial += 1
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        self._callback_started = started
+        try:
+            return self._original_run(handle)
+        finally:
+            self._callback_started = None
+            finished = time.perf_counter()
+            elapsed = finished - started
+            label = self._label_for(handle)
+            stats = self._stats_for(label, finished)
+            stats.loop_time += elapsed
+            stats.cpu_time += time.thread_time() - cpu_started
+            if elapsed > stats.block_max:
+                stats.block_max = elapsed
+            if elapsed >= self.stall_threshold:
+                self._record_stall(label, elapsed, cpu_started)
+
+    def _record_stall(self, label, elapsed, cpu_started):
+        captured = self._captured
+        stack = captured[1] if captured and captured[0] == self._callback_serial else None
+        self._captured = None
+        stall = {
+            "at": time.time(),
+            "handler": label,
+            "duration": elapsed,
+            "cpu": time.thread_time() - cpu_started,
+            "stack": stack
+        }
+        self.stalls.append(stall)
+        print(f"Event loop blocked for {elapsed * 1000:.0f} ms by {label} (cpu {stall['cpu'] * 1000:.0f} ms).")
+        if stack:
+            print("".join(stack).rstrip())
+
+    def _watch(self):
+        # Runs in its own thread so it can look at the loop thread while it is stuck.
+        poll = max(self.stall_threshold / 4, 0.01)
+        while not self._stopping.wait(poll):
+            started = self._callback_started
+            serial = self._callback_serial
+            if started is None or time.perf_counter() - started < self.stall_threshold:
+                continue
+            if self._captured and self._captured[0] == serial:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                stack = traceback.format_stack(frame)
+                # Drop the event loop's own frames above the callback that is blocking.
+                for i in range(len(stack) - 1, -1, -1):
+                    if "asyncio" in stack[i] and "events.py" in stack[i]:
+                        stack = stack[i + 1:]
+                        break
+                self._captured = (serial, stack)
+
+    async def _sample_lag(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.sample_interval)
+            self.lag_samples.append(max(0.0, time.perf_counter() - started - self.sample_interval))
+
+    # --- Reporting ---
+
+    def lag_summary(self):
+        samples = sorted(self.lag_samples)
+        if not samples:
+            return {"samples": 0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+        return {
+            "samples": len(samples),
+            "p50": samples[len(samples) // 2],
+            "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            "max": samples[-1]
+        }
+
+    def recent_stats(self):
+        # The per-handler profile summed over the buckets still kept.
+        self._rotate(time.perf_counter())
+        totals = {}
+        for bucket in self.buckets:
+            for label, stats in bucket.items():
+                total = totals.get(label)
+                if total is None:
+                    total = totals[label] = HandlerStats()
+                total.merge(stats)
+        return totals
+
+    def report(self, limit=15):
+        lag = self.lag_summary()
+        window = (len(self.buckets) - 1) * self.bucket_seconds + (time.perf_counter() - self._bucket_started)
+        lines = [
+            f"Event-loop lag over the last {lag['samples']} samples: p50 {lag['p50'] * 1000:.1f} ms, "
+            f"p99 {lag['p99'] * 1000:.1f} ms, max {lag['max'] * 1000:.1f} ms",
+            "",
+            f"Handlers over the last {window / 60:.0f} min:",
+            f"{'handler':<32}{'calls':>6}{'err':>4}{'avg ms':>9}{'max ms':>9}{'loop ms':>9}{'cpu ms':>9}{'block':>8}"
+        ]
+        ordered = sorted(self.recent_stats().items(), key=lambda item: item[1].loop_time, reverse=True)
+        for label, stats in ordered[:limit]:
+            average = stats.wall_total / stats.calls if stats.calls else 0.0
+            lines.append(
+                f"{label[:31]:<32}{stats.calls:>6}{stats.errors:>4}{average * 1000:>9.1f}{stats.wall_max * 1000:>9.1f}"
+                f"{stats.loop_time * 1000:>9.0f}{stats.cpu_time * 1000:>9.0f}{stats.block_max * 1000:>8.0f}"
+            )
+        if self.stalls:
+            lines.append("")
+            lines.append(f"Recent stalls (>= {self.stall_threshold * 1000:.0f} ms):")
+            for stall in list(self.stalls)[-5:]:
+                where = stall["stack"][-1].strip().splitlines()[0] if stall["stack"] else "stack not captured"
+                lines.append(f"- {time.strftime('%H:%M:%S', time.gmtime(stall['at']))} {stall['handler']}: "
+                             f"{stall['duration'] * 1000:.0f} ms at {where}")
+        return "\n".join(lines)
@@ -0,0 +1,1127 @@
+# Economy state and rules.
+# The Economy class owns market_data (coins, users, tickets and the conversion schedule) and every
+# operation that reads or changes it. It has no Discord dependency: engine.py serves it to other
+# processes over a local socket, and bot.py can also run it in-process (see engine_client.py).
+# Every API method returns plain JSON-serializable values and never hands out references into the state.
+# market_data is a storage.SectionStore: each section is loaded on first use and only touched sections are saved.
+# Amounts are fixed-point integers throughout (see money.py): balances and prices in cents, holdings in milli-coins.
+import bisect
+import datetime
+import heapq
+import json
+import math
+import os
+import time
+from datetime import timedelta
+from operator import itemgetter
+from types import MappingProxyType
+
+import numpy as np
+
+import money
+from money import CENTS_PER_DOLLAR, MILLI_PER_COIN
+from performance import PerformanceLog, rank_by_net_worth, summarize
+from price_models import build_model
+from snapshot import SnapshotPublisher
+from storage import SectionStore
+
+CRYPTO_NAMES = ["Campton Coin"]
+CAMPTOM_COIN_NAME = "Campton Coin"
+
+DATA_FILE = os.environ.get('STOCK_MARKET_DATA_FILE', 'stock_market_data.json')
+SNAPSHOT_FILE = os.environ.get('MARKET_SNAPSHOT_FILE', 'market_snapshot.json')
+SNAPSHOT_INTERVAL = float(os.environ.get('MARKET_SNAPSHOT_INTERVAL', '5')) # minimum seconds between snapshots, see publish_snapshot()
+PERFORMANCE_DIR = os.environ.get('PERFORMANCE_HISTORY_DIR', 'performance_history') # net-worth samples, see performance.py
+STORAGE_ENCODING = os.environ.get('ECONOMY_STORAGE_ENCODING', 'json') # "json", "pretty" or "gzip", see storage.py
+
+# What a read of an account that doesn't exist returns. Reads never create accounts; only changes do.
+EMPTY_ACCOUNT = MappingProxyType({"balance": 0, "portfolio": MappingProxyType({}), "on_buy_cooldown": False, "accrued": 0})
+# The accrual indexes of an account that has never been settled (see _accrued_amounts).
+INITIAL_CHECKPOINT = MappingProxyType({"cash_index": 1.0, "dividend_index": MappingProxyType({})})
+
+# Each section is persisted to its own file (see storage.py).
+SECTION_DEFAULTS = {
+    "coins": dict,
+    "users": dict,
+    "tickets": dict,
+    "schedule": lambda: {"next_conversion_timestamp": None, "jobs": {}, "verifications": {}, "notification_opt_outs": []},
+    "accrual": lambda: {"cash_index": 1.0, "dividend_index": {}, "last_accrued_at": None},
+    "alerts": lambda: {"thresholds": {}, "pending": [], "next_id": 1},
+    "plans": dict,
+    "plan_runs": dict
+}
+
+# Storage format of the coins, users and accrual sections. Format 0 held float dollars and coins;
+# format 1 holds integer cents and milli-coins and is migrated to on load.
+LEDGER_FORMAT = 1
+
+# Prices are in cents per coin.
+MIN_PRICE = 5000
+MAX_PRICE = 23000
+INITIAL_PRICE = 12000
+
+VOLATILITY_LEVELS = [0.10, 0.20, 0.30, 0.40, 0.50, 0.60, 0.70, 0.80, 0.90, 1.00, 1.20, 1.50]
+
+# Coins without a "model" entry use the original tiered volatility behaviour.
+DEFAULT_PRICE_MODEL = {"name": "legacy", "params": {"volatility_levels": VOLATILITY_LEVELS}}
+
+CONVERSION_INTERVAL = timedelta(days=7)
+# The bot's conversion job (see scheduler.py). Its next run is next_conversion_timestamp, so the countdown
+# reminders and the conversion itself always agree.
+CONVERSION_JOB = "auto_convert_crypto_to_cash"
+
+# Interest on cash and dividends on coin holdings, credited once per ACCRUAL_INTERVAL.
+# The dividend is DIVIDEND_YIELD times the coin's price at the time of the payout, per coin held.
+# Credits are rounded down to the cent when an account is settled.
+ACCRUAL_INTERVAL = timedelta(days=1)
+CASH_INTEREST_RATE = float(os.environ.get('CASH_INTEREST_RATE', '0.0005'))
+DIVIDEND_YIELD = {CAMPTOM_COIN_NAME: float(os.environ.get('DIVIDEND_YIELD', '0.001'))}
+
+PRICE_HISTORY_LENGTH = 200 # price points kept per coin for /api/history
+LEADERBOARD_SIZE = 100
+MAX_ALERTS_PER_USER = 10
+MAX_ALERT_ATTEMPTS = 5 # deliveries of one triggered alert that may fail before it is dropped
+PLAN_ACTIONS = ("buy", "sell") # buy: cents spent per price update; sell: basis points of the holding sold per update
+BASIS_POINTS = 10000
+PLAN_SKIP_REASONS = {"sell": ("nothing to sell",), "buy": ("on buy cooldown", "amount too small", "insufficient funds")}
+
+# Methods that clients (engine_client.py) are allowed to call.
+API_METHODS = {
+    "get_prices", "get_price", "set_price_model", "update_prices",
+    "get_account", "get_accounts", "account_ids", "holder_ids", "accounts_reaching", "tracked_user_ids",
+    "set_notifications", "notifications_enabled", "countdown_recipients", "accrue", "accrual_status",
+    "compact_accounts",
+    "buy_coin", "sell_coin", "add_funds", "withdraw_funds", "transfer",
+    "convert_holdings", "get_next_conversion_timestamp", "job_schedule", "set_job_next_run", "performance",
+    "add_alert", "remove_alert", "alerts_for", "pending_alerts", "acknowledge_alerts",
+    "set_plan", "cancel_plan", "plans_for",
+    "open_ticket", "get_ticket", "open_tickets_for", "close_ticket", "remove_ticket",
+    "verifications", "audit",
+}
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+LEGACY_SECTIONS = ("coins", "users", "tickets", "schedule")
+
+
+def split_legacy_data(data):
+    # Maps the old single stock_market_data.json layout onto the sections.
+    # Verifications used to live inside each user record; they belong to the schedule section now.
+    users = data.get("users") or {}
+    verifications = {user_id_str: user.pop("verification") for user_id_str, user in users.items() if user.get("verification")}
+    for user in users.values():
+        user.pop("verification", None)
+    return {
+        "coins": data.get("coins") or {},
+        "users": users,
+        "tickets": data.get("tickets") or {},
+        "schedule": {"next_conversion_timestamp": data.get("next_conversion_timestamp"), "jobs": {}, "verifications": verifications, "notification_opt_outs": []}
+    }
+
+
+class Economy:
+    def __init__(self, data_file=DATA_FILE, snapshot_file=None, encoding=STORAGE_ENCODING, performance_dir=None):
+        self.data_file = data_file
+        self.market_data = SectionStore(data_file, SECTION_DEFAULTS, encoding, on_load=self._normalize_section, split_legacy=split_legacy_data, legacy_sections=LEGACY_SECTIONS)
+        self._price_models = {} # JSON-encoded model spec -> PriceModel, so each model keeps its random buffer between ticks
+        self._holders = None # coin name -> set of user ID strings with a positive balance of it, built on first use
+        self._opted_out = None # set of user ID strings that turned countdown reminders off, built on first use
+        self._alerts_by_user = None # see _alert_owners()
+        self._checkpoint = None # see _current_checkpoint()
+        self._plan_run_index = None # see _plan_run_rows()
+        self.snapshots = SnapshotPublisher(snapshot_file) if snapshot_file else None
+        self._snapshot_pending = False # coins or users changed since the last snapshot
+        self._snapshot_published_at = None
+        self.performance_log = PerformanceLog(performance_dir) if performance_dir else None
+        self._check_coins()
+        if self.snapshots is not None:
+            self._snapshot_pending = True
+            self.publish_snapshot(force=True)
+
+    # --- Persistence ---
+
+    def _normalize_section(self, name, data):
+        if name in ("coins", "users", "accrual") and self.market_data.format(name) < LEDGER_FORMAT:
+            self._migrate_to_fixed_point(name, data)
+            self.market_data.set_format(name, LEDGER_FORMAT)
+        if name == "users":
+            # Accounts settled at the same indexes share one checkpoint object again after a reload (see _accrued_columns).
+            checkpoints = {}
+            for user in data.values():
+                if "on_buy_cooldown" not in user: user["on_buy_cooldown"] = False
+                checkpoint = user.get("checkpoint")
+                if checkpoint is not None:
+                    key = (checkpoint["cash_index"], tuple(sorted(checkpoint["dividend_index"].items())))
+                    user["checkpoint"] = checkpoints.setdefault(key, checkpoint)
+        elif name == "alerts":
+            # Triggered alerts queued before they had IDs get one, so they can be acknowledged.
+            data.setdefault("next_id", 1)
+            for alert in data["pending"]:
+                if "id" not in alert:
+                    alert["id"] = data["next_id"]
+                    data["next_id"] += 1
+                    self.market_data.touch("alerts")
+        elif name == "schedule":
+            data.setdefault("jobs", {})
+            data.setdefault("verifications", {})
+            data.setdefault("notification_opt_outs", [])
+            if data.get("next_conversion_timestamp") is None:
+                data["next_conversion_timestamp"] = (utcnow() + CONVERSION_INTERVAL).isoformat()
+                self.market_data.touch("schedule")
+
+    def _migrate_to_fixed_point(self, name, data):
+        # Float dollars and coins from format 0 become integer cents and milli-coins. Float residue such as
+        # 49.999999999 coins is rounded away here, once, instead of being fuzzed around on every trade.
+        if name == "coins":
+            for coin_data in data.values():
+                coin_data["price"] = money.cents_from_float(coin_data["price"])
+                for point in coin_data.get("history", []):
+                    point["price"] = money.cents_from_float(point["price"])
+            self._recount_supply(data)
+        elif name == "users":
+            for user in data.values():
+                user["balance"] = money.cents_from_float(user.get("balance", 0.0))
+                portfolio = {coin_name: money.milli_from_float(quantity) for coin_name, quantity in user.get("portfolio", {}).items()}
+                user["portfolio"] = {coin_name: quantity for coin_name, quantity in portfolio.items() if quantity != 0}
+                if "accrued" in user:
+                    user["accrued"] = money.cents_from_float(user["accrued"])
+                if "checkpoint" in user:
+                    dividend_index = user["checkpoint"]["dividend_index"]
+                    for coin_name in dividend_index:
+                        dividend_index[coin_name] *= CENTS_PER_DOLLAR
+        elif name == "accrual":
+            for coin_name in data["dividend_index"]:
+                data["dividend_index"][coin_name] *= CENTS_PER_DOLLAR
+        print(f"Migrated the {name} section to fixed-point amounts.")
+
+    def _recount_supply(self, coins):
+        # Each coin tracks the milli-coins in circulation ("supply") and the net cash paid into the market for
+        # it ("reserve"), so audit() can check exactly that trades neither create nor destroy coins or cash.
+        users = self.market_data["users"]
+        for coin_name, coin_data in coins.items():
+            coin_data["supply"] = sum(user["portfolio"].get(coin_name, 0) for user in users.values())
+            coin_data.setdefault("reserve", 0)
+
+    @property
+    def dirty(self):
+        return self.market_data.dirty
+
+    def save(self):
+        saved = self.market_data.save()
+        if self.snapshots is not None and ("coins" in saved or "users" in saved):
+            self._snapshot_pending = True
+        return saved
+
+    def commit(self):
+        # Called once per request (or per batch of requests) by whoever drives the economy.
+        # Only the sections touched since the last commit are written.
+        if self.dirty:
+            self.save()
+
+    def _check_coins(self):
+        coins = self.market_data["coins"]
+        if CAMPTOM_COIN_NAME not in coins or len(coins) != len(CRYPTO_NAMES):
+            self.market_data["coins"] = {name: {"price": INITIAL_PRICE} for name in CRYPTO_NAMES}
+            self._recount_supply(self.market_data["coins"])
+            self.save()
+        elif coins[CAMPTOM_COIN_NAME]["price"] < MIN_PRICE or coins[CAMPTOM_COIN_NAME]["price"] > MAX_PRICE:
+            print(f"Detected Campton Coin price outside bounds ({money.format_cash(coins[CAMPTOM_COIN_NAME]['price'])}). Resetting to INITIAL_PRICE.")
+            coins[CAMPTOM_COIN_NAME]["price"] = INITIAL_PRICE
+            self.market_data.touch("coins")
+            self.save()
+
+    # --- Accounts ---
+
+    def find_user(self, user_id):
+        # Read-only lookup: a view of the account brought current with its interest and dividends, or EMPTY_ACCOUNT.
+        # Nothing is settled or marked dirty here; get_user_data settles the account when it is about to change.
+        user = self.market_data["users"].get(str(user_id))
+        if user is None:
+            return EMPTY_ACCOUNT
+        balance = self._accrued_balance(user)
+        if balance == user["balance"]:
+            return MappingProxyType(user)
+        return MappingProxyType({**user, "balance": balance, "accrued": user.get("accrued", 0) + balance - user["balance"]})
+
+    def get_user_data(self, user_id):
+        # Get-or-create, for operations that are about to change the account.
+        users = self.market_data["users"]
+        if str(user_id) not in users:
+            users[str(user_id)] = {"balance": 0, "portfolio": {}, "on_buy_cooldown": False, "checkpoint": self._current_checkpoint()}
+            return users[str(user_id)]
+        user = users[str(user_id)]
+        self._settle(user)
+        return user
+
+    @staticmethod
+    def _account_view(user):
+        return {
+            "balance": user["balance"],
+            "portfolio": dict(user["portfolio"]),
+            "on_buy_cooldown": user.get("on_buy_cooldown", False),
+            "accrued": user.get("accrued", 0)
+        }
+
+    def get_account(self, user_id):
+        return self._account_view(self.find_user(user_id))
+
+    def get_accounts(self, user_ids):
+        return {str(user_id): self.get_account(user_id) for user_id in user_ids}
+
+    def account_ids(self):
+        return [int(user_id_str) for user_id_str in self.market_data["users"]]
+
+    def _holder_index(self):
+        if self._holders is None:
+            self._holders = {coin_name: set() for coin_name in self.market_data["coins"]}
+            for user_id_str, user in self.market_data["users"].items():
+                self._reindex_holder(user_id_str, user)
+        return self._holders
+
+    def _reindex_holder(self, user_id_str, user):
+        # Called whenever a user's portfolio changes so holder_ids() never has to scan every account.
+        if self._holders is None:
+            return
+        portfolio = user.get("portfolio", {}) if user is not None else {}
+        for coin_name, holders in self._holders.items():
+            if portfolio.get(coin_name, 0) > 0:
+                holders.add(user_id_str)
+            else:
+                holders.discard(user_id_str)
+
+    def holder_ids(self, coin_name):
+        return sorted(int(user_id_str) for user_id_str in self._holder_index().get(coin_name, ()))
+
+    def accounts_reaching(self, min_balance, coin_name, min_quantity):
+        # IDs of accounts whose balance (including accrual) or holding of coin_name reaches its threshold, in one
+        # vectorized pass, so jobs like the investor role check only have to look at those members.
+        users = self.market_data["users"]
+        accounts = list(users.values())
+        balances, _, _ = self._accrued_columns(accounts)
+        holdings = np.fromiter((user["portfolio"].get(coin_name, 0) for user in accounts), dtype=np.int64, count=len(accounts))
+        user_id_strs = list(users)
+        return [int(user_id_strs[i]) for i in np.flatnonzero((balances >= min_balance) | (holdings >= min_quantity))]
+
+    def tracked_user_ids(self):
+        # Users the bot keeps cached in low-memory mode: account holders and anyone with an open ticket.
+        tracked = set(self.account_ids())
+        for ticket_info in self.market_data["tickets"].values():
+            if ticket_info["status"] == "open":
+                tracked.add(ticket_info["user_id"])
+        return sorted(tracked)
+
+    def verifications(self):
+        # Verifications imported from the old single-file layout, read once by the bot to migrate them into its
+        # VerificationRegistry. The registry is the only place new verifications are recorded.
+        return {user_id_str: dict(verification) for user_id_str, verification in self.market_data["schedule"]["verifications"].items()}
+
+    def compact_accounts(self):
+        # Removes accounts that hold nothing worth keeping: no cash, no coins, no cooldown and no open ticket.
+        # They read back as EMPTY_ACCOUNT, so removing them changes nothing for the user. Verifications live in the
+        # bot's VerificationRegistry, not in accounts, so they are unaffected.
+        users = self.market_data["users"]
+        ticket_holders = {str(t["user_id"]) for t in self.market_data["tickets"].values() if t["status"] == "open"}
+        removed = 0
+        for user_id_str, user in list(users.items()):
+            if user_id_str in ticket_holders:
+                continue
+            if user.get("on_buy_cooldown") or any(quantity > 0 for quantity in user["portfolio"].values()):
+                continue
+            if self._accrued_balance(user) != 0:
+                continue
+            del users[user_id_str]
+            self._reindex_holder(user_id_str, None)
+            removed += 1
+        if removed:
+            self.market_data.touch("users")
+            print(f"Compacted {removed} empty accounts ({len(users)} remain).")
+        return removed
+
+    # --- Interest and dividends ---
+    # Accrual is lazy. Each period only moves two global indexes:
+    #   cash_index           grows by (1 + CASH_INTEREST_RATE) per period
+    #   dividend_index[coin] grows by dividend-per-coin (in cents) / cash_index at each payout
+    # Dividends are stored divided by the cash index at the time they were paid, so they keep earning interest
+    # afterwards. An account remembers the indexes it was last settled at ("checkpoint"); bringing it current is
+    #   balance = ((balance + remainder) / checkpoint_cash + sum(coins * (dividend_index - checkpoint_dividend))) * cash_index
+    # which is exact as long as the balance and holdings didn't change since the checkpoint. They can't: anything
+    # that changes an account settles it first, and settling always moves the checkpoint to the current indexes,
+    # even when less than a cent was credited. Otherwise money arriving later would be paid interest and
+    # dividends for the periods before it arrived.
+    # The indexes are floats. The settled balance is floored to whole cents and the sub-cent rest is kept as the
+    # account's "remainder", so small balances still earn their interest eventually.
+
+    def _current_checkpoint(self):
+        # Shared by every account settled at the current indexes; checkpoints are replaced, never changed in place.
+        if self._checkpoint is None:
+            accrual = self.market_data["accrual"]
+            self._checkpoint = {"cash_index": accrual["cash_index"], "dividend_index": dict(accrual["dividend_index"])}
+        return self._checkpoint
+
+    def _is_current(self, user):
+        checkpoint = user.get("checkpoint")
+        current = self._current_checkpoint()
+        return checkpoint is current or checkpoint == current
+
+    def _accrued_amounts(self, user):
+        # The account's cash brought current: (whole cents, sub-cent remainder).
+        if self._is_current(user):
+            return user["balance"], user.get("remainder", 0.0)
+        accrual = self.market_data["accrual"]
+        # Accounts from before accrual existed have no checkpoint and start from the initial indexes.
+        checkpoint = user.get("checkpoint") or INITIAL_CHECKPOINT
+        units = (user["balance"] + user.get("remainder", 0.0)) / checkpoint["cash_index"]
+        for coin_name, quantity in user["portfolio"].items():
+            units += quantity * (accrual["dividend_index"].get(coin_name, 0.0) - checkpoint["dividend_index"].get(coin_name, 0.0)) / MILLI_PER_COIN
+        exact = units * accrual["cash_index"]
+        # The small epsilon keeps a balance that round-trips through the indexes from losing a cent to float error.
+        balance = math.floor(exact + 1e-6)
+        return balance, max(exact - balance, 0.0)
+
+    def _accrued_balance(self, user):
+        return self._accrued_amounts(user)[0]
+
+    def _accrued_columns(self, accounts):
+        # _accrued_amounts for many accounts in one vectorized pass: (balances, remainders, current), where
+        # current marks the accounts that are already settled at the current indexes.
+        # Accounts settled together share one checkpoint, so the indexes are looked up once per distinct checkpoint.
+        accrual = self.market_data["accrual"]
+        checkpoint_now = self._current_checkpoint()
+        coin_names = list(accrual["dividend_index"])
+        count = len(accounts)
+        checkpoints = [user.get("checkpoint") or INITIAL_CHECKPOINT for user in accounts]
+        slot_of = {}
+        slots = np.fromiter((slot_of.setdefault(id(checkpoint), len(slot_of)) for checkpoint in checkpoints), dtype=np.intp, count=count)
+        distinct = list({id(checkpoint): checkpoint for checkpoint in checkpoints}.values())
+        current = np.array([checkpoint is checkpoint_now or checkpoint == checkpoint_now for checkpoint in distinct], dtype=bool)[slots]
+        balances = np.fromiter((user["balance"] for user in accounts), dtype=np.int64, count=count)
+        remainders = np.fromiter((user.get("remainder", 0.0) for user in accounts), dtype=float, count=count)
+        if current.all():
+            return balances, remainders, current
+        checkpoint_cash = np.array([checkpoint["cash_index"] for checkpoint in distinct], dtype=float)[slots]
+        checkpoint_dividend = np.array([[checkpoint["dividend_index"].get(coin_name, 0.0) for coin_name in coin_names] for checkpoint in distinct], dtype=float).reshape(len(distinct), len(coin_names))[slots]
+        holdings = np.zeros((count, len(coin_names)), dtype=np.int64)
+        for column, coin_name in enumerate(coin_names):
+            holdings[:, column] = np.fromiter((user["portfolio"].get(coin_name, 0) for user in accounts), dtype=np.int64, count=count)
+        dividend_index = np.array([accrual["dividend_index"][coin_name] for coin_name in coin_names], dtype=float)
+
+        units = (balances + remainders) / checkpoint_cash + (holdings * (dividend_index - checkpoint_dividend)).sum(axis=1) / MILLI_PER_COIN
+        exact = units * accrual["cash_index"]
+        settled = np.floor(exact + 1e-6)
+        balances = np.where(current, balances, settled.astype(np.int64))
+        remainders = np.where(current, remainders, np.maximum(exact - settled, 0.0))
+        return balances, remainders, current
+
+    def _settle(self, user):
+        # Must run before anything changes the account's balance or holdings (see above).
+        if not self._is_current(user):
+            self._set_checkpoint(user, *self._accrued_amounts(user))
+
+    def _set_checkpoint(self, user, balance, remainder):
+        user["accrued"] = user.get("accrued", 0) + balance - user["balance"]
+        user["balance"] = balance
+        if remainder:
+            user["remainder"] = remainder
+        else:
+            user.pop("remainder", None)
+        user["checkpoint"] = self._current_checkpoint()
+        self.market_data.touch("users")
+
+    def accrue(self, now=None):
+        # Applies every full period elapsed since the last accrual in O(coins), whatever the number of accounts.
+        accrual = self.market_data["accrual"]
+        now = now or utcnow()
+        if accrual["last_accrued_at"] is None:
+            accrual["last_accrued_at"] = now.isoformat()
+            self.market_data.touch("accrual")
+            return 0
+        last = datetime.datetime.fromisoformat(accrual["last_accrued_at"])
+        periods = int((now - last) / ACCRUAL_INTERVAL)
+        if periods <= 0:
+            return 0
+
+        growth = 1.0 + CASH_INTEREST_RATE
+        # Payouts happen at the end of each period, after that period's interest:
+        # sum over k = 1..periods of 1 / (cash_index * growth^k)
+        if CASH_INTEREST_RATE:
+            discount = (1.0 - growth ** -periods) / CASH_INTEREST_RATE
+        else:
+            discount = float(periods)
+        for coin_name, coin_data in self.market_data["coins"].items():
+            dividend_per_coin = DIVIDEND_YIELD.get(coin_name, 0.0) * coin_data["price"]
+            if dividend_per_coin:
+                accrual["dividend_index"][coin_name] = accrual["dividend_index"].get(coin_name, 0.0) + dividend_per_coin * discount / accrual["cash_index"]
+        accrual["cash_index"] *= growth ** periods
+        accrual["last_accrued_at"] = (last + periods * ACCRUAL_INTERVAL).isoformat()
+        self._checkpoint = None
+        self.market_data.touch("accrual")
+        print(f"Accrued {periods} period(s) of interest and dividends.")
+        return periods
+
+    def accrual_status(self):
+        accrual = self.market_data["accrual"]
+        return {
+            "cash_index": accrual["cash_index"],
+            "dividend_index": dict(accrual["dividend_index"]),
+            "last_accrued_at": accrual["last_accrued_at"],
+            "interest_rate": CASH_INTEREST_RATE,
+            "dividend_yield": dict(DIVIDEND_YIELD)
+        }
+
+    # --- Notification preferences ---
+
+    def _opt_outs(self):
+        if self._opted_out is None:
+            self._opted_out = set(self.market_data["schedule"]["notification_opt_outs"])
+        return self._opted_out
+
+    def set_notifications(self, user_id, enabled):
+        opted_out = self._opt_outs()
+        if enabled:
+            opted_out.discard(str(user_id))
+        else:
+            opted_out.add(str(user_id))
+        self.market_data["schedule"]["notification_opt_outs"] = sorted(opted_out)
+        self.market_data.touch("schedule")
+        return enabled
+
+    def notifications_enabled(self, user_id):
+        return str(user_id) not in self._opt_outs()
+
+    def countdown_recipients(self, coin_name):
+        # Conversion countdown reminders only concern people holding the coin who haven't opted out.
+        return sorted(int(user_id_str) for user_id_str in self._holder_index().get(coin_name, set()) - self._opt_outs())
+
+    # --- Prices ---
+
+    def get_prices(self):
+        return {coin_name: coin_data["price"] for coin_name, coin_data in self.market_data["coins"].items()}
+
+    def get_price(self, coin_name):
+        coin_data = self.market_data["coins"].get(coin_name)
+        return coin_data["price"] if coin_data else None
+
+    def _get_price_model(self, spec):
+        key = json.dumps(spec, sort_keys=True)
+        if key not in self._price_models:
+            self._price_models[key] = build_model(spec) # never seeded, see price_models.py
+        return self._price_models[key]
+
+    def set_price_model(self, coin_name, spec):
+        if coin_name not in self.market_data["coins"]:
+            raise ValueError(f"Unknown coin '{coin_name}'.")
+        # A seed would only make every restart replay the same prices, so it isn't saved (see price_models.py).
+        spec = {key: value for key, value in spec.items() if key != "seed"}
+        if spec.get("name") == "legacy" and not spec.get("params"):
+            spec = dict(DEFAULT_PRICE_MODEL)
+        # build_model checks the parameters; a trial step on a throwaway copy (so the live model's random
+        # sequence is untouched) catches anything else before the spec is persisted and used by every tick.
+        try:
+            trial_prices, _ = build_model(spec).step(
+                np.array([self.market_data["coins"][coin_name]["price"] / CENTS_PER_DOLLAR]), np.zeros(1, dtype=int))
+        except (TypeError, IndexError, KeyError) as e:
+            raise ValueError(f"the model failed a trial price update: {e}")
+        if not np.all(np.isfinite(trial_prices)):
+            raise ValueError("the model produced a price that is not a finite number")
+        model = self._get_price_model(spec)
+        self.market_data["coins"][coin_name]["model"] = spec
+        self.market_data["coins"][coin_name].pop("regime", None)
+        self.market_data.touch("coins")
+        return model.params
+
+    def update_prices(self):
+        # Coins sharing a model spec are stepped together in one vectorized call.
+        coins_by_model = {}
+        for coin_name, coin_data in self.market_data["coins"].items():
+            spec = coin_data.get("model") or DEFAULT_PRICE_MODEL
+            coins_by_model.setdefault(json.dumps(spec, sort_keys=True), (spec, []))[1].append(coin_name)
+
+        for spec, coin_names in coins_by_model.values():
+            model = self._get_price_model(spec)
+            # The models work in dollars; prices go back to whole cents before they are stored.
+            prices = np.array([self.market_data["coins"][coin_name]["price"] for coin_name in coin_names], dtype=float) / CENTS_PER_DOLLAR
+            states = np.array([self.market_data["coins"][coin_name].get("regime", 0) for coin_name in coin_names], dtype=int)
+            new_prices, new_states = model.step(prices, states)
+            new_prices = np.clip(np.rint(new_prices * CENTS_PER_DOLLAR), MIN_PRICE, MAX_PRICE).astype(np.int64)
+            for i, coin_name in enumerate(coin_names):
+                self._trigger_alerts(coin_name, self.market_data["coins"][coin_name]["price"], int(new_prices[i]))
+                self.market_data["coins"][coin_name]["price"] = int(new_prices[i])
+                history = self.market_data["coins"][coin_name].setdefault("history", [])
+                history.append({"at": utcnow().isoformat(), "price": int(new_prices[i])})
+                del history[:-PRICE_HISTORY_LENGTH]
+                if model.name == "regime":
+                    self.market_data["coins"][coin_name]["regime"] = int(new_states[i])
+
+        for user_id_str in self.market_data["users"]:
+            self.market_data["users"][user_id_str]["on_buy_cooldown"] = False
+
+        self._run_plans()
+        if self.performance_log is not None:
+            self._record_performance()
+        self.market_data.touch("coins", "users")
+        print("Market price updated and buy cooldown cleared for all users.")
+        return self.get_prices()
+
+    # --- Recurring plans ---
+    # Standing orders that run right after every price update: a "buy" plan spends a fixed amount of cash and a
+    # "sell" plan sells a share of the holding. All plans are settled together in update_prices, so they land in
+    # the same commit as the new price. Each coin's plans are read into columns once (accrual included, see
+    # _accrued_columns), then priced and checked with array arithmetic under the buy_coin/sell_coin rules (no
+    # buying on cooldown, costs rounded up, proceeds rounded down). Only the accounts that trade are settled and
+    # written back. Sells run before buys.
+    # The results of the last run are kept column-wise in the plan_runs section, one row per member with plans,
+    # like the performance log; plans_for() picks out one member's row.
+
+    @staticmethod
+    def _valid_plan_amount(action, amount):
+        # Buy amounts are bounded like any other cash amount, so _run_plans' int64 columns can't overflow.
+        return money.valid_amount(amount) and (action != "sell" or amount <= BASIS_POINTS)
+
+    def set_plan(self, user_id, coin_name, action, amount):
+        # amount is cents for "buy" (at most money.MAX_AMOUNT) and basis points (1-10000) for "sell".
+        if coin_name not in self.market_data["coins"]:
+            return {"ok": False, "reason": "unknown_coin"}
+        if action not in PLAN_ACTIONS:
+            raise ValueError(f"Invalid plan action '{action}'.")
+        if not self._valid_plan_amount(action, amount):
+            return {"ok": False, "reason": "invalid_amount"}
+        self.market_data["plans"].setdefault(str(user_id), {}).setdefault(coin_name, {})[action] = amount
+        self.market_data.touch("plans")
+        return {"ok": True}
+
+    def cancel_plan(self, user_id, coin_name, action):
+        user_plans = self.market_data["plans"].get(str(user_id))
+        if user_plans is None or user_plans.get(coin_name, {}).pop(action, None) is None:
+            return False
+        if not user_plans[coin_name]:
+            del user_plans[coin_name]
+        if not user_plans:
+            del self.market_data["plans"][str(user_id)]
+        self.market_data.touch("plans")
+        return True
+
+    def _plan_run_rows(self):
+        # user ID string -> (row in the last run, skip messages), built on first use after each run.
+        if self._plan_run_index is None:
+            last_run = self.market_data["plan_runs"]
+            self._plan_run_index = {user_id_str: (row, []) for row, user_id_str in enumerate(last_run.get("user_ids", []))}
+            for row, message in zip(last_run.get("skipped_rows", []), last_run.get("skipped", [])):
+                self._plan_run_index[last_run["user_ids"][row]][1].append(message)
+        return self._plan_run_index
+
+    def plans_for(self, user_id):
+        user_plans = self.market_data["plans"].get(str(user_id), {})
+        last_run = self.market_data["plan_runs"]
+        found = self._plan_run_rows().get(str(user_id))
+        return {
+            "plans": {coin_name: dict(coin_plans) for coin_name, coin_plans in user_plans.items()},
+            "last_run": None if found is None else {
+                "at": last_run["at"],
+                **{column: last_run[column][found[0]] for column in ("bought", "spent", "sold", "received")},
+                "skipped": list(found[1])
+            }
+        }
+
+    def _run_plans(self):
+        plans = self.market_data["plans"]
+        if not plans:
+            return 0
+        started = time.perf_counter()
+        users = self.market_data["users"]
+        user_ids = list(plans)
+        totals = {column: np.zeros(len(user_ids), dtype=np.int64) for column in ("bought", "spent", "sold", "received")}
+        skipped_rows, skipped = [], []
+        settled = 0
+        for coin_name, coin_data in self.market_data["coins"].items():
+            price = coin_data["price"]
+            for action in ("sell", "buy"):
+                rows = []
+                for row, user_plans in enumerate(plans.values()):
+                    amount = user_plans.get(coin_name, {}).get(action)
+                    if amount is None:
+                        continue
+                    if self._valid_plan_amount(action, amount):
+                        rows.append((row, amount))
+                    else:
+                        # Saved before amounts were bounded; skipped rather than allowed to break the price tick.
+                        skipped_rows.append(row)
+                        skipped.append(f"{action} {coin_name}: invalid amount")
+                if not rows:
+                    continue
+                count = len(rows)
+                plan_rows = np.fromiter((row for row, _ in rows), dtype=np.intp, count=count)
+                amounts = np.fromiter((amount for _, amount in rows), dtype=np.int64, count=count)
+                # A plan can outlive its account; EMPTY_ACCOUNT has nothing to sell and nothing to buy with.
+                accounts = [users.get(user_ids[row], EMPTY_ACCOUNT) for row, _ in rows]
+                # Accounts are settled from these columns, and only if they actually trade.
+                balances, remainders, current = self._accrued_columns(accounts)
+                if action == "sell":
+                    holdings = np.fromiter((user["portfolio"].get(coin_name, 0) for user in accounts), dtype=np.int64, count=count)
+                    quantity = holdings * amounts // BASIS_POINTS
+                    cash = quantity * price // MILLI_PER_COIN
+                    ok = quantity > 0
+                    reasons = np.zeros(count, dtype=np.intp)
+                else:
+                    cooldown = np.fromiter((bool(user.get("on_buy_cooldown")) for user in accounts), dtype=bool, count=count)
+                    quantity = amounts * MILLI_PER_COIN // price
+                    cash = -(-quantity * price // MILLI_PER_COIN)
+                    ok = ~cooldown & (quantity > 0) & (balances >= cash)
+                    reasons = np.select([cooldown, quantity <= 0], [0, 1], 2)
+
+                # Plain lists from here on: indexing NumPy scalars one at a time is slower than the write-back itself.
+                executed = np.flatnonzero(ok)
+                for i, q, c, stale, balance, remainder in zip(executed.tolist(), quantity[ok].tolist(), cash[ok].tolist(), (~current[ok]).tolist(),
+                                                              balances[ok].tolist(), remainders[ok].tolist()):
+                    user = accounts[i]
+                    if stale:
+                        self._set_checkpoint(user, balance, remainder)
+                    portfolio = user["portfolio"]
+                    if action == "sell":
+                        portfolio[coin_name] -= q
+                        user["balance"] += c
+                        if portfolio[coin_name] == 0:
+                            del portfolio[coin_name]
+                            self._reindex_holder(user_ids[rows[i][0]], user)
+                    else:
+                        held = portfolio.get(coin_name, 0)
+                        portfolio[coin_name] = held + q
+                        user["balance"] -= c
+                        if held == 0:
+                            self._reindex_holder(user_ids[rows[i][0]], user)
+                np.add.at(totals["sold" if action == "sell" else "bought"], plan_rows[ok], quantity[ok])
+                np.add.at(totals["received" if action == "sell" else "spent"], plan_rows[ok], cash[ok])
+                messages = [f"{action} {coin_name}: {reason}" for reason in PLAN_SKIP_REASONS[action]]
+                skipped_rows.extend(plan_rows[~ok].tolist())
+                skipped.extend(map(messages.__getitem__, reasons[~ok].tolist()))
+
+                sign = -1 if action == "sell" else 1
+                coin_data["supply"] = coin_data.get("supply", 0) + sign * int(quantity[ok].sum())
+                coin_data["reserve"] = coin_data.get("reserve", 0) + sign * int(cash[ok].sum())
+                settled += len(executed)
+
+        self.market_data["plan_runs"] = {"at": utcnow().isoformat(), "user_ids": user_ids, **{column: values.tolist() for column, values in totals.items()},
+                                         "skipped_rows": skipped_rows, "skipped": skipped}
+        self._plan_run_index = None
+        self.market_data.touch("users", "coins")
+        print(f"Settled {settled} recurring plan trades for {len(plans)} members in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        return settled
+
+    # --- Price alerts ---
+    # Each coin has two threshold arrays, "above" and "below", of [price, user_id] pairs kept sorted by price.
+    # When a price moves from old to new, the alerts it crossed are one contiguous slice of one array, found by
+    # bisection in O(log n + k) and removed in one go (alerts are one-shot). Triggered alerts wait in "pending",
+    # each with an ID, until the bot's sender has delivered them and acknowledges them (see alerts.py).
+
+    def _alert_book(self, coin_name):
+        return self.market_data["alerts"]["thresholds"].setdefault(coin_name, {"above": [], "below": []})
+
+    def _alert_owners(self):
+        # user ID string -> set of (coin, direction, threshold), built on first use; for limits and listing.
+        if self._alerts_by_user is None:
+            self._alerts_by_user = {}
+            for coin_name, book in self.market_data["alerts"]["thresholds"].items():
+                for direction, side in book.items():
+                    for threshold, user_id in side:
+                        self._alerts_by_user.setdefault(str(user_id), set()).add((coin_name, direction, threshold))
+        return self._alerts_by_user
+
+    def add_alert(self, user_id, coin_name, direction, threshold):
+        # threshold is in cents. An alert has to be on the far side of the current price to be able to trigger.
+        if coin_name not in self.market_data["coins"]:
+            return {"ok": False, "reason": "unknown_coin"}
+        if direction not in ("above", "below"):
+            raise ValueError(f"Invalid alert direction '{direction}'.")
+        price = self.market_data["coins"][coin_name]["price"]
+        if (direction == "above" and threshold <= price) or (direction == "below" and threshold >= price):
+            return {"ok": False, "reason": "already_crossed", "price": price}
+        owned = self._alert_owners().setdefault(str(user_id), set())
+        if (coin_name, direction, threshold) in owned:
+            return {"ok": False, "reason": "duplicate", "price": price}
+        if len(owned) >= MAX_ALERTS_PER_USER:
+            return {"ok": False, "reason": "limit", "limit": MAX_ALERTS_PER_USER, "price": price}
+        bisect.insort(self._alert_book(coin_name)[direction], [threshold, user_id])
+        owned.add((coin_name, direction, threshold))
+        self.market_data.touch("alerts")
+        return {"ok": True, "price": price}
+
+    def remove_alert(self, user_id, coin_name, direction, threshold):
+        owned = self._alert_owners().get(str(user_id), set())
+        if (coin_name, direction, threshold) not in owned:
+            return False
+        side = self._alert_book(coin_name)[direction]
+        index = bisect.bisect_left(side, [threshold, user_id])
+        del side[index]
+        owned.discard((coin_name, direction, threshold))
+        self.market_data.touch("alerts")
+        return True
+
+    def alerts_for(self, user_id):
+        return [{"coin": coin_name, "direction": direction, "threshold": threshold}
+                for coin_name, direction, threshold in sorted(self._alert_owners().get(str(user_id), ()))]
+
+    def _trigger_alerts(self, coin_name, old_price, new_price):
+        book = self.market_data["alerts"]["thresholds"].get(coin_name)
+        if not book or new_price == old_price:
+            return
+        price_of = itemgetter(0)
+        if new_price > old_price:
+            # "above" alerts with old < threshold <= new
+            direction, side = "above", book["above"]
+            start = bisect.bisect_right(side, old_price, key=price_of)
+            end = bisect.bisect_right(side, new_price, key=price_of)
+        else:
+            # "below" alerts with new <= threshold < old
+            direction, side = "below", book["below"]
+            start = bisect.bisect_left(side, new_price, key=price_of)
+            end = bisect.bisect_left(side, old_price, key=price_of)
+        if start == end:
+            return
+        triggered = side[start:end]
+        del side[start:end]
+        at = utcnow().isoformat()
+        owners = self._alert_owners()
+        for threshold, user_id in triggered:
+            owners.get(str(user_id), set()).discard((coin_name, direction, threshold))
+        alerts = self.market_data["alerts"]
+        first_id = alerts["next_id"]
+        alerts["next_id"] += len(triggered)
+        alerts["pending"].extend(
+            {"id": first_id + i, "user_id": user_id, "coin": coin_name, "direction": direction, "threshold": threshold, "price": new_price, "at": at}
+            for i, (threshold, user_id) in enumerate(triggered))
+        self.market_data.touch("alerts")
+        print(f"{len(triggered)} {coin_name} price alerts triggered.")
+
+    def pending_alerts(self, limit=100):
+        # The oldest triggered alerts, left queued until acknowledge_alerts(), so an alert whose DM never
+        # went out (a crash, a Discord error) is delivered later instead of being lost.
+        return self.market_data["alerts"]["pending"][:limit]
+
+    def acknowledge_alerts(self, delivered, failed=()):
+        # delivered: IDs of alerts that were sent (or never can be), removed from the queue.
+        # failed: IDs whose delivery should be retried; they move to the back of the queue, and are dropped
+        # after MAX_ALERT_ATTEMPTS. The IDs come from pending_alerts(), so they sit near the front of the queue
+        # and only that part of it is scanned.
+        pending = self.market_data["alerts"]["pending"]
+        done, failed = set(delivered), set(failed)
+        wanted = done | failed
+        kept, retry, dropped, index = [], [], 0, 0
+        while wanted and index < len(pending):
+            alert = pending[index]
+            index += 1
+            if alert["id"] not in wanted:
+                kept.append(alert)
+                continue
+            wanted.discard(alert["id"])
+            if alert["id"] in failed:
+                alert["attempts"] = alert.get("attempts", 0) + 1
+                if alert["attempts"] < MAX_ALERT_ATTEMPTS:
+                    retry.append(alert)
+                else:
+                    dropped += 1
+        if index == 0:
+            return {"removed": 0, "retrying": 0, "dropped": 0}
+        pending[:index] = kept
+        pending.extend(retry)
+        self.market_data.touch("alerts")
+        if dropped:
+            print(f"Dropped {dropped} price alerts that could not be delivered after {MAX_ALERT_ATTEMPTS} attempts.")
+        return {"removed": index - len(kept) - len(retry), "retrying": len(retry), "dropped": dropped}
+
+    # --- Performance history ---
+
+    def _net_worth_columns(self):
+        # Every account's net worth at the current prices in one vectorized pass: accrual is applied by
+        # _accrued_columns and holdings are valued with array arithmetic.
+        users = self.market_data["users"]
+        accounts = list(users.values())
+        coin_names = list(self.market_data["coins"])
+        count = len(accounts)
+        user_ids = np.fromiter((int(user_id_str) for user_id_str in users), dtype=np.int64, count=count)
+        balances, _, _ = self._accrued_columns(accounts)
+        holdings = np.array([[user["portfolio"].get(coin_name, 0) for coin_name in coin_names] for user in accounts], dtype=np.int64).reshape(count, len(coin_names))
+        prices = np.array([self.market_data["coins"][coin_name]["price"] for coin_name in coin_names], dtype=np.int64)
+        return user_ids, balances + (holdings * prices // MILLI_PER_COIN).sum(axis=1)
+
+    def _record_performance(self):
+        user_ids, net_worth = self._net_worth_columns()
+        self.performance_log.append(utcnow(), user_ids, net_worth, rank_by_net_worth(net_worth))
+
+    def performance(self, user_id, limit=10):
+        # Net-worth returns, drawdown and rank history of one account, from the samples taken at each price tick.
+        if self.performance_log is None:
+            return {"samples": 0}
+        return summarize(*self.performance_log.history(user_id), limit=limit)
+
+    # --- Trading ---
+    # Quantities are milli-coins and amounts are cents. Every trade also moves the coin's supply and reserve.
+
+    def _check_credit(self, held, amount):
+        # An account may never hold more than MAX_AMOUNT of cash or of one coin (see money.MAX_AMOUNT).
+        if held + amount > money.MAX_AMOUNT:
+            raise ValueError(f"That would take the account over the limit of {money.format_cash(money.MAX_AMOUNT)}.")
+
+    def buy_coin(self, user_id, coin_name, quantity_of_coins_to_buy):
+        money.check_amount(quantity_of_coins_to_buy)
+        user = self.find_user(user_id)
+        if coin_name not in self.market_data["coins"]:
+            return "Coin not found."
+
+        if user.get("on_buy_cooldown", False):
+            return "You cannot buy Campton Coin until after the next market price update (approximately every 3 days)."
+
+        coin_data = self.market_data["coins"][coin_name]
+        cost = money.cost_cents(quantity_of_coins_to_buy, coin_data["price"])
+
+        if user["balance"] < cost:
+            return f"Insufficient funds. You need {money.format_cash(cost)} dollars but only have {money.format_cash(user['balance'])} dollars."
+        self._check_credit(user["portfolio"].get(coin_name, 0), quantity_of_coins_to_buy)
+
+        user = self.get_user_data(user_id)
+        user["balance"] -= cost
+        user["portfolio"][coin_name] = user["portfolio"].get(coin_name, 0) + quantity_of_coins_to_buy
+        coin_data["supply"] = coin_data.get("supply", 0) + quantity_of_coins_to_buy
+        coin_data["reserve"] = coin_data.get("reserve", 0) + cost
+        self._reindex_holder(str(user_id), user)
+        self.market_data.touch("users", "coins")
+        return f"Successfully bought {money.format_coins(quantity_of_coins_to_buy)} {coin_name}(s) for {money.format_cash(cost)} dollars."
+
+    def sell_coin(self, user_id, coin_name, quantity):
+        money.check_amount(quantity)
+        user = self.find_user(user_id)
+        if coin_name not in self.market_data["coins"]:
+            return "Coin not found."
+        if coin_name not in user["portfolio"] or user["portfolio"][coin_name] < quantity:
+            return f"You don't own {money.format_coins(quantity)} {coin_name}(s). You have {money.format_coins(user['portfolio'].get(coin_name, 0))}."
+
+        coin_data = self.market_data["coins"][coin_name]
+        revenue = money.value_cents(quantity, coin_data["price"])
+
+        user = self.get_user_data(user_id)
+        user["balance"] += revenue
+        user["portfolio"][coin_name] -= quantity
+        if user["portfolio"][coin_name] == 0:
+            del user["portfolio"][coin_name]
+        coin_data["supply"] = coin_data.get("supply", 0) - quantity
+        coin_data["reserve"] = coin_data.get("reserve", 0) - revenue
+        self._reindex_holder(str(user_id), user)
+        self.market_data.touch("users", "coins")
+        return f"Successfully sold {money.format_coins(quantity)} {coin_name}(s) for {money.format_cash(revenue)} dollars."
+
+    def add_funds(self, user_id, amount):
+        money.check_amount(amount)
+        self._check_credit(self.find_user(user_id)["balance"], amount)
+        user = self.get_user_data(user_id)
+        user["balance"] += amount
+        self.market_data.touch("users")
+        return user["balance"]
+
+    def withdraw_funds(self, user_id, amount):
+        money.check_amount(amount)
+        user = self.find_user(user_id)
+        if user["balance"] < amount:
+            return {"ok": False, "balance": user["balance"]}
+        user = self.get_user_data(user_id)
+        user["balance"] -= amount
+        self.market_data.touch("users")
+        return {"ok": True, "balance": user["balance"]}
+
+    def transfer(self, sender_id, recipient_id, amount, currency, coin_name=CAMPTOM_COIN_NAME):
+        # The recipient's account is only created once the transfer is known to go through.
+        # amount is in cents for cash and in milli-coins for coins.
+        money.check_amount(amount)
+        sender = self.find_user(sender_id)
+        if currency == 'cash':
+            if sender["balance"] < amount:
+                return {"ok": False, "sender_balance": sender["balance"]}
+            self._check_credit(self.find_user(recipient_id)["balance"], amount)
+            sender = self.get_user_data(sender_id)
+            recipient = self.get_user_data(recipient_id)
+            sender["balance"] -= amount
+            recipient["balance"] += amount
+            self.market_data.touch("users")
+            return {"ok": True, "sender_balance": sender["balance"], "recipient_balance": recipient["balance"]}
+        if currency == 'campton_coin':
+            if coin_name not in sender["portfolio"] or sender["portfolio"][coin_name] < amount:
+                return {"ok": False, "sender_coins": sender["portfolio"].get(coin_name, 0)}
+            self._check_credit(self.find_user(recipient_id)["portfolio"].get(coin_name, 0), amount)
+            sender = self.get_user_data(sender_id)
+            recipient = self.get_user_data(recipient_id)
+            sender["portfolio"][coin_name] -= amount
+            recipient["portfolio"][coin_name] = recipient["portfolio"].get(coin_name, 0) + amount
+            if sender["portfolio"][coin_name] == 0:
+                del sender["portfolio"][coin_name]
+            self._reindex_holder(str(sender_id), sender)
+            self._reindex_holder(str(recipient_id), recipient)
+            self.market_data.touch("users")
+            return {"ok": True, "sender_coins": sender["portfolio"].get(coin_name, 0), "recipient_coins": recipient["portfolio"].get(coin_name, 0)}
+        raise ValueError(f"Invalid currency type '{currency}'.")
+
+    # --- Conversion ---
+
+    def convert_holdings(self, coin_name, user_ids, next_conversion_at=None):
+        # Converts the holdings of the given users (the bot passes the non-bot members still in the guild)
+        # to cash at the current price, puts them on buy cooldown and schedules the next conversion:
+        # at next_conversion_at (the scheduled job passes its next due time), or one interval from now.
+        if coin_name not in self.market_data["coins"]:
+            print(f"Warning: '{coin_name}' not found in market data. Skipping conversion.")
+            return []
+
+        coin_data = self.market_data["coins"][coin_name]
+        current_coin_price = coin_data["price"]
+        conversions = []
+        for user_id in user_ids:
+            user_data = self.market_data["users"].get(str(user_id))
+            if user_data is None:
+                continue
+            self._settle(user_data)
+            user_coins = user_data.get("portfolio", {}).get(coin_name, 0)
+            if user_coins > 0:
+                cash_received = money.value_cents(user_coins, current_coin_price)
+                user_data["balance"] += cash_received
+                del user_data["portfolio"][coin_name]
+                user_data["on_buy_cooldown"] = True
+                coin_data["supply"] = coin_data.get("supply", 0) - user_coins
+                coin_data["reserve"] = coin_data.get("reserve", 0) - cash_received
+                self._reindex_holder(str(user_id), user_data)
+                conversions.append({
+                    "user_id": user_id,
+                    "coins": user_coins,
+                    "cash": cash_received,
+                    "price": current_coin_price,
+                    "balance": user_data["balance"]
+                })
+
+        self.market_data["schedule"]["next_conversion_timestamp"] = next_conversion_at or (utcnow() + CONVERSION_INTERVAL).isoformat()
+        self.market_data.touch("users", "coins", "schedule")
+        return conversions
+
+    def get_next_conversion_timestamp(self):
+        return self.market_data["schedule"]["next_conversion_timestamp"]
+
+    # --- Job schedule ---
+    # Persisted next-run times of the bot's periodic jobs (see scheduler.py).
+
+    def job_schedule(self):
+        schedule = self.market_data["schedule"]
+        return {**schedule["jobs"], CONVERSION_JOB: schedule["next_conversion_timestamp"]}
+
+    def set_job_next_run(self, name, timestamp):
+        schedule = self.market_data["schedule"]
+        if name == CONVERSION_JOB:
+            schedule["next_conversion_timestamp"] = timestamp
+        else:
+            schedule["jobs"][name] = timestamp
+        self.market_data.touch("schedule")
+        return timestamp
+
+    # --- Tickets ---
+
+    def open_ticket(self, channel_id, user_id, issue):
+        ticket_info = {
+            "user_id": user_id,
+            "issue": issue,
+            "status": "open",
+            "created_at": utcnow().isoformat()
+        }
+        self.market_data["tickets"][str(channel_id)] = ticket_info
+        self.market_data.touch("tickets")
+        return dict(ticket_info)
+
+    def get_ticket(self, channel_id):
+        ticket_info = self.market_data["tickets"].get(str(channel_id))
+        return dict(ticket_info) if ticket_info else None
+
+    def open_tickets_for(self, user_id):
+        return [int(ticket_id) for ticket_id, ticket_info in self.market_data["tickets"].items()
+                if ticket_info["user_id"] == user_id and ticket_info["status"] == "open"]
+
+    def close_ticket(self, channel_id):
+        ticket_info = self.market_data["tickets"].get(str(channel_id))
+        if ticket_info is None:
+            return None
+        ticket_info["status"] = "closed"
+        ticket_info["closed_at"] = utcnow().isoformat()
+        self.market_data.touch("tickets")
+        return dict(ticket_info)
+
+    def remove_ticket(self, channel_id):
+        removed = self.market_data["tickets"].pop(str(channel_id), None)
+        if removed is not None:
+            self.market_data.touch("tickets")
+        return removed is not None
+
+    # --- Snapshots ---
+    # Building a snapshot walks every account, so it is not done on commit. A commit only marks the snapshot
+    # as pending; whoever drives the economy publishes it from its own timer (see engine_client.SnapshotScheduler),
+    # at most once per SNAPSHOT_INTERVAL. The web API may therefore lag the market by up to that long.
+
+    def snapshot_due_in(self):
+        # Seconds until the pending snapshot may be published (0 if it may be now), or None if nothing is pending.
+        if not self._snapshot_pending:
+            return None
+        if self._snapshot_published_at is None:
+            return 0.0
+        return max(0.0, self._snapshot_published_at + SNAPSHOT_INTERVAL - time.monotonic())
+
+    def publish_snapshot(self, force=False):
+        due_in = self.snapshot_due_in()
+        if due_in is None or (due_in > 0 and not force):
+            return False
+        self.snapshots.publish(self.build_snapshot())
+        self._snapshot_pending = False
+        self._snapshot_published_at = time.monotonic()
+        return True
+
+    def build_snapshot(self):
+        # Public, read-only view of the market for the web API. Verification details and tickets stay private.
+        # Amounts are rendered as float dollars and coins here, for JSON consumers.
+        prices = self.get_prices()
+        users = {}
+        for user_id_str, user in self.market_data["users"].items():
+            holdings = {coin_name: quantity for coin_name, quantity in user["portfolio"].items() if quantity > 0}
+            balance = self._accrued_balance(user)
+            net_worth = balance + sum(money.value_cents(quantity, prices.get(coin_name, 0)) for coin_name, quantity in holdings.items())
+            users[user_id_str] = {
+                "balance": money.dollars(balance),
+                "portfolio": {coin_name: money.coins(quantity) for coin_name, quantity in holdings.items()},
+                "net_worth": money.dollars(net_worth)
+            }
+        top = heapq.nlargest(LEADERBOARD_SIZE, users.items(), key=lambda item: item[1]["net_worth"])
+        leaderboard = []
+        for rank, (user_id_str, entry) in enumerate(top, start=1):
+            entry["rank"] = rank
+            leaderboard.append({"rank": rank, "user_id": user_id_str, "net_worth": entry["net_worth"]})
+        return {
+            "generated_at": utcnow().isoformat(),
+            "prices": {coin_name: money.dollars(price) for coin_name, price in prices.items()},
+            "history": {coin_name: [{"at": point["at"], "price": money.dollars(point["price"])} for point in coin_data.get("history", [])]
+                        for coin_name, coin_data in self.market_data["coins"].items()},
+            "leaderboard": leaderboard,
+            "users": users
+        }
+
+    # --- Diagnostics ---
+
+    def audit(self):
+        # Exact integer totals used by loadtest.py to check that trades conserve cash and coins:
+        # total_coins must equal each coin's supply, and total_cash plus the reserves only changes through
+        # add_funds, withdrawals and accrual.
+        users = self.market_data["users"].values()
+        coins = {coin_name: sum(user["portfolio"].get(coin_name, 0) for user in users) for coin_name in self.market_data["coins"]}
+        total_cash = sum(self._accrued_balance(user) for user in users)
+        total_value = total_cash + sum(money.value_cents(coins[coin_name], coin_data["price"]) for coin_name, coin_data in self.market_data["coins"].items())
+        return {
+            "users": len(self.market_data["users"]),
+            "total_cash": total_cash,
+            "total_coins": coins,
+            "total_value": total_value,
+            "supply": {coin_name: coin_data.get("supply", 0) for coin_name, coin_data in self.market_data["coins"].items()},
+            "reserve": {coin_name: coin_data.get("reserve", 0) for coin_name, coin_data in self.market_data["coins"].items()},
+            "negative_balances": sum(1 for user in users if user["balance"] < 0),
+            "negative_holdings": sum(1 for user in users for quantity in user["portfolio"].values() if quantity < 0),
+            "open_tickets": sum(1 for t in self.market_data["tickets"].values() if t["status"] == "open"),
+            "closed_tickets": sum(1 for t in self.market_data["tickets"].values() if t["status"] == "closed")
+        }
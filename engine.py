@@ -0,0 +1,122 @@
+# Economy engine process.
+# Owns the Economy (all market state and trading rules) and serves it over a Unix socket or localhost
+# TCP using the protocol described in engine_client.py, which also covers who may connect. main.py starts
+# it before the bot and the web server, which both talk to it as clients, so Discord gateway stalls never
+# hold up trades.
+# Committed batches also refresh the read-only snapshot served by main.py's /api routes, at most once per
+# SNAPSHOT_INTERVAL (see engine_client.SnapshotScheduler).
+#
+# Usage:
+#   python engine.py                      # listens on ECONOMY_ENGINE_ADDRESS (default unix:economy_engine.sock)
+#   python engine.py 127.0.0.1:8765
+import asyncio
+import json
+import os
+import signal
+import stat
+import sys
+
+from economy import API_METHODS, DATA_FILE, PERFORMANCE_DIR, SNAPSHOT_FILE, Economy
+from engine_client import DEFAULT_ENGINE_ADDRESS, STREAM_LIMIT, SnapshotScheduler, engine_token, parse_address, token_matches
+
+
+class EngineServer:
+    def __init__(self, economy, address, token=None):
+        self.economy = economy
+        self.address = address
+        self.token = token
+        self.snapshots = SnapshotScheduler(economy)
+        self._server = None
+        self.requests_served = 0
+        self.calls_served = 0
+
+    def execute(self, calls):
+        # Runs every call of a batch back to back (nothing else can interleave, so a batch is atomic with
+        # respect to other clients) and writes the state to disk at most once.
+        results = []
+        for call in calls:
+            method = call.get("method")
+            if method not in API_METHODS:
+                results.append({"ok": False, "error": f"Unknown method '{method}'.", "type": "EngineError"})
+                continue
+            try:
+                result = getattr(self.economy, method)(*call.get("args", []), **call.get("kwargs", {}))
+                results.append({"ok": True, "result": result})
+            except Exception as e:
+                results.append({"ok": False, "error": str(e), "type": type(e).__name__})
+        try:
+            self.economy.commit()
+        except OSError as e:
+            print(f"ERROR: Could not save economy state: {e}")
+        self.snapshots.schedule()
+        self.requests_served += 1
+        self.calls_served += len(calls)
+        return results
+
+    async def handle_client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as e:
+                    request, response = None, {"id": None, "results": [], "error": f"Malformed request: {e}"}
+                if request is not None and self.token is not None and not token_matches(self.token, request):
+                    print("Rejected an economy engine request with a missing or wrong token.")
+                    writer.write((json.dumps({"id": request.get("id"), "results": [], "error": "Missing or wrong engine token."}) + "\n").encode())
+                    await writer.drain()
+                    break
+                if request is not None:
+                    response = {"id": request.get("id"), "results": self.execute(request.get("calls", []))}
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            if os.path.exists(target):
+                os.unlink(target)
+            # Created owner-only from the start (not chmod-ed afterwards), so no other user can ever connect.
+            previous_umask = os.umask(0o177)
+            try:
+                self._server = await asyncio.start_unix_server(self.handle_client, target, limit=STREAM_LIMIT)
+            finally:
+                os.umask(previous_umask)
+            os.chmod(target, stat.S_IRUSR | stat.S_IWUSR)
+        else:
+            self._server = await asyncio.start_server(self.handle_client, *target, limit=STREAM_LIMIT)
+        print(f"Economy engine listening on {self.address} (data file: {self.economy.data_file}, "
+              f"{'token required' if self.token else 'no token'}).")
+
+    async def serve_forever(self):
+        await self.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        async with self._server:
+            await stop.wait()
+        self.economy.commit()
+        self.snapshots.flush()
+        print(f"Economy engine stopped after {self.requests_served} requests ({self.calls_served} calls).")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    address = argv[0] if argv else os.environ.get('ECONOMY_ENGINE_ADDRESS', DEFAULT_ENGINE_ADDRESS)
+    parse_address(address) # refuse a non-loopback address before loading anything
+    server = EngineServer(Economy(DATA_FILE, SNAPSHOT_FILE, performance_dir=PERFORMANCE_DIR), address, token=engine_token())
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
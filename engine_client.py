@@ -0,0 +1,300 @@
+# Clients for the economy engine (engine.py).
+# The wire protocol is newline-delimited JSON over a Unix socket or localhost TCP:
+#   request:  {"id": 7, "token": "...", "calls": [{"method": "buy_coin", "args": [...], "kwargs": {...}}, ...]}
+#   response: {"id": 7, "results": [{"ok": true, "result": ...}, {"ok": false, "error": "...", "type": "ValueError"}]}
+# All calls in one request are executed back to back by the engine and committed to disk once.
+#
+# EngineClient (asyncio, used by bot.py) coalesces every call made during the same event-loop
+# iteration into a single request, so concurrent slash commands share round trips and disk writes.
+# SyncEngineClient is a small blocking client for the Flask app.
+# LocalEconomy runs an Economy in-process behind the same async interface when no engine is configured.
+#
+# The engine serves money-changing methods (add_funds, withdraw_funds, update_prices...), so it must never be
+# reachable from outside this machine. TCP addresses have to be loopback, and the default address is a Unix
+# socket that only the owning user can open (0600); localhost TCP is the fallback where Unix sockets aren't
+# available. When ECONOMY_ENGINE_TOKEN is set, every request must also carry that shared token ("token");
+# main.py generates one for the processes it starts.
+import asyncio
+import hmac
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import threading
+
+from economy import API_METHODS
+
+STREAM_LIMIT = 16 * 1024 * 1024
+MAX_BATCH_SIZE = 256
+DEFAULT_ENGINE_ADDRESS = "unix:economy_engine.sock" if hasattr(socket, "AF_UNIX") and os.name != "nt" else "127.0.0.1:8765"
+ENGINE_TOKEN_ENV = 'ECONOMY_ENGINE_TOKEN'
+
+
+class EngineError(Exception):
+    pass
+
+
+def parse_address(address):
+    # "unix:/path/to/socket", "tcp:127.0.0.1:8765" or plain "127.0.0.1:8765"
+    if address.startswith("unix:"):
+        return ("unix", address[len("unix:"):])
+    host, _, port = address[len("tcp:"):].rpartition(":") if address.startswith("tcp:") else address.rpartition(":")
+    host = host.strip("[]") or "127.0.0.1"
+    if host != "localhost":
+        try:
+            loopback = ipaddress.ip_address(host).is_loopback
+        except ValueError:
+            loopback = False
+        if not loopback:
+            raise ValueError(f"Refusing economy engine address '{address}': TCP is only allowed on a loopback address such as 127.0.0.1. "
+                             f"Use a unix: socket path instead.")
+    return ("tcp", (host, int(port)))
+
+
+def engine_token():
+    return os.environ.get(ENGINE_TOKEN_ENV) or None
+
+
+def token_matches(expected, request):
+    return hmac.compare_digest(str(request.get("token") or "").encode(), expected.encode())
+
+
+def raise_remote_error(result):
+    if result.get("type") == "ValueError":
+        raise ValueError(result["error"])
+    raise EngineError(f"{result.get('type', 'Error')}: {result['error']}")
+
+
+class _EconomyMethods:
+    # Exposes every API method as an awaitable attribute: `await economy.buy_coin(...)`.
+    def __getattr__(self, name):
+        if name not in API_METHODS:
+            raise AttributeError(name)
+
+        async def method(*args, **kwargs):
+            return await self.call(name, *args, **kwargs)
+        method.__name__ = name
+        return method
+
+
+class SnapshotScheduler:
+    # Publishes the economy's read-only snapshot from its own event-loop callback, at most once per
+    # SNAPSHOT_INTERVAL, so no request ever waits for it to be rebuilt (see Economy.publish_snapshot).
+    def __init__(self, economy):
+        self.economy = economy
+        self._timer = None
+
+    def schedule(self):
+        # Called after every commit.
+        if self._timer is not None:
+            return
+        due_in = self.economy.snapshot_due_in()
+        if due_in is not None:
+            self._timer = asyncio.get_running_loop().call_later(due_in, self._publish)
+
+    def _publish(self):
+        self._timer = None
+        try:
+            self.economy.publish_snapshot()
+        except OSError as e:
+            print(f"ERROR: Could not publish the market snapshot: {e}")
+        self.schedule()
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.economy.publish_snapshot(force=True)
+
+
+class LocalEconomy(_EconomyMethods):
+    def __init__(self, economy):
+        self.economy = economy
+        self.snapshots = SnapshotScheduler(economy)
+        self._commit_scheduled = False
+
+    async def call(self, method, *args, **kwargs):
+        result = getattr(self.economy, method)(*args, **kwargs)
+        # Like the engine, write to disk once per event-loop iteration rather than once per call.
+        if not self._commit_scheduled:
+            self._commit_scheduled = True
+            asyncio.get_running_loop().call_soon(self._commit)
+        return result
+
+    def _commit(self):
+        self._commit_scheduled = False
+        try:
+            self.economy.commit()
+        except OSError as e:
+            print(f"ERROR: Could not save economy state: {e}")
+        self.snapshots.schedule()
+
+    async def close(self):
+        self.economy.commit()
+        self.snapshots.flush()
+
+
+class EngineClient(_EconomyMethods):
+    def __init__(self, address, token=None):
+        self.address = address
+        self.token = token or engine_token()
+        self._reader = None
+        self._writer = None
+        self._reader_task = None
+        self._connect_lock = None
+        self._ids = itertools.count(1)
+        self._queued = [] # (call, future) waiting for the next flush
+        self._flush_scheduled = False
+        self._inflight = {} # request id -> list of futures
+
+    async def _ensure_connected(self):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            kind, target = parse_address(self.address)
+            if kind == "unix":
+                self._reader, self._writer = await asyncio.open_unix_connection(target, limit=STREAM_LIMIT)
+            else:
+                self._reader, self._writer = await asyncio.open_connection(*target, limit=STREAM_LIMIT)
+            self._reader_task = asyncio.create_task(self._read_responses(self._reader))
+
+    async def _read_responses(self, reader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                futures = self._inflight.pop(response["id"], [])
+                if response.get("error"):
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(EngineError(response["error"]))
+                    continue
+                for future, result in zip(futures, response["results"]):
+                    if not future.done():
+                        future.set_result(result)
+        except (ConnectionError, json.JSONDecodeError) as e:
+            print(f"Economy engine connection error: {e}")
+        finally:
+            self._fail_inflight(EngineError("Lost connection to the economy engine."))
+            if self._writer is not None:
+                self._writer.close()
+
+    def _fail_inflight(self, error):
+        for futures in self._inflight.values():
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+        self._inflight.clear()
+
+    async def call(self, method, *args, **kwargs):
+        future = asyncio.get_running_loop().create_future()
+        self._queued.append(({"method": method, "args": list(args), "kwargs": kwargs}, future))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(lambda: asyncio.ensure_future(self._flush()))
+        result = await future
+        if not result["ok"]:
+            raise_remote_error(result)
+        return result["result"]
+
+    async def _flush(self):
+        self._flush_scheduled = False
+        queued, self._queued = self._queued, []
+        try:
+            await self._ensure_connected()
+        except OSError as e:
+            for _, future in queued:
+                if not future.done():
+                    future.set_exception(EngineError(f"Could not connect to the economy engine at {self.address}: {e}"))
+            return
+        for start in range(0, len(queued), MAX_BATCH_SIZE):
+            batch = queued[start:start + MAX_BATCH_SIZE]
+            request_id = next(self._ids)
+            self._inflight[request_id] = [future for _, future in batch]
+            self._writer.write((json.dumps({"id": request_id, "token": self.token, "calls": [call for call, _ in batch]}) + "\n").encode())
+        try:
+            await self._writer.drain()
+        except ConnectionError:
+            self._fail_inflight(EngineError("Lost connection to the economy engine."))
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+
+class SyncEngineClient:
+    def __init__(self, address, timeout=10.0, token=None):
+        self.address = address
+        self.timeout = timeout
+        self.token = token or engine_token()
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _connect(self):
+        kind, target = parse_address(self.address)
+        if kind == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(target)
+        self._sock = sock
+        self._file = sock.makefile('rwb')
+
+    def batch(self, calls):
+        # calls: list of (method, args, kwargs). Returns the raw per-call results.
+        request = {"token": self.token, "calls": [{"method": method, "args": list(args), "kwargs": kwargs} for method, args, kwargs in calls]}
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    request["id"] = next(self._ids)
+                    self._file.write((json.dumps(request) + "\n").encode())
+                    self._file.flush()
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("engine closed the connection")
+                    response = json.loads(line)
+                    if response.get("error"):
+                        raise EngineError(f"The economy engine refused the request: {response['error']}")
+                    return response["results"]
+                except OSError as e:
+                    self.close()
+                    if attempt == 1:
+                        raise EngineError(f"Could not reach the economy engine at {self.address}: {e}")
+
+    def call(self, method, *args, **kwargs):
+        result = self.batch([(method, args, kwargs)])[0]
+        if not result["ok"]:
+            raise_remote_error(result)
+        return result["result"]
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._file = None
+
+
+def connect_economy(address=None, data_file=None):
+    # Uses the engine at ECONOMY_ENGINE_ADDRESS when set; otherwise runs the economy inside this process.
+    address = address or os.environ.get('ECONOMY_ENGINE_ADDRESS')
+    if address:
+        print(f"Using the economy engine at {address}.")
+        return EngineClient(address)
+    from economy import DATA_FILE, PERFORMANCE_DIR, SNAPSHOT_FILE, Economy
+    return LocalEconomy(Economy(data_file or DATA_FILE, SNAPSHOT_FILE, performance_dir=PERFORMANCE_DIR))
@@ -0,0 +1,481 @@
+# Offline load-test harness for the slash command handlers in bot.py.
+# Fakes just enough of discord.Interaction / Member / Guild / channels to drive the real handler
+# code concurrently, with no network access and no Discord token.
+#
+# Usage:
+#   python loadtest.py --users 500 --ops 5000 --concurrency 500
+#   python loadtest.py --engine    # run the economy in a separate engine.py process, as main.py does
+#   python loadtest.py --diagnostics    # also print the per-handler profile from diagnostics.py
+#
+# The bot's data file is redirected to a temporary directory so the real stock_market_data.json
+# is never touched. The seeded accounts and tickets are written to that file before bot.py is imported.
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import secrets
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.TemporaryDirectory(prefix="stockcoins-loadtest-")
+os.environ['STOCK_MARKET_DATA_FILE'] = os.path.join(_tmp_dir.name, 'stock_market_data.json')
+os.environ['TICKET_ARCHIVE_DIR'] = os.path.join(_tmp_dir.name, 'ticket_archives')
+os.environ['VERIFICATION_REGISTRY_FILE'] = os.path.join(_tmp_dir.name, 'verification_registry.jsonl')
+os.environ['ANNOUNCEMENT_CONFIG_FILE'] = os.path.join(_tmp_dir.name, 'announcement_destinations.json')
+os.environ['MARKET_SNAPSHOT_FILE'] = os.path.join(_tmp_dir.name, 'market_snapshot.json')
+os.environ['PERFORMANCE_HISTORY_DIR'] = os.path.join(_tmp_dir.name, 'performance_history')
+os.environ.pop('DISCORD_BOT_TOKEN', None)
+os.environ.pop('ECONOMY_ENGINE_ADDRESS', None)
+
+import discord
+from discord import app_commands
+
+from economy import CAMPTOM_COIN_NAME
+from money import format_cash, format_coins
+
+bot = None # imported by main() once the seeded data file (and optionally the engine) is ready
+
+COMMAND_WEIGHTS = {
+    "buy": 30,
+    "sell": 25,
+    "transfer": 25,
+    "balance": 15,
+    "close": 5,
+}
+
+FIRST_USER_ID = 1000
+FIRST_TICKET_CHANNEL_ID = 5_000_000
+STARTING_CASH = 10000.0
+STARTING_COINS = 50.0
+
+
+class FakeRole:
+    def __init__(self, role_id, name):
+        self.id = role_id
+        self.name = name
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeMessage:
+    _next_id = 1
+
+    def __init__(self, channel, content=None, embed=None, view=None, author=None):
+        self.id = FakeMessage._next_id
+        FakeMessage._next_id += 1
+        self.channel = channel
+        self.content = content or ""
+        self.embed = embed
+        self.embeds = [embed] if embed else []
+        self.attachments = []
+        self.view = view
+        self.author = author
+        self.created_at = discord.utils.utcnow()
+
+    async def edit(self, **kwargs):
+        await _api_call()
+        self.content = kwargs.get("content", self.content)
+        self.embed = kwargs.get("embed", self.embed)
+
+    async def delete(self):
+        await _api_call()
+
+
+class FakeMember:
+    def __init__(self, user_id, guild, is_bot=False):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = f"User {user_id}"
+        self.discriminator = "0"
+        self.mention = f"<@{user_id}>"
+        self.bot = is_bot
+        self.guild = guild
+        self.roles = []
+        self.dms = 0
+
+    async def send(self, content=None, **kwargs):
+        await _api_call()
+        self.dms += 1
+        return FakeMessage(None, content, kwargs.get("embed"))
+
+    async def add_roles(self, *roles):
+        await _api_call()
+        self.roles.extend(role for role in roles if role not in self.roles)
+
+    async def remove_roles(self, *roles):
+        await _api_call()
+        self.roles = [role for role in self.roles if role not in roles]
+
+    async def edit(self, **kwargs):
+        await _api_call()
+
+    def __str__(self):
+        return self.name
+
+    def __eq__(self, other):
+        return isinstance(other, FakeMember) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeChannel:
+    def __init__(self, channel_id, guild, name=None):
+        self.id = channel_id
+        self.guild = guild
+        self.name = name or f"channel-{channel_id}"
+        self.mention = f"<#{channel_id}>"
+        self.messages = []
+        self.deleted = False
+
+    async def send(self, content=None, **kwargs):
+        await _api_call()
+        message = FakeMessage(self, content, kwargs.get("embed"), kwargs.get("view"), author=self.guild.me)
+        self.messages.append(message)
+        return message
+
+    async def delete(self):
+        await _api_call()
+        self.deleted = True
+
+    async def history(self, limit=100, before=None, after=None, oldest_first=None):
+        await _api_call()
+        messages = [m for m in self.messages if (after is None or m.id > after.id) and (before is None or m.id < before.id)]
+        if not oldest_first:
+            messages.reverse()
+        for message in messages[:limit]:
+            yield message
+
+
+class FakeGuild:
+    def __init__(self, guild_id=1):
+        self.id = guild_id
+        self.name = "Load Test Guild"
+        self.default_role = FakeRole(guild_id, "@everyone")
+        self.me = FakeMember(10 ** 17, self, is_bot=True)
+        self._members = {}
+        self._roles = {}
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def add_member(self, member):
+        self._members[member.id] = member
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    async def query_members(self, user_ids=None, limit=5, cache=True, **kwargs):
+        await _api_call()
+        return [self._members[user_id] for user_id in (user_ids or []) if user_id in self._members]
+
+    async def fetch_members(self, limit=1000, after=None):
+        for member in list(self._members.values()):
+            yield member
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, ephemeral=False, thinking=False):
+        await _api_call()
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        await _api_call()
+        self._done = True
+        self._interaction.sent.append(FakeMessage(self._interaction.channel, content, kwargs.get("embed"), kwargs.get("view")))
+
+    async def send_modal(self, modal):
+        await _api_call()
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        await _api_call()
+        message = FakeMessage(self._interaction.channel, content, kwargs.get("embed"), kwargs.get("view"))
+        self._interaction.sent.append(message)
+        return message
+
+
+class FakeInteraction:
+    def __init__(self, user, guild, channel):
+        self.user = user
+        self.guild = guild
+        self.channel = channel
+        self.id = random.getrandbits(62)
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.sent = []
+
+
+API_LATENCY_SECONDS = 0.0
+
+
+async def _api_call():
+    # Every fake Discord API call yields to the event loop, like a real HTTP round trip would.
+    await asyncio.sleep(API_LATENCY_SECONDS)
+
+
+class LoadTest:
+    def __init__(self, user_count, op_count, concurrency, ticket_count, seed):
+        self.rng = random.Random(seed)
+        self.op_count = op_count
+        self.concurrency = concurrency
+        self.guild = FakeGuild()
+        self.members = [FakeMember(FIRST_USER_ID + i, self.guild) for i in range(user_count)]
+        for member in self.members:
+            self.guild.add_member(member)
+        self.ticket_channels = []
+        self.latencies = {name: [] for name in COMMAND_WEIGHTS}
+        self.errors = {name: 0 for name in COMMAND_WEIGHTS}
+        self.closed_tickets = 0
+        self.loop_lag = []
+        self._seed_state(ticket_count)
+
+    def _seed_state(self, ticket_count):
+        # The accounts and ticket records themselves were written by write_seed_data(); this only
+        # builds the matching fake ticket channels.
+        for i in range(ticket_count):
+            owner = self.members[i % len(self.members)]
+            channel = FakeChannel(FIRST_TICKET_CHANNEL_ID + i, self.guild, name=f"ticket-{owner.name}")
+            for n in range(self.rng.randint(0, 250)):
+                channel.messages.append(FakeMessage(channel, f"Ticket message {n}", author=owner))
+            self.ticket_channels.append((channel, owner))
+
+    def _pick_command(self):
+        names = list(COMMAND_WEIGHTS)
+        return self.rng.choices(names, weights=[COMMAND_WEIGHTS[n] for n in names])[0]
+
+    async def _invoke(self, name):
+        member = self.rng.choice(self.members)
+        channel = FakeChannel(9_000_000, self.guild)
+        if name == "buy":
+            amount = round(self.rng.uniform(1, 500), 2)
+            await bot.buy.callback(FakeInteraction(member, self.guild, channel), amount)
+        elif name == "sell":
+            quantity = round(self.rng.uniform(0.001, 5), 3)
+            await bot.sell.callback(FakeInteraction(member, self.guild, channel), quantity)
+        elif name == "transfer":
+            recipient = self.rng.choice(self.members)
+            while recipient.id == member.id and len(self.members) > 1:
+                recipient = self.rng.choice(self.members)
+            if self.rng.random() < 0.5:
+                currency = app_commands.Choice(name='Cash', value='cash')
+                amount = round(self.rng.uniform(0.01, 300), 2)
+            else:
+                currency = app_commands.Choice(name='Campton Coin', value='campton_coin')
+                amount = round(self.rng.uniform(0.001, 3), 3)
+            await bot.transfer.callback(FakeInteraction(member, self.guild, channel), recipient, amount, currency)
+        elif name == "balance":
+            target = self.rng.choice(self.members) if self.rng.random() < 0.3 else None
+            await bot.balance.callback(FakeInteraction(member, self.guild, channel), target)
+        elif name == "close":
+            if not self.ticket_channels:
+                await bot.balance.callback(FakeInteraction(member, self.guild, channel), None)
+                return
+            ticket_channel, owner = self.ticket_channels.pop()
+            interaction = FakeInteraction(owner, self.guild, ticket_channel)
+            await bot.close.callback(interaction)
+            confirm_view = next((m.view for m in interaction.sent if m.view is not None), None)
+            if confirm_view is None:
+                raise RuntimeError("close did not offer a confirmation button")
+            button = confirm_view.children[0]
+            await button.callback(FakeInteraction(owner, self.guild, ticket_channel))
+            if ticket_channel.deleted:
+                self.closed_tickets += 1
+
+    async def _run_one(self, semaphore, name):
+        async with semaphore:
+            started = time.perf_counter()
+            if bot.loop_diagnostics is not None:
+                bot.loop_diagnostics.label_current_task("/" + name)
+            try:
+                await self._invoke(name)
+            except Exception as e:
+                self.errors[name] += 1
+                if self.errors[name] <= 3:
+                    print(f"ERROR in {name}: {type(e).__name__}: {e}")
+            self.latencies[name].append(time.perf_counter() - started)
+
+    async def _monitor_loop_lag(self, interval=0.01):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(0.0, time.perf_counter() - started - interval))
+
+    async def run(self):
+        audit_before = await bot.economy.audit()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        commands_to_run = [self._pick_command() for _ in range(self.op_count)]
+        monitor = asyncio.create_task(self._monitor_loop_lag())
+        if bot.loop_diagnostics is not None:
+            bot.loop_diagnostics.install(asyncio.get_running_loop())
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_one(semaphore, name) for name in commands_to_run))
+        elapsed = time.perf_counter() - started
+        monitor.cancel()
+        if bot.loop_diagnostics is not None:
+            print("\n" + bot.loop_diagnostics.report())
+            bot.loop_diagnostics.uninstall()
+        audit = await bot.economy.audit()
+        await bot.economy.close()
+        return elapsed, audit_before, audit
+
+
+def write_seed_data(path, user_count, ticket_count):
+    # Written in the old single-file, float-amount layout, so every run also exercises the migration to
+    # per-section files and fixed-point amounts.
+    now = discord.utils.utcnow().isoformat()
+    users = {
+        str(FIRST_USER_ID + i): {
+            "balance": STARTING_CASH,
+            "portfolio": {CAMPTOM_COIN_NAME: STARTING_COINS},
+            "verification": {},
+            "on_buy_cooldown": False
+        }
+        for i in range(user_count)
+    }
+    tickets = {
+        str(FIRST_TICKET_CHANNEL_ID + i): {
+            "user_id": FIRST_USER_ID + i % user_count,
+            "issue": "Load test ticket.",
+            "status": "open",
+            "created_at": now
+        }
+        for i in range(ticket_count)
+    }
+    with open(path, 'w') as f:
+        json.dump({"coins": {}, "users": users, "tickets": tickets}, f)
+
+
+def start_engine(address):
+    # Runs engine.py against the temporary data file and waits until it accepts connections.
+    process = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine.py"), address])
+    socket_path = address[len("unix:"):]
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("economy engine failed to start")
+        time.sleep(0.05)
+    return process
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def market_cash(audit):
+    # Cash held by users plus cash paid into the market for coins; trades and transfers only move it around.
+    return audit["total_cash"] + sum(audit["reserve"].values())
+
+
+def check_invariants(test, audit_before, audit):
+    failures = []
+    if market_cash(audit) != market_cash(audit_before):
+        failures.append(f"cash not conserved: {format_cash(market_cash(audit_before))} -> {format_cash(market_cash(audit))}")
+    for coin_name, total in audit["total_coins"].items():
+        if total != audit["supply"][coin_name]:
+            failures.append(f"{coin_name} holdings ({format_coins(total)}) don't match its supply ({format_coins(audit['supply'][coin_name])})")
+    if audit["negative_balances"]:
+        failures.append(f"{audit['negative_balances']} users have a negative balance")
+    if audit["negative_holdings"]:
+        failures.append(f"{audit['negative_holdings']} holdings are negative")
+    archived = len(bot.transcript_archive.find())
+    if archived != test.closed_tickets:
+        failures.append(f"{test.closed_tickets} tickets closed by the harness but {archived} transcripts archived")
+    if audit["closed_tickets"]:
+        failures.append(f"{audit['closed_tickets']} closed tickets are still in the hot state")
+    return failures
+
+
+def report(test, elapsed, audit_before, audit):
+    total_ops = sum(len(v) for v in test.latencies.values())
+    print(f"\n{total_ops} invocations in {elapsed:.2f}s ({total_ops / elapsed:.0f} ops/s), "
+          f"{len(test.members)} users, concurrency {test.concurrency}")
+    print(f"{'command':<10}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, samples in test.latencies.items():
+        print(f"{name:<10}{len(samples):>8}{test.errors[name]:>8}"
+              f"{percentile(samples, 50) * 1000:>10.2f}{percentile(samples, 95) * 1000:>10.2f}"
+              f"{percentile(samples, 99) * 1000:>10.2f}{(max(samples) if samples else 0) * 1000:>10.2f}")
+    lag = test.loop_lag
+    print(f"event-loop lag: p50 {percentile(lag, 50) * 1000:.2f} ms, p99 {percentile(lag, 99) * 1000:.2f} ms, "
+          f"max {(max(lag) if lag else 0) * 1000:.2f} ms, mean {(statistics.mean(lag) if lag else 0) * 1000:.2f} ms")
+
+    failures = check_invariants(test, audit_before, audit)
+    if failures:
+        print("INVARIANTS FAILED:")
+        for failure in failures:
+            print(f"  - {failure}")
+    else:
+        print(f"Invariants OK: {format_cash(market_cash(audit))} dollars of cash conserved exactly, coin supply matches holdings, no negative balances, "
+              f"{test.closed_tickets} tickets closed.")
+    return not failures
+
+
+def main(argv=None):
+    global API_LATENCY_SECONDS, bot
+    parser = argparse.ArgumentParser(description="Offline load test for the Campton Coins slash commands.")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Simulated latency of each fake Discord API call.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--engine", action="store_true", help="Run the economy in a separate engine.py process.")
+    parser.add_argument("--diagnostics", action="store_true", help="Enable the event-loop diagnostics and print their profile.")
+    args = parser.parse_args(argv)
+
+    if args.diagnostics:
+        os.environ['DIAGNOSTICS_ENABLED'] = '1'
+        os.environ.setdefault('DIAGNOSTICS_STALL_MS', '50')
+    write_seed_data(os.environ['STOCK_MARKET_DATA_FILE'], args.users, args.tickets)
+    engine_process = None
+    if args.engine:
+        address = "unix:" + os.path.join(_tmp_dir.name, "engine.sock")
+        os.environ['ECONOMY_ENGINE_TOKEN'] = secrets.token_urlsafe(16)
+        engine_process = start_engine(address)
+        os.environ['ECONOMY_ENGINE_ADDRESS'] = address
+    import bot
+
+    API_LATENCY_SECONDS = args.api_latency_ms / 1000
+    bot.TICKET_CLOSE_DELAY_SECONDS = 0
+    random.seed(args.seed)
+
+    test = LoadTest(args.users, args.ops, args.concurrency, args.tickets, args.seed)
+    try:
+        elapsed, audit_before, audit = asyncio.run(test.run())
+    finally:
+        if engine_process is not None:
+            engine_process.terminate()
+            engine_process.wait()
+    ok = report(test, elapsed, audit_before, audit)
+    _tmp_dir.cleanup()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,51 @@
 import os
+import secrets
 import sys
+import time
 import subprocess
 from threading import Thread
-from flask import Flask
+from flask import Flask, Response, abort, jsonify, request
+
+from economy import LEADERBOARD_SIZE, SNAPSHOT_FILE
+from engine_client import DEFAULT_ENGINE_ADDRESS, ENGINE_TOKEN_ENV, EngineError, SyncEngineClient
+from snapshot import SnapshotReader
+
+# The economy engine owns all market state. The bot and this web server are both clients of it.
+# The engine, the bot and this process share a random token (inherited through the environment), so nothing
+# else on the machine can call the engine even when it listens on localhost TCP.
+ENGINE_ADDRESS = os.environ.setdefault('ECONOMY_ENGINE_ADDRESS', DEFAULT_ENGINE_ADDRESS)
+os.environ.setdefault(ENGINE_TOKEN_ENV, secrets.token_urlsafe(32))
+
+# Function to run the economy engine
+def run_engine():
+    subprocess.run([sys.executable, "engine.py", ENGINE_ADDRESS])
 
 # Function to run the bot.py script
 def run_bot():
     # Use sys.executable to ensure the correct Python interpreter is used
     # This runs bot.py as a separate process, which is more robust than just import
     # IMPORTANT: If your bot file is named 'CryptoBot.py', change "bot.py" to "CryptoBot.py" here.
-    subprocess.run([sys.executable, "bot.py"]) 
+    # The bot inherits ECONOMY_ENGINE_ADDRESS from this process, so it talks to the engine started above.
+    subprocess.run([sys.executable, "bot.py"])
+
+def wait_for_engine(client, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            client.call("get_next_conversion_timestamp")
+            return True
+        except EngineError:
+            time.sleep(0.2)
+    print(f"Warning: The economy engine at {ENGINE_ADDRESS} did not come up within {timeout} seconds.")
+    return False
+
+engine_client = SyncEngineClient(ENGINE_ADDRESS)
+snapshots = SnapshotReader(SNAPSHOT_FILE)
+
+# Start the engine first and wait for it, so the bot's first command doesn't race its startup
+engine_thread = Thread(target=run_engine)
+engine_thread.start()
+wait_for_engine(engine_client)
 
 # Start the bot.py script in a separate thread
 # This prevents the Flask web server from blocking your Discord bot's operations
@@ -24,6 +60,60 @@ app = Flask(__name__)
 def home():
     return "Your Discord Bot's Web Server is Active!"
 
+@app.route('/health')
+def health():
+    try:
+        engine_client.call("get_next_conversion_timestamp")
+    except EngineError as e:
+        return jsonify({"status": "degraded", "engine": str(e)}), 503
+    return jsonify({"status": "ok", "engine": ENGINE_ADDRESS})
+
+# --- Read-only market API ---
+# Served from the snapshot the engine publishes at most once per SNAPSHOT_INTERVAL (5 seconds by default) after
+# trades or price updates change the market, never from the data file itself. Responses can lag by up to that interval.
+# Every response carries the snapshot version as its ETag, so a poll with a matching If-None-Match is a 304.
+
+def snapshot_response(snapshot, key, build):
+    if snapshot.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.body(key, build), mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def current_snapshot():
+    snapshot = snapshots.current()
+    if snapshot is None:
+        abort(503, description="The market snapshot is not available yet.")
+    return snapshot
+
+@app.route('/api/prices')
+def api_prices():
+    return snapshot_response(current_snapshot(), "prices", lambda data: {"version": data["version"], "generated_at": data["generated_at"], "prices": data["prices"]})
+
+@app.route('/api/leaderboard')
+def api_leaderboard():
+    limit = max(1, min(request.args.get('limit', 10, type=int), LEADERBOARD_SIZE))
+    return snapshot_response(current_snapshot(), f"leaderboard:{limit}", lambda data: {"version": data["version"], "leaderboard": data["leaderboard"][:limit]})
+
+@app.route('/api/user/<int:user_id>')
+def api_user(user_id):
+    snapshot = current_snapshot()
+    if str(user_id) not in snapshot.data["users"]:
+        abort(404)
+    return snapshot_response(snapshot, f"user:{user_id}", lambda data: {"version": data["version"], "user_id": str(user_id), **data["users"][str(user_id)]})
+
+@app.route('/api/history')
+def api_history():
+    snapshot = current_snapshot()
+    coin_name = request.args.get('coin')
+    if coin_name is None:
+        return snapshot_response(snapshot, "history", lambda data: {"version": data["version"], "history": data["history"]})
+    if coin_name not in snapshot.data["history"]:
+        abort(404)
+    return snapshot_response(snapshot, f"history:{coin_name}", lambda data: {"version": data["version"], "history": {coin_name: data["history"][coin_name]}})
+
 # Render expects the web service to listen on the port specified by the PORT environment variable.
 # If not set, it defaults to 8080.
 if __name__ == "__main__":
@@ -0,0 +1,76 @@
+# Low-memory member lookups for bot.py.
+# When LOW_MEMORY_MEMBER_CACHE is enabled the bot no longer chunks the whole guild at startup,
+# so guild.members / guild.get_member only know about a handful of members. This module keeps
+# a small cache of the members the economy actually cares about (account holders and users with
+# open tickets) and fetches everybody else on demand in batches.
+import asyncio
+import time
+
+QUERY_BATCH_SIZE = 100 # Discord's gateway accepts at most 100 user IDs per member request
+
+
+class TrackedMemberCache:
+    def __init__(self, tracked_ids, ttl_seconds=600, batch_size=QUERY_BATCH_SIZE):
+        # tracked_ids is an async callable returning the user IDs that are allowed to stay cached.
+        self._tracked_ids = tracked_ids
+        self._members = {}
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = min(batch_size, QUERY_BATCH_SIZE)
+
+    def __len__(self):
+        return len(self._members)
+
+    def get(self, user_id):
+        entry = self._members.get(user_id)
+        if entry is None:
+            return None
+        member, fetched_at = entry
+        if time.monotonic() - fetched_at > self.ttl_seconds:
+            del self._members[user_id]
+            return None
+        return member
+
+    def remember(self, member):
+        # Callers only remember members they know are tracked; prune() drops anyone who stops being tracked.
+        self._members[member.id] = (member, time.monotonic())
+
+    def forget(self, user_id):
+        self._members.pop(user_id, None)
+
+    async def prune(self):
+        tracked = set(await self._tracked_ids())
+        now = time.monotonic()
+        for user_id, (member, fetched_at) in list(self._members.items()):
+            if user_id not in tracked or now - fetched_at > self.ttl_seconds:
+                del self._members[user_id]
+
+    async def fetch_many(self, guild, user_ids):
+        # Returns {user_id: Member} for the requested IDs that are still in the guild.
+        # Cached members are served directly; the rest are requested from the gateway 100 at a time
+        # with cache=False so discord.py's own member cache stays empty.
+        found = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            member = self.get(user_id)
+            if member is not None:
+                found[user_id] = member
+            else:
+                missing.append(user_id)
+
+        if not missing:
+            return found
+
+        tracked = set(await self._tracked_ids())
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            try:
+                members = await guild.query_members(user_ids=batch, limit=len(batch), cache=False)
+            except asyncio.TimeoutError:
+                print(f"Warning: Timed out fetching a batch of {len(batch)} members from {guild.name}.")
+                continue
+            for member in members:
+                found[member.id] = member
+                if member.id in tracked:
+                    self.remember(member)
+        return found
+
@@ -0,0 +1,88 @@
+# Fixed-point amounts.
+# The economy stores cash as integer cents and coin quantities as integer milli-coins (1/1000 of a coin),
+# and prices as integer cents per coin. All arithmetic and comparisons on those are exact integer operations.
+# Amounts only become floats or strings at the edges: parsing slash command input and rendering messages.
+import math
+
+CENTS_PER_DOLLAR = 100
+MILLI_PER_COIN = 1000
+# The largest amount one input may carry and one account may hold, in cents or milli-coins: 10 billion dollars
+# or 1 billion coins. The economy works on accounts as int64 columns, and this keeps products such as
+# amount * MILLI_PER_COIN or holding * price far from overflowing, so one account can't break them for everyone.
+MAX_AMOUNT = 10 ** 12
+
+
+def _to_fixed(amount, scale):
+    # Returns the integer amount, or None if it isn't a finite number or has more decimal places than the scale allows.
+    if not math.isfinite(amount):
+        return None
+    scaled = amount * scale
+    fixed = round(scaled)
+    if not math.isclose(scaled, fixed, rel_tol=1e-12, abs_tol=1e-6):
+        return None
+    return fixed
+
+
+def to_cents(dollars):
+    return _to_fixed(dollars, CENTS_PER_DOLLAR)
+
+
+def to_milli(coins):
+    return _to_fixed(coins, MILLI_PER_COIN)
+
+
+def valid_amount(fixed):
+    # Whether a converted amount can be used: at least one cent (or milli-coin) and at most MAX_AMOUNT.
+    # Checked after conversion, since a tiny positive input such as 0.000001 rounds to 0.
+    return isinstance(fixed, int) and not isinstance(fixed, bool) and 0 < fixed <= MAX_AMOUNT
+
+
+def check_amount(fixed):
+    if not valid_amount(fixed):
+        raise ValueError(f"Amounts must be whole cents or milli-coins between 1 and {MAX_AMOUNT}, not {fixed!r}.")
+
+
+def cents_from_float(dollars):
+    # For migrating old float balances, where float residue is expected and simply rounded away.
+    return int(round(dollars * CENTS_PER_DOLLAR))
+
+
+def milli_from_float(coins):
+    return int(round(coins * MILLI_PER_COIN))
+
+
+def format_cash(cents):
+    sign = "-" if cents < 0 else ""
+    whole, fraction = divmod(abs(cents), CENTS_PER_DOLLAR)
+    return f"{sign}{whole}.{fraction:02d}"
+
+
+def format_coins(milli):
+    sign = "-" if milli < 0 else ""
+    whole, fraction = divmod(abs(milli), MILLI_PER_COIN)
+    return f"{sign}{whole}.{fraction:03d}"
+
+
+def dollars(cents):
+    # Float dollars for JSON consumers (the web API); never used for bookkeeping.
+    return cents / CENTS_PER_DOLLAR
+
+
+def coins(milli):
+    return milli / MILLI_PER_COIN
+
+
+# Trades round in the market's favour, so a trade can never create money out of rounding:
+# buyers pay the cost rounded up to the cent and sellers receive the proceeds rounded down.
+
+def cost_cents(milli, price_cents):
+    return -(-milli * price_cents // MILLI_PER_COIN)
+
+
+def value_cents(milli, price_cents):
+    return milli * price_cents // MILLI_PER_COIN
+
+
+def milli_for_cents(cents, price_cents):
+    # The most milli-coins the given cash can pay for at this price.
+    return cents * MILLI_PER_COIN // price_cents
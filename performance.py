@@ -0,0 +1,133 @@
+# Per-account net-worth history.
+# At every price tick the economy records one net-worth sample (in cents) and leaderboard rank for every
+# account. Samples are stored column-wise in append-only binary files inside one directory:
+#   accounts.i64    user IDs in the order they were first seen; an account's position is its slot
+#   ticks.bin       one record per tick: timestamp, where the tick's block starts and how many slots it has
+#   net_worth.i64   per tick, a block with one int64 net worth per slot (MISSING for accounts that didn't exist)
+#   rank.i32        per tick, the matching block of int32 ranks (1 = highest net worth, 0 = no sample)
+# A block covers every slot known at that tick, so an account's sample at tick i is simply at
+# block_offset[i] + slot. Reading one account's history gathers exactly those elements through a memory
+# map and never reads any other account's samples.
+# ticks.bin is appended last, so a crash mid-tick leaves a partial block that is truncated on the next open.
+import datetime
+import os
+
+import numpy as np
+
+MISSING = np.iinfo(np.int64).min
+TICK_DTYPE = np.dtype([("at", "<i8"), ("offset", "<i8"), ("count", "<i8")])
+
+
+class PerformanceLog:
+    def __init__(self, directory):
+        self.directory = directory
+        self.accounts_path = os.path.join(directory, 'accounts.i64')
+        self.ticks_path = os.path.join(directory, 'ticks.bin')
+        self.net_worth_path = os.path.join(directory, 'net_worth.i64')
+        self.rank_path = os.path.join(directory, 'rank.i32')
+        self._slots = None # user ID -> slot, loaded lazily
+        self._ticks = None # TICK_DTYPE array, loaded lazily
+
+    def _load(self):
+        if self._slots is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        ticks = np.fromfile(self.ticks_path, dtype=np.uint8) if os.path.exists(self.ticks_path) else np.empty(0, np.uint8)
+        whole = len(ticks) // TICK_DTYPE.itemsize * TICK_DTYPE.itemsize
+        self._ticks = ticks[:whole].view(TICK_DTYPE).copy()
+        accounts = np.fromfile(self.accounts_path, dtype="<i8") if os.path.exists(self.accounts_path) else np.empty(0, "<i8")
+        self._slots = {int(user_id): slot for slot, user_id in enumerate(accounts)}
+        # Drop whatever a crash left behind after the last complete tick.
+        end = int(self._ticks["offset"][-1] + self._ticks["count"][-1]) if len(self._ticks) else 0
+        for path, itemsize, length in ((self.ticks_path, 1, whole), (self.net_worth_path, 8, end), (self.rank_path, 4, end),
+                                       (self.accounts_path, 8, len(accounts))):
+            if os.path.exists(path) and os.path.getsize(path) != length * itemsize:
+                print(f"Warning: Truncating {path} to its last complete tick.")
+                os.truncate(path, length * itemsize)
+
+    def __len__(self):
+        self._load()
+        return len(self._ticks)
+
+    def append(self, at, user_ids, net_worth, ranks):
+        # user_ids, net_worth and ranks are parallel arrays covering every account at this tick.
+        self._load()
+        new_ids = [int(user_id) for user_id in user_ids if int(user_id) not in self._slots]
+        if new_ids:
+            with open(self.accounts_path, 'ab') as f:
+                f.write(np.asarray(new_ids, dtype="<i8").tobytes())
+            for user_id in new_ids:
+                self._slots[user_id] = len(self._slots)
+
+        count = len(self._slots)
+        slots = np.fromiter((self._slots[int(user_id)] for user_id in user_ids), dtype=np.int64, count=len(user_ids))
+        net_worth_block = np.full(count, MISSING, dtype="<i8")
+        net_worth_block[slots] = net_worth
+        rank_block = np.zeros(count, dtype="<i4")
+        rank_block[slots] = ranks
+        offset = int(self._ticks["offset"][-1] + self._ticks["count"][-1]) if len(self._ticks) else 0
+        with open(self.net_worth_path, 'ab') as f:
+            f.write(net_worth_block.tobytes())
+        with open(self.rank_path, 'ab') as f:
+            f.write(rank_block.tobytes())
+        tick = np.array([(int(at.timestamp()), offset, count)], dtype=TICK_DTYPE)
+        with open(self.ticks_path, 'ab') as f:
+            f.write(tick.tobytes())
+        self._ticks = np.concatenate([self._ticks, tick])
+
+    def history(self, user_id):
+        # Returns (timestamps, net_worth, ranks) for the ticks at which the account had a sample.
+        self._load()
+        slot = self._slots.get(int(user_id))
+        if slot is None or not len(self._ticks):
+            return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int32)
+        ticks = self._ticks[self._ticks["count"] > slot]
+        if not len(ticks):
+            return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int32)
+        positions = ticks["offset"] + slot
+        net_worth = np.array(np.memmap(self.net_worth_path, dtype="<i8", mode='r')[positions])
+        ranks = np.array(np.memmap(self.rank_path, dtype="<i4", mode='r')[positions])
+        present = net_worth != MISSING
+        return ticks["at"][present], net_worth[present], ranks[present]
+
+
+def rank_by_net_worth(net_worth):
+    # 1 for the highest net worth; ties keep account order.
+    ranks = np.empty(len(net_worth), dtype=np.int32)
+    ranks[np.argsort(-net_worth, kind="stable")] = np.arange(1, len(net_worth) + 1, dtype=np.int32)
+    return ranks
+
+
+def _iso(timestamp):
+    return datetime.datetime.fromtimestamp(int(timestamp), datetime.timezone.utc).isoformat()
+
+
+def summarize(at, net_worth, ranks, limit=10):
+    # Returns, drawdown and rank history for one account, as plain JSON values. Fractions, not percentages.
+    # Returns are simple changes in net worth, so deposits and withdrawals count as gains and losses.
+    if not len(net_worth):
+        return {"samples": 0}
+    values = net_worth.astype(float)
+    peak = np.maximum.accumulate(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = np.where(peak > 0, (values - peak) / peak, 0.0)
+        period_returns = np.where(values[:-1] > 0, values[1:] / values[:-1] - 1, np.nan)
+    history = []
+    for i in range(max(0, len(values) - limit), len(values)):
+        history.append({
+            "at": _iso(at[i]),
+            "net_worth": int(net_worth[i]),
+            "rank": int(ranks[i]),
+            "return": None if i == 0 or np.isnan(period_returns[i - 1]) else float(period_returns[i - 1])
+        })
+    return {
+        "samples": len(values),
+        "since": _iso(at[0]),
+        "net_worth": int(net_worth[-1]),
+        "total_return": float(values[-1] / values[0] - 1) if values[0] > 0 else None,
+        "max_drawdown": float(drawdown.min()),
+        "current_drawdown": float(drawdown[-1]),
+        "rank": int(ranks[-1]),
+        "best_rank": int(ranks.min()),
+        "history": history
+    }
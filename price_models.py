@@ -0,0 +1,199 @@
+# Stochastic price models for update_prices.
+# Every model works on NumPy arrays, so one call updates every coin that uses it (or simulates a whole
+# horizon for many instruments) without a Python loop per coin. Random draws come from a pre-generated,
+# seedable buffer instead of one random.* call per coin per tick.
+#
+# Models are selected per coin by storing a spec in market_data["coins"][name]["model"], e.g.
+#   {"name": "gbm", "params": {"sigma": 0.3}}
+# Coins without a spec keep the original tiered-volatility behaviour ("legacy").
+# Seeds are for reproducible simulations and tests only. Live price updates always draw from fresh entropy,
+# so a restart never replays an earlier price path.
+import math
+
+import numpy as np
+
+DEFAULT_BUFFER_SIZE = 65536
+
+
+class RandomBuffer:
+    def __init__(self, seed=None, size=DEFAULT_BUFFER_SIZE):
+        self._rng = np.random.default_rng(seed)
+        self.size = size
+        self._normal = np.empty(0)
+        self._normal_pos = 0
+        self._uniform = np.empty(0)
+        self._uniform_pos = 0
+
+    def normal(self, n):
+        if self._normal_pos + n > len(self._normal):
+            self._normal = self._rng.standard_normal(max(self.size, n))
+            self._normal_pos = 0
+        draws = self._normal[self._normal_pos:self._normal_pos + n]
+        self._normal_pos += n
+        return draws
+
+    def uniform(self, n):
+        if self._uniform_pos + n > len(self._uniform):
+            self._uniform = self._rng.random(max(self.size, n))
+            self._uniform_pos = 0
+        draws = self._uniform[self._uniform_pos:self._uniform_pos + n]
+        self._uniform_pos += n
+        return draws
+
+
+class PriceModel:
+    # Subclasses implement step(); prices and states are 1-D arrays with one entry per instrument.
+    # states carries per-instrument model state between ticks (only regime switching uses it).
+    name = None
+    default_params = {}
+
+    def __init__(self, seed=None, buffer_size=DEFAULT_BUFFER_SIZE, **params):
+        unknown = set(params) - set(self.default_params)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name} model: {', '.join(sorted(unknown))}")
+        self.params = {**self.default_params, **params}
+        self.validate()
+        self.random = RandomBuffer(seed, buffer_size)
+
+    def validate(self):
+        # Raises ValueError if the parameters can't drive step(). Specs are persisted, so a bad one must be
+        # rejected when it is set rather than break every later price update.
+        pass
+
+    def step(self, prices, states=None, dt=1.0):
+        raise NotImplementedError
+
+    def simulate(self, prices, steps, states=None, dt=1.0, min_price=None, max_price=None):
+        # Returns a (steps, n) array of price paths. Each step is one vectorized call across all instruments.
+        prices = np.asarray(prices, dtype=float)
+        states = np.zeros(len(prices), dtype=int) if states is None else np.asarray(states, dtype=int)
+        paths = np.empty((steps, len(prices)))
+        for i in range(steps):
+            prices, states = self.step(prices, states, dt)
+            if min_price is not None or max_price is not None:
+                prices = np.clip(prices, min_price, max_price)
+            paths[i] = prices
+        return paths
+
+
+class TieredUniformModel(PriceModel):
+    # The original update_prices behaviour: pick a volatility tier, then move by a uniform percentage within it.
+    name = "legacy"
+    default_params = {"volatility_levels": [0.10, 0.20, 0.30, 0.40, 0.50, 0.60, 0.70, 0.80, 0.90, 1.00, 1.20, 1.50]}
+
+    def validate(self):
+        levels = self.params["volatility_levels"]
+        if not isinstance(levels, list) or not levels:
+            raise ValueError("volatility_levels must be a non-empty list of numbers")
+        for level in levels:
+            _check_number("volatility_levels", level, minimum=0)
+
+    def step(self, prices, states=None, dt=1.0):
+        n = len(prices)
+        levels = np.asarray(self.params["volatility_levels"])
+        tiers = levels[np.minimum((self.random.uniform(n) * len(levels)).astype(int), len(levels) - 1)]
+        change_percent = (2 * self.random.uniform(n) - 1) * tiers
+        return prices * (1 + change_percent), states
+
+
+class GeometricBrownianMotion(PriceModel):
+    name = "gbm"
+    default_params = {"mu": 0.0, "sigma": 0.25}
+
+    def validate(self):
+        _check_number("mu", self.params["mu"])
+        _check_number("sigma", self.params["sigma"], minimum=0)
+
+    def step(self, prices, states=None, dt=1.0):
+        mu, sigma = self.params["mu"], self.params["sigma"]
+        shocks = self.random.normal(len(prices))
+        return prices * np.exp((mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks), states
+
+    def simulate(self, prices, steps, states=None, dt=1.0, min_price=None, max_price=None):
+        if min_price is not None or max_price is not None:
+            return super().simulate(prices, steps, states, dt, min_price, max_price)
+        # Without clamping the whole horizon is a single cumulative sum of log returns.
+        prices = np.asarray(prices, dtype=float)
+        mu, sigma = self.params["mu"], self.params["sigma"]
+        shocks = self.random.normal(steps * len(prices)).reshape(steps, len(prices))
+        log_returns = (mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks
+        return prices * np.exp(np.cumsum(log_returns, axis=0))
+
+
+class OrnsteinUhlenbeck(PriceModel):
+    # Mean-reverting in price space: pulled towards `mean` at rate `theta`, with noise `sigma` (in dollars).
+    name = "ou"
+    default_params = {"theta": 0.3, "mean": 120.0, "sigma": 20.0}
+
+    def validate(self):
+        _check_number("theta", self.params["theta"], minimum=0)
+        _check_number("mean", self.params["mean"])
+        _check_number("sigma", self.params["sigma"], minimum=0)
+
+    def step(self, prices, states=None, dt=1.0):
+        theta, mean, sigma = self.params["theta"], self.params["mean"], self.params["sigma"]
+        shocks = self.random.normal(len(prices))
+        return prices + theta * (mean - prices) * dt + sigma * np.sqrt(dt) * shocks, states
+
+
+class RegimeSwitching(PriceModel):
+    # A Markov chain over regimes, each with its own GBM drift and volatility.
+    # The current regime of each instrument is carried in `states`.
+    name = "regime"
+    default_params = {
+        "regimes": [{"mu": 0.0, "sigma": 0.10}, {"mu": 0.0, "sigma": 0.50}],
+        "transitions": [[0.9, 0.1], [0.3, 0.7]]
+    }
+
+    def validate(self):
+        regimes, transitions = self.params["regimes"], self.params["transitions"]
+        if not isinstance(regimes, list) or not regimes:
+            raise ValueError("regimes must be a non-empty list of {\"mu\": ..., \"sigma\": ...} objects")
+        for regime in regimes:
+            if not isinstance(regime, dict) or set(regime) != {"mu", "sigma"}:
+                raise ValueError("each regime must be an object with exactly \"mu\" and \"sigma\"")
+            _check_number("mu", regime["mu"])
+            _check_number("sigma", regime["sigma"], minimum=0)
+        if (not isinstance(transitions, list) or len(transitions) != len(regimes)
+                or any(not isinstance(row, list) or len(row) != len(regimes) for row in transitions)):
+            raise ValueError(f"transitions must be a {len(regimes)}x{len(regimes)} matrix, one row and column per regime")
+        for row in transitions:
+            for probability in row:
+                _check_number("transitions", probability, minimum=0)
+            if not math.isclose(sum(row), 1.0, abs_tol=1e-9):
+                raise ValueError("each row of transitions must sum to 1")
+
+    def step(self, prices, states=None, dt=1.0):
+        n = len(prices)
+        states = np.zeros(n, dtype=int) if states is None else np.asarray(states, dtype=int)
+        cumulative = np.cumsum(np.asarray(self.params["transitions"], dtype=float), axis=1)
+        draws = self.random.uniform(n)
+        states = np.minimum((draws[:, None] > cumulative[states]).sum(axis=1), cumulative.shape[1] - 1)
+
+        mu = np.array([regime["mu"] for regime in self.params["regimes"]])[states]
+        sigma = np.array([regime["sigma"] for regime in self.params["regimes"]])[states]
+        shocks = self.random.normal(n)
+        return prices * np.exp((mu - 0.5 * sigma ** 2) * dt + sigma * np.sqrt(dt) * shocks), states
+
+
+def _check_number(name, value, minimum=None):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number, not {value!r}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}, not {value!r}")
+
+
+MODELS = {model.name: model for model in (TieredUniformModel, GeometricBrownianMotion, OrnsteinUhlenbeck, RegimeSwitching)}
+
+
+def build_model(spec, seed=None):
+    # seed makes the model's draws reproducible (simulations, tests). A "seed" saved in an older spec is
+    # validated but not applied; pass seed=spec.get("seed") to simulate with it.
+    spec = spec or {"name": "legacy"}
+    if spec.get("name") not in MODELS:
+        raise ValueError(f"Unknown price model '{spec.get('name')}'. Available: {', '.join(MODELS)}")
+    if not isinstance(spec.get("params", {}), dict):
+        raise ValueError("params must be an object")
+    if spec.get("seed") is not None and (isinstance(spec["seed"], bool) or not isinstance(spec["seed"], int) or spec["seed"] < 0):
+        raise ValueError("seed must be a non-negative integer")
+    return MODELS[spec["name"]](seed=seed, **spec.get("params", {}))
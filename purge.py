@@ -0,0 +1,151 @@
+# Bulk channel purge engine used by /clearmessages.
+# Pages through channel history newest-first, groups matching messages younger than 14 days into
+# bulk-delete batches of up to 100, and removes older messages one at a time on a rate-limited
+# slow path (Discord's bulk delete endpoint refuses anything older than 14 days).
+# Each purge runs as a background task that can be cancelled and reports its progress as it goes.
+import asyncio
+import time
+from datetime import timedelta
+
+import discord
+
+HISTORY_PAGE_SIZE = 100
+BULK_DELETE_BATCH_SIZE = 100
+BULK_DELETE_MAX_AGE = timedelta(days=14) - timedelta(minutes=5) # small margin so a batch can't age out mid-request
+SLOW_DELETE_INTERVAL_SECONDS = 1.2
+PROGRESS_REPORT_INTERVAL_SECONDS = 3.0
+
+
+class PurgeJob:
+    def __init__(self, channel, limit, author_id=None, older_than=None, newer_than=None, bots_only=False, requested_by=None):
+        self.channel = channel
+        self.limit = limit
+        self.author_id = author_id
+        self.older_than = older_than # timedelta: only delete messages at least this old
+        self.newer_than = newer_than # timedelta: only delete messages at most this old
+        self.bots_only = bots_only
+        self.requested_by = requested_by
+        self.scanned = 0
+        self.bulk_deleted = 0
+        self.slow_deleted = 0
+        self.failed = 0
+        self.state = "pending"
+        self.error = None
+        self.task = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def deleted(self):
+        return self.bulk_deleted + self.slow_deleted
+
+    def matches(self, message, now):
+        age = now - message.created_at
+        if self.author_id is not None and message.author.id != self.author_id:
+            return False
+        if self.bots_only and not message.author.bot:
+            return False
+        if self.older_than is not None and age < self.older_than:
+            return False
+        if self.newer_than is not None and age > self.newer_than:
+            return False
+        return True
+
+    def describe(self):
+        text = (f"Purge in {self.channel.mention}: **{self.state}** - {self.deleted}/{self.limit} deleted "
+                f"({self.bulk_deleted} in bulk, {self.slow_deleted} individually), {self.scanned} scanned")
+        if self.failed:
+            text += f", {self.failed} failed"
+        if self.error:
+            text += f". Error: {self.error}"
+        return text + "."
+
+    def start(self, on_progress=None):
+        self.task = asyncio.create_task(self.run(on_progress))
+        return self.task
+
+    def cancel(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+            return True
+        return False
+
+    async def _bulk_delete(self, batch):
+        try:
+            await self.channel.delete_messages(batch)
+            self.bulk_deleted += len(batch)
+        except discord.NotFound:
+            # Someone else removed one of the messages; fall back to deleting the rest one by one.
+            for message in batch:
+                await self._slow_delete(message)
+        except discord.HTTPException as e:
+            print(f"Bulk delete of {len(batch)} messages in #{self.channel.name} failed: {e}")
+            self.failed += len(batch)
+
+    async def _slow_delete(self, message):
+        try:
+            await message.delete()
+            self.slow_deleted += 1
+        except discord.NotFound:
+            pass
+        except discord.HTTPException as e:
+            print(f"Could not delete message {message.id} in #{self.channel.name}: {e}")
+            self.failed += 1
+        await asyncio.sleep(SLOW_DELETE_INTERVAL_SECONDS)
+
+    async def run(self, on_progress=None):
+        self.state = "running"
+        self.started_at = discord.utils.utcnow()
+        last_report = time.monotonic()
+        pending = []
+        before = None
+
+        async def report(force=False):
+            nonlocal last_report
+            if on_progress and (force or time.monotonic() - last_report >= PROGRESS_REPORT_INTERVAL_SECONDS):
+                last_report = time.monotonic()
+                try:
+                    await on_progress(self)
+                except Exception as e:
+                    print(f"Error reporting purge progress: {e}")
+
+        try:
+            while self.deleted + len(pending) < self.limit:
+                page = [message async for message in self.channel.history(limit=HISTORY_PAGE_SIZE, before=before)]
+                if not page:
+                    break
+                before = discord.Object(id=page[-1].id)
+                now = discord.utils.utcnow()
+                for message in page:
+                    self.scanned += 1
+                    if self.deleted + len(pending) >= self.limit:
+                        break
+                    if not self.matches(message, now):
+                        continue
+                    if now - message.created_at < BULK_DELETE_MAX_AGE:
+                        pending.append(message)
+                        if len(pending) == BULK_DELETE_BATCH_SIZE:
+                            await self._bulk_delete(pending)
+                            pending = []
+                    else:
+                        if pending:
+                            await self._bulk_delete(pending)
+                            pending = []
+                        await self._slow_delete(message)
+                    await report()
+                await report()
+            if pending:
+                await self._bulk_delete(pending)
+            self.state = "done"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+        except discord.Forbidden:
+            self.state = "failed"
+            self.error = "missing 'Manage Messages' or 'Read Message History' permission"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+        finally:
+            self.finished_at = discord.utils.utcnow()
+            print(f"Purge in #{self.channel.name} finished as {self.state}: {self.deleted} deleted, {self.scanned} scanned.")
+            await report(force=True)
@@ -0,0 +1,150 @@
+# Durable periodic jobs for bot.py.
+# Every job's next due time is persisted (in the economy's schedule section), so a restart picks up the
+# existing schedule instead of restarting each job's clock: a deploy no longer fires an immediate price
+# update and conversion, and frequent restarts can't starve a job whose interval is longer than the uptime.
+#
+# All jobs share one timer: a heap of due times served by a single task that sleeps until the earliest one.
+# Due times advance by whole intervals from the previous due time, so a job keeps its phase however late
+# the bot was to run it. When the scheduler finds runs that were missed (e.g. while the bot was down), the
+# job's catch-up policy decides what happens:
+#   "once"  run it once now for all of them
+#   "all"   run it once for every missed due time, back to back (at most max_catch_up times)
+#   "skip"  don't run it now; just move on to the next due time
+# The next due time is saved before a job runs, so a crash in the middle of a job doesn't run it twice.
+import asyncio
+import datetime
+import heapq
+import itertools
+
+CATCH_UP_POLICIES = ("once", "all", "skip")
+MAX_SLEEP_SECONDS = 60 # re-check the wall clock at least this often, in case it jumped or the host was suspended
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class Job:
+    __slots__ = ("name", "interval", "callback", "catch_up", "first_run", "next_run", "last_run", "runs", "task")
+
+    def __init__(self, name, interval, callback, catch_up, first_run):
+        self.name = name
+        self.interval = interval
+        self.callback = callback
+        self.catch_up = catch_up
+        self.first_run = first_run
+        self.next_run = None
+        self.last_run = None
+        self.runs = 0
+        self.task = None # the task running the job right now, if any
+
+
+class JobScheduler:
+    def __init__(self, load_schedule, save_next_run, max_catch_up=5, clock=utcnow):
+        # load_schedule() -> {job name: ISO timestamp} and save_next_run(name, ISO timestamp) are coroutines.
+        # clock() returns the current aware datetime; tests pass a fake one.
+        self.load_schedule = load_schedule
+        self.save_next_run = save_next_run
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.jobs = {}
+        self._heap = [] # (next_run, sequence, job name); entries whose time no longer matches the job are stale
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._timer = None
+
+    def add_job(self, name, interval, callback, catch_up="once", first_run=None):
+        # first_run is used when the job has no persisted due time yet; it defaults to one interval from now.
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy '{catch_up}'. Use one of: {', '.join(CATCH_UP_POLICIES)}.")
+        self.jobs[name] = Job(name, interval, callback, catch_up, first_run)
+
+    @property
+    def running(self):
+        return self._timer is not None and not self._timer.done()
+
+    async def start(self):
+        if self.running:
+            return
+        persisted = await self.load_schedule()
+        now = self.clock()
+        for job in self.jobs.values():
+            if persisted.get(job.name):
+                job.next_run = datetime.datetime.fromisoformat(persisted[job.name])
+            else:
+                job.next_run = job.first_run or now + job.interval
+                await self.save_next_run(job.name, job.next_run.isoformat())
+            self._push(job)
+            print(f"Job {job.name} next runs at {job.next_run.isoformat()} ({job.catch_up} catch-up).")
+        self._timer = asyncio.create_task(self._run_timer(), name="job-scheduler")
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def reschedule(self, name, when):
+        # Moves a job's next run, e.g. after it was triggered by hand.
+        job = self.jobs[name]
+        job.next_run = when
+        await self.save_next_run(name, when.isoformat())
+        self._push(job)
+        self._wakeup.set()
+
+    def status(self):
+        return [
+            {"name": job.name, "next_run": job.next_run.isoformat() if job.next_run else None,
+             "last_run": job.last_run.isoformat() if job.last_run else None, "runs": job.runs,
+             "running": job.task is not None and not job.task.done(), "catch_up": job.catch_up}
+            for job in sorted(self.jobs.values(), key=lambda job: job.next_run or self.clock())
+        ]
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_run, next(self._sequence), job.name))
+
+    async def _run_timer(self):
+        while True:
+            while self._heap and self._heap[0][0] != self.jobs[self._heap[0][2]].next_run:
+                heapq.heappop(self._heap) # superseded by a reschedule
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            due, _, name = self._heap[0]
+            delay = (due - self.clock()).total_seconds()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            await self._fire(self.jobs[name], due)
+
+    async def _fire(self, job, due):
+        now = self.clock()
+        missed = int((now - due) / job.interval) + 1 # due times at or before now, including this one
+        job.next_run = due + missed * job.interval
+        self._push(job)
+        await self.save_next_run(job.name, job.next_run.isoformat())
+
+        if job.catch_up == "skip" and missed > 1:
+            print(f"Job {job.name} missed {missed} runs; skipping to {job.next_run.isoformat()}.")
+            return
+        runs = min(missed, self.max_catch_up) if job.catch_up == "all" else 1
+        if missed > 1:
+            print(f"Job {job.name} missed {missed} runs; catching up with {runs}.")
+        if job.task is not None and not job.task.done():
+            print(f"Job {job.name} is still running from its last due time; not starting it again.")
+            return
+        job.task = asyncio.create_task(self._run_job(job, runs), name=f"job:{job.name}")
+
+    async def _run_job(self, job, runs):
+        for _ in range(runs):
+            job.last_run = self.clock()
+            job.runs += 1
+            try:
+                await job.callback()
+            except Exception as e:
+                print(f"Job {job.name} failed: {e}")
@@ -0,0 +1,88 @@
+# Read-only market snapshots for the web API.
+# The economy publishes a versioned snapshot of the public market state (prices, price history,
+# leaderboard, per-user holdings) to a single JSON file. Commits that change coins or users only mark it
+# pending; engine_client.SnapshotScheduler publishes it from a timer at most once per SNAPSHOT_INTERVAL
+# (MARKET_SNAPSHOT_INTERVAL, 5 seconds by default) and once more on shutdown, so readers can lag the
+# ledger by up to that interval. The file is never modified in
+# place: each version is written to a temporary file and swapped in with os.replace, so a reader that
+# has the old file mapped keeps a consistent view until it notices the new inode.
+# The Flask app memory-maps the current file, parses it once per version and caches the encoded
+# response bodies, so serving a poll is a stat() plus a dictionary lookup.
+import json
+import mmap
+import os
+import threading
+
+
+def read_version(path):
+    try:
+        with open(path, 'rb') as f:
+            return int(json.loads(f.read()).get("version", 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+class SnapshotPublisher:
+    def __init__(self, path):
+        self.path = path
+        self.version = read_version(path) # keep versions (and therefore ETags) increasing across restarts
+
+    def publish(self, snapshot):
+        self.version += 1
+        snapshot["version"] = self.version
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(snapshot, separators=(',', ':')).encode())
+        os.replace(tmp_path, self.path)
+        return self.version
+
+
+class Snapshot:
+    def __init__(self, data):
+        self.data = data
+        self.version = data["version"]
+        self.etag = str(self.version)
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def body(self, key, build):
+        # Encoded response bodies are cached per snapshot; a new version starts with an empty cache.
+        encoded = self._bodies.get(key)
+        if encoded is None:
+            encoded = json.dumps(build(self.data), separators=(',', ':')).encode()
+            with self._lock:
+                self._bodies[key] = encoded
+        return encoded
+
+
+class SnapshotReader:
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._file_id = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        # Returns the newest Snapshot, or None if the economy hasn't published one yet.
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return self._snapshot
+        file_id = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if file_id == self._file_id:
+            return self._snapshot
+        with self._lock:
+            if file_id != self._file_id:
+                self._load(file_id)
+        return self._snapshot
+
+    def _load(self, file_id):
+        try:
+            with open(self.path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    data = json.loads(mapped[:])
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read market snapshot {self.path}: {e}")
+            return
+        self._snapshot = Snapshot(data)
+        self._file_id = file_id
@@ -0,0 +1,155 @@
+# Section-partitioned persistence for the economy.
+# Market state is split into independent sections (coins, users, tickets, schedule), each stored in
+# its own file next to the configured data file, e.g. stock_market_data.users.json. Every section has
+# its own dirty flag and version counter, so opening a ticket rewrites only the small tickets file
+# instead of every user's balance. Sections are loaded lazily on first access, so a process that only
+# needs tickets never parses the users file.
+#
+# Encodings: "json" (compact, default), "pretty" (indent=4, like the old single file) or "gzip".
+# The file of any encoding is readable whatever the current setting is, so switching is painless.
+# If no section files exist yet, the sections the old single-file layout held (legacy_sections) are imported
+# from it on first load. Sections added since then never read the old file, and the parsed old file is
+# released as soon as its last section has been imported.
+# Each file also records a format number for its data layout (0 if it predates the field), which the
+# on_load hook can use to migrate old data and then bump with set_format().
+import gzip
+import json
+import os
+
+ENCODINGS = ("json", "pretty", "gzip")
+
+
+class SectionStore:
+    def __init__(self, data_file, defaults, encoding="json", on_load=None, split_legacy=None, legacy_sections=None):
+        # defaults: section name -> callable returning the empty value of that section.
+        # on_load(name, data) may normalize a freshly loaded section in place.
+        # split_legacy(data) maps the old single-file dict to {section name: data}.
+        # legacy_sections: the sections split_legacy can produce (default: all of them).
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown storage encoding '{encoding}'. Use one of: {', '.join(ENCODINGS)}.")
+        self.data_file = data_file
+        self.base_path = data_file[:-len(".json")] if data_file.endswith(".json") else data_file
+        self.defaults = defaults
+        self.encoding = encoding
+        self.on_load = on_load
+        self.split_legacy = split_legacy
+        self.legacy_sections = set(defaults if legacy_sections is None else legacy_sections)
+        self._sections = {}
+        self._versions = {}
+        self._formats = {}
+        self._dirty = set()
+        self._legacy = None # sections of the old single file not imported yet; None until it is read
+
+    def __contains__(self, name):
+        return name in self.defaults
+
+    def __getitem__(self, name):
+        if name not in self._sections:
+            self._load(name)
+        return self._sections[name]
+
+    def __setitem__(self, name, value):
+        self._sections[name] = value
+        self.touch(name)
+
+    def get(self, name, default=None):
+        return self[name] if name in self.defaults else default
+
+    def loaded_sections(self):
+        return sorted(self._sections)
+
+    def version(self, name):
+        return self._versions.get(name, 0)
+
+    def format(self, name):
+        return self._formats.get(name, 0)
+
+    def set_format(self, name, data_format):
+        self._formats[name] = data_format
+        self.touch(name)
+
+    def touch(self, *names):
+        self._dirty.update(names)
+
+    @property
+    def dirty(self):
+        return bool(self._dirty)
+
+    def section_path(self, name, encoding=None):
+        encoding = encoding or self.encoding
+        return f"{self.base_path}.{name}.json" + (".gz" if encoding == "gzip" else "")
+
+    def _existing_path(self, name):
+        for path in (self.section_path(name), self.section_path(name, "gzip" if self.encoding != "gzip" else "json")):
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _load(self, name):
+        data = None
+        path = self._existing_path(name)
+        if path is not None:
+            try:
+                opener = gzip.open if path.endswith(".gz") else open
+                with opener(path, 'rt') as f:
+                    stored = json.load(f)
+                data = stored["data"]
+                self._versions[name] = stored.get("version", 0)
+                self._formats[name] = stored.get("format", 0)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Warning: {path} is corrupted or unreadable ({e}). Starting section '{name}' fresh.")
+        elif name in self.legacy_sections:
+            legacy = self._load_legacy()
+            if name in legacy:
+                data = legacy.pop(name) # once every legacy section is imported, nothing of the old file is kept
+                self.touch(name) # write it out in the new layout on the next commit
+        if data is None:
+            data = self.defaults[name]()
+        self._sections[name] = data
+        if self.on_load is not None:
+            self.on_load(name, data)
+
+    def _load_legacy(self):
+        if self._legacy is None:
+            self._legacy = {}
+            if os.path.exists(self.data_file):
+                with open(self.data_file, 'r') as f:
+                    try:
+                        legacy = json.load(f)
+                        legacy = self.split_legacy(legacy) if self.split_legacy else legacy
+                        # Sections already loaded from their own files are newer than the old file.
+                        self._legacy = {name: data for name, data in legacy.items() if name in self.legacy_sections and name not in self._sections}
+                        print(f"Importing {self.data_file} into per-section files.")
+                    except json.JSONDecodeError:
+                        print(f"Warning: {self.data_file} is corrupted or empty. Starting with fresh data.")
+        return self._legacy
+
+    def save(self, names=None):
+        # Writes the given sections (default: every dirty one) and returns the names that were written.
+        names = sorted(self._dirty if names is None else names)
+        for name in names:
+            self._write(name)
+        self._dirty.difference_update(names)
+        return names
+
+    def _write(self, name):
+        version = self._versions.get(name, 0) + 1
+        path = self.section_path(name)
+        tmp_path = path + ".tmp"
+        stored = {"section": name, "version": version, "format": self.format(name), "data": self[name]}
+        # json.dumps, not json.dump: dump streams through the pure-Python encoder, several times slower on a large section.
+        if self.encoding == "gzip":
+            with gzip.open(tmp_path, 'wt', compresslevel=5) as f:
+                f.write(json.dumps(stored, separators=(',', ':')))
+        else:
+            with open(tmp_path, 'w') as f:
+                if self.encoding == "pretty":
+                    f.write(json.dumps(stored, indent=4))
+                else:
+                    f.write(json.dumps(stored, separators=(',', ':')))
+        os.replace(tmp_path, path)
+        self._versions[name] = version
+        # Don't leave a stale copy in the other encoding around to shadow this one after a switch back.
+        other = self.section_path(name, "json" if self.encoding == "gzip" else "gzip")
+        if os.path.exists(other):
+            os.unlink(other)
@@ -0,0 +1,202 @@
+# Regression tests for the economy. Run with: python -m pytest -q
+import datetime
+import json
+
+import pytest
+
+from economy import ACCRUAL_INTERVAL, CAMPTOM_COIN_NAME, Economy
+from money import MAX_AMOUNT
+from price_models import build_model
+
+
+@pytest.fixture
+def market(tmp_path):
+    return Economy(str(tmp_path / "stock_market_data.json"))
+
+
+def accrue_periods(market, periods):
+    # Runs `periods` accrual periods in one go, as if the bot had been down for that long.
+    market.accrue()
+    start = datetime.datetime.fromisoformat(market.accrual_status()["last_accrued_at"])
+    market.accrue(start + periods * ACCRUAL_INTERVAL)
+
+
+def test_deposit_into_account_with_old_checkpoint_earns_nothing_retroactively(market):
+    market.accrue()
+    market.get_user_data(1) # an empty account, checkpointed at the initial indexes
+    accrue_periods(market, 100)
+
+    assert market.add_funds(1, 1_000_000) == 1_000_000
+    assert market.get_account(1)["balance"] == 1_000_000
+    assert market.get_account(1)["accrued"] == 0
+
+
+def test_coin_transfer_into_account_with_old_checkpoint_earns_no_past_dividends(market):
+    market.accrue()
+    market.add_funds(1, 5_000_000)
+    assert market.buy_coin(1, CAMPTOM_COIN_NAME, 100_000).startswith("Successfully bought")
+    market.get_user_data(2)
+    accrue_periods(market, 100)
+
+    result = market.transfer(1, 2, 100_000, 'campton_coin')
+    assert result["ok"]
+    recipient = market.get_account(2)
+    assert recipient["balance"] == 0
+    assert recipient["accrued"] == 0
+    assert market.get_account(1)["accrued"] > 0 # the sender held the coins, so the dividends are theirs
+
+
+def test_interest_under_a_cent_is_carried_until_it_adds_up(market):
+    market.accrue()
+    market.add_funds(1, 100)
+    for _ in range(40):
+        accrue_periods(market, 1)
+        market.get_user_data(1) # settles the account every period
+    # 100 cents at 0.05% per period is worth 102.02 cents after 40 periods.
+    assert market.get_account(1)["balance"] == 102
+
+
+def test_settling_after_accrual_matches_the_read_view(market):
+    market.accrue()
+    market.add_funds(1, 1_234_567)
+    accrue_periods(market, 7)
+    expected = market.get_account(1)["balance"]
+    assert market.get_user_data(1)["balance"] == expected
+
+
+def test_reads_do_not_change_accounts(market):
+    market.accrue()
+    market.add_funds(1, 1_000_000)
+    market.commit()
+    accrue_periods(market, 10)
+    market.commit()
+
+    assert market.get_account(1)["balance"] > 1_000_000
+    assert market.get_account(2)["balance"] == 0
+    assert not market.dirty
+    assert market.account_ids() == [1]
+
+
+def test_plans_settle_in_one_batch_and_conserve_cash_and_coins(market):
+    market.accrue()
+    for user_id in range(1, 7):
+        market.add_funds(user_id, 200_000 * user_id)
+        market.buy_coin(user_id, CAMPTOM_COIN_NAME, 1_000 * user_id)
+        market.set_plan(user_id, CAMPTOM_COIN_NAME, "buy" if user_id % 2 else "sell", 5_000 if user_id % 2 else 2_500)
+    market.set_plan(7, CAMPTOM_COIN_NAME, "buy", 5_000) # no account, so nothing to buy with
+    accrue_periods(market, 5)
+    before = market.audit()
+
+    market.update_prices() # plans run right after the new prices
+    after = market.audit()
+    assert after["total_cash"] + sum(after["reserve"].values()) == before["total_cash"] + sum(before["reserve"].values())
+    assert after["total_coins"] == after["supply"]
+    assert market.plans_for(2)["last_run"]["sold"] == 500
+    assert market.plans_for(1)["last_run"]["spent"] > 0
+    assert market.plans_for(7)["last_run"]["skipped"] == [f"buy {CAMPTOM_COIN_NAME}: insufficient funds"]
+
+
+def test_oversized_plans_are_refused_and_never_break_the_price_tick(tmp_path):
+    data_file = tmp_path / "stock_market_data.json"
+    market = Economy(str(data_file))
+    market.add_funds(1, 100_000)
+    assert market.set_plan(2, CAMPTOM_COIN_NAME, "buy", 10**19) == {"ok": False, "reason": "invalid_amount"}
+    assert market.set_plan(2, CAMPTOM_COIN_NAME, "buy", MAX_AMOUNT + 1) == {"ok": False, "reason": "invalid_amount"}
+    assert market.set_plan(1, CAMPTOM_COIN_NAME, "buy", 5_000) == {"ok": True}
+    market.commit()
+    # A plan saved before amounts were bounded.
+    plans_file = tmp_path / "stock_market_data.plans.json"
+    stored = json.loads(plans_file.read_text())
+    stored["data"]["2"] = {CAMPTOM_COIN_NAME: {"buy": 10**19}}
+    plans_file.write_text(json.dumps(stored))
+    market = Economy(str(data_file))
+
+    market.update_prices()
+
+    assert market.plans_for(2)["last_run"]["skipped"] == [f"buy {CAMPTOM_COIN_NAME}: invalid amount"]
+    assert market.plans_for(1)["last_run"]["spent"] > 0
+
+
+@pytest.mark.parametrize("spec", [
+    {"name": "gbm", "params": {"sigma": "0.3"}},
+    {"name": "gbm", "params": {"sigma": -1}},
+    {"name": "legacy", "params": {"volatility_levels": []}},
+    {"name": "ou", "params": {"theta": None}},
+    {"name": "regime", "params": {"regimes": [{"mu": 0.0, "sigma": 0.1}], "transitions": [[0.9, 0.1], [0.3, 0.7]]}},
+    {"name": "regime", "params": {"transitions": [[0.9, 0.2], [0.3, 0.7]]}},
+    {"name": "nope"},
+])
+def test_invalid_price_models_are_rejected_before_they_are_saved(market, spec):
+    with pytest.raises(ValueError):
+        market.set_price_model(CAMPTOM_COIN_NAME, spec)
+    assert "model" not in market.market_data["coins"][CAMPTOM_COIN_NAME]
+    market.update_prices()
+
+
+def test_valid_price_models_are_saved(market):
+    market.set_price_model(CAMPTOM_COIN_NAME, {"name": "regime", "params": {"regimes": [{"mu": 0.0, "sigma": 0.1}], "transitions": [[1.0]]}, "seed": 7})
+    market.update_prices()
+    assert market.market_data["coins"][CAMPTOM_COIN_NAME]["model"]["name"] == "regime"
+    assert "seed" not in market.market_data["coins"][CAMPTOM_COIN_NAME]["model"]
+
+
+def test_restarts_do_not_replay_the_same_price_path(tmp_path):
+    data_file = str(tmp_path / "stock_market_data.json")
+    market = Economy(data_file)
+    market.set_price_model(CAMPTOM_COIN_NAME, {"name": "gbm", "params": {"sigma": 0.3}, "seed": 7})
+    market.commit()
+
+    paths = []
+    for _ in range(3):
+        restarted = Economy(data_file) # nothing is committed, so every load starts from the same prices
+        paths.append(tuple(tuple(restarted.update_prices().values()) for _ in range(3)))
+    assert len(set(paths)) == 3
+
+
+def test_seeded_simulations_are_reproducible():
+    spec = {"name": "gbm", "params": {"sigma": 0.3}, "seed": 7}
+    first = build_model(spec, seed=spec["seed"]).simulate([120.0], 5)
+    assert (build_model(spec, seed=spec["seed"]).simulate([120.0], 5) == first).all()
+
+
+def test_triggered_alerts_stay_queued_until_acknowledged(market):
+    price = market.get_price(CAMPTOM_COIN_NAME)
+    for user_id in (1, 2, 3):
+        assert market.add_alert(user_id, CAMPTOM_COIN_NAME, "above", price + user_id)["ok"]
+    market.set_price_model(CAMPTOM_COIN_NAME, {"name": "gbm", "params": {"mu": 1.0, "sigma": 0.0}}) # the price can only rise
+    market.update_prices()
+
+    first = market.pending_alerts(10)
+    assert [alert["user_id"] for alert in first] == [1, 2, 3]
+    assert market.pending_alerts(10) == first # reading doesn't dequeue
+
+    assert market.acknowledge_alerts([first[0]["id"]], failed=[first[1]["id"]]) == {"removed": 1, "retrying": 1, "dropped": 0}
+    assert [alert["user_id"] for alert in market.pending_alerts(10)] == [3, 2]
+
+    for _ in range(4):
+        market.acknowledge_alerts([], failed=[first[1]["id"]])
+    assert [alert["user_id"] for alert in market.pending_alerts(10)] == [3]
+
+
+def test_accounts_reaching_returns_only_accounts_over_a_threshold(market):
+    market.add_funds(1, 2_000_000)
+    market.add_funds(2, 1_999_999)
+    market.add_funds(3, 5_000_000)
+    assert market.buy_coin(3, CAMPTOM_COIN_NAME, 70_000).startswith("Successfully bought")
+    market.withdraw_funds(3, market.get_account(3)["balance"])
+
+    assert market.accounts_reaching(2_000_000, CAMPTOM_COIN_NAME, 70_000) == [1, 3]
+
+
+def test_ledger_refuses_zero_and_oversized_amounts(market):
+    with pytest.raises(ValueError):
+        market.add_funds(1, MAX_AMOUNT + 1)
+    market.add_funds(1, 1000)
+    with pytest.raises(ValueError):
+        market.transfer(1, 2, 0, 'cash')
+    assert 2 not in market.account_ids() # the failed transfer didn't create the recipient's account
+
+    market.add_funds(2, MAX_AMOUNT)
+    with pytest.raises(ValueError):
+        market.transfer(1, 2, 1, 'cash')
+    assert market.get_account(1)["balance"] == 1000
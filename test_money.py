@@ -0,0 +1,43 @@
+# Tests for the fixed-point amount helpers. Run with: python -m pytest -q
+import math
+
+import pytest
+
+from money import MAX_AMOUNT, check_amount, cost_cents, to_cents, to_milli, valid_amount, value_cents
+
+
+@pytest.mark.parametrize("dollars, cents", [(50, 5000), (0.1 + 0.2, 30), (19.99, 1999), (-5, -500), (1e-9, 0)])
+def test_to_cents_rounds_float_residue_away(dollars, cents):
+    assert to_cents(dollars) == cents
+
+
+@pytest.mark.parametrize("dollars", [0.001, 1.005, math.inf, -math.inf, math.nan])
+def test_to_cents_rejects_extra_decimals_and_non_finite_numbers(dollars):
+    assert to_cents(dollars) is None
+
+
+def test_to_milli_allows_three_decimal_places():
+    assert to_milli(0.123) == 123
+    assert to_milli(0.0001) is None
+
+
+@pytest.mark.parametrize("fixed", [0, -1, MAX_AMOUNT + 1, True, 1.0, None])
+def test_amounts_outside_the_bounds_are_invalid(fixed):
+    assert not valid_amount(fixed)
+    with pytest.raises(ValueError):
+        check_amount(fixed)
+
+
+def test_amounts_within_the_bounds_are_valid():
+    assert valid_amount(1) and valid_amount(MAX_AMOUNT)
+    check_amount(MAX_AMOUNT)
+
+
+def test_tiny_positive_input_is_invalid_after_conversion():
+    # The bug the post-conversion check exists for: 1e-9 passes "> 0" but is 0 cents.
+    assert 1e-9 > 0 and not valid_amount(to_cents(1e-9))
+
+
+def test_trades_round_in_the_markets_favour():
+    assert cost_cents(1, 12345) == 13 # 0.001 coins at 123.45 cost 12.345 cents
+    assert value_cents(1, 12345) == 12
@@ -0,0 +1,100 @@
+# Tests for the columnar performance log, checked against a plain per-row reference. Run with: python -m pytest -q
+import datetime
+import random
+
+import numpy as np
+import pytest
+
+from performance import PerformanceLog, rank_by_net_worth, summarize
+
+START = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def reference_summary(rows, limit):
+    # The per-row computation: rows is one account's [(timestamp, net_worth, rank), ...] in tick order.
+    if not rows:
+        return {"samples": 0}
+    iso = lambda timestamp: datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).isoformat()
+    peak, drawdowns, history = 0.0, [], []
+    for i, (at, net_worth, rank) in enumerate(rows):
+        peak = max(peak, net_worth) if i else net_worth
+        drawdowns.append((net_worth - peak) / peak if peak > 0 else 0.0)
+        previous = rows[i - 1][1] if i else None
+        history.append({"at": iso(at), "net_worth": net_worth, "rank": rank,
+                        "return": net_worth / previous - 1 if previous else None})
+    return {
+        "samples": len(rows),
+        "since": iso(rows[0][0]),
+        "net_worth": rows[-1][1],
+        "total_return": rows[-1][1] / rows[0][1] - 1 if rows[0][1] > 0 else None,
+        "max_drawdown": min(drawdowns),
+        "current_drawdown": drawdowns[-1],
+        "rank": rows[-1][2],
+        "best_rank": min(rank for _, _, rank in rows),
+        "history": history[-limit:]
+    }
+
+
+def record_ticks(log, ticks=30, seed=3):
+    # Accounts join and leave between ticks; returns the per-row reference for every account ever seen.
+    rng = random.Random(seed)
+    rows = {}
+    active = [1, 2, 3]
+    for tick in range(ticks):
+        if rng.random() < 0.3:
+            active.append(max(rows, default=3) + 1)
+        if len(active) > 2 and rng.random() < 0.2:
+            active.remove(rng.choice(active))
+        user_ids = np.array(active, dtype=np.int64)
+        net_worth = np.array([rng.randrange(0, 1_000_000) for _ in active], dtype=np.int64)
+        ranks = rank_by_net_worth(net_worth)
+        at = START + datetime.timedelta(hours=tick)
+        log.append(at, user_ids, net_worth, ranks)
+        for user_id, value, rank in zip(active, net_worth.tolist(), ranks.tolist()):
+            rows.setdefault(user_id, []).append((int(at.timestamp()), value, rank))
+    return rows
+
+
+@pytest.mark.parametrize("limit", [1, 5, 100])
+def test_summaries_match_the_per_row_computation(tmp_path, limit):
+    log = PerformanceLog(str(tmp_path / "performance"))
+    rows = record_ticks(log)
+    for user_id, account_rows in rows.items():
+        assert summarize(*log.history(user_id), limit=limit) == pytest.approx(reference_summary(account_rows, limit), nan_ok=True)
+    assert summarize(*log.history(999_999)) == {"samples": 0}
+
+
+def test_history_has_one_sample_per_tick_the_account_existed(tmp_path):
+    log = PerformanceLog(str(tmp_path / "performance"))
+    log.append(START, np.array([1, 2]), np.array([100, 200]), np.array([2, 1]))
+    log.append(START + datetime.timedelta(hours=1), np.array([2, 3]), np.array([300, 50]), np.array([1, 2]))
+    log.append(START + datetime.timedelta(hours=2), np.array([3, 1, 2]), np.array([60, 110, 310]), np.array([3, 2, 1]))
+
+    assert len(log) == 3
+    at, net_worth, ranks = log.history(1)
+    assert net_worth.tolist() == [100, 110] and ranks.tolist() == [2, 2]
+    assert at.tolist() == [int(START.timestamp()), int((START + datetime.timedelta(hours=2)).timestamp())]
+    assert log.history(3)[1].tolist() == [50, 60]
+
+
+def test_reopened_log_reads_the_same_columns(tmp_path):
+    directory = str(tmp_path / "performance")
+    rows = record_ticks(PerformanceLog(directory), ticks=10)
+    reopened = PerformanceLog(directory)
+    assert len(reopened) == 10
+    for user_id, account_rows in rows.items():
+        assert reopened.history(user_id)[1].tolist() == [value for _, value, _ in account_rows]
+
+
+def test_a_partly_written_tick_is_truncated_on_open(tmp_path):
+    directory = str(tmp_path / "performance")
+    log = PerformanceLog(directory)
+    log.append(START, np.array([1, 2]), np.array([100, 200]), np.array([2, 1]))
+    # A crash after the net-worth block of the next tick was written, but before its tick record.
+    with open(log.net_worth_path, 'ab') as f:
+        f.write(np.array([1, 2], dtype="<i8").tobytes())
+
+    reopened = PerformanceLog(directory)
+    assert len(reopened) == 1
+    reopened.append(START + datetime.timedelta(hours=1), np.array([1, 2]), np.array([150, 250]), np.array([2, 1]))
+    assert reopened.history(2)[1].tolist() == [200, 250]
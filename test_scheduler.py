@@ -0,0 +1,121 @@
+# Tests for the durable job scheduler, driven by a fake clock. Run with: python -m pytest -q
+import asyncio
+import datetime
+
+import pytest
+
+from scheduler import JobScheduler
+
+NOW = datetime.datetime(2026, 1, 1, 12, 0, tzinfo=datetime.timezone.utc)
+HOUR = datetime.timedelta(hours=1)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+async def settle():
+    # Lets the timer fire everything that is due and the job tasks it started run to completion.
+    for _ in range(50):
+        await asyncio.sleep(0)
+
+
+def make_scheduler(clock, persisted, saved, max_catch_up=5):
+    async def load_schedule():
+        return {name: when.isoformat() for name, when in persisted.items()}
+
+    async def save_next_run(name, when):
+        saved[name] = datetime.datetime.fromisoformat(when)
+    return JobScheduler(load_schedule, save_next_run, max_catch_up=max_catch_up, clock=clock)
+
+
+def add_recording_job(scheduler, clock, ran, name, interval, catch_up):
+    async def callback():
+        ran.append((name, clock()))
+    scheduler.add_job(name, interval, callback, catch_up=catch_up)
+
+
+def run_after_stall(catch_up, due):
+    # A job whose persisted due time is in the past, as after the bot was down; returns (runs, saved next run).
+    clock, ran, saved = FakeClock(NOW), [], {}
+
+    async def main():
+        scheduler = make_scheduler(clock, {"job": due}, saved)
+        add_recording_job(scheduler, clock, ran, "job", HOUR, catch_up)
+        await scheduler.start()
+        await settle()
+        scheduler.stop()
+    asyncio.run(main())
+    return len(ran), saved["job"]
+
+
+@pytest.mark.parametrize("catch_up, runs", [("skip", 0), ("once", 1), ("all", 5)])
+def test_catch_up_policy_after_a_long_stall(catch_up, runs):
+    # Due 9.5 hours ago: 10 due times were missed, and "all" is capped at max_catch_up.
+    assert run_after_stall(catch_up, NOW - 9.5 * HOUR) == (runs, NOW + 0.5 * HOUR)
+
+
+@pytest.mark.parametrize("catch_up", ["skip", "once", "all"])
+def test_a_job_that_is_merely_late_runs_once_whatever_its_policy(catch_up):
+    assert run_after_stall(catch_up, NOW - 0.5 * HOUR) == (1, NOW + 0.5 * HOUR)
+
+
+def test_due_times_keep_their_phase():
+    # Due at 06:25 every hour; at 12:00 the next due time is 12:25, not one hour from now.
+    assert run_after_stall("once", NOW - 5 * HOUR - 35 * datetime.timedelta(minutes=1))[1] == NOW + 25 * datetime.timedelta(minutes=1)
+
+
+def test_due_jobs_run_in_due_time_order():
+    clock, ran, saved = FakeClock(NOW), [], {}
+    persisted = {"c": NOW - 1 * HOUR, "a": NOW - 3 * HOUR, "b": NOW - 2 * HOUR, "later": NOW + HOUR}
+
+    async def main():
+        scheduler = make_scheduler(clock, persisted, saved)
+        for name in persisted:
+            add_recording_job(scheduler, clock, ran, name, datetime.timedelta(days=1), "once")
+        await scheduler.start()
+        await settle()
+        scheduler.stop()
+    asyncio.run(main())
+    assert [name for name, _ in ran] == ["a", "b", "c"]
+
+
+def test_new_jobs_start_one_interval_from_now_and_are_persisted():
+    clock, ran, saved = FakeClock(NOW), [], {}
+
+    async def main():
+        scheduler = make_scheduler(clock, {}, saved)
+        add_recording_job(scheduler, clock, ran, "job", HOUR, "once")
+        await scheduler.start()
+        await settle()
+        scheduler.stop()
+    asyncio.run(main())
+    assert ran == [] and saved == {"job": NOW + HOUR}
+
+
+def test_rescheduling_supersedes_the_old_due_time():
+    clock, ran, saved = FakeClock(NOW), [], {}
+
+    async def main():
+        scheduler = make_scheduler(clock, {"job": NOW + HOUR, "other": NOW + 5 * HOUR}, saved)
+        add_recording_job(scheduler, clock, ran, "job", datetime.timedelta(days=1), "once")
+        add_recording_job(scheduler, clock, ran, "other", datetime.timedelta(days=1), "once")
+        await scheduler.start()
+        await scheduler.reschedule("job", NOW + 2 * HOUR)
+
+        clock.now = NOW + 1.5 * HOUR # past the old due time only
+        await scheduler.reschedule("other", NOW + 5 * HOUR) # wakes the timer
+        await settle()
+        assert ran == []
+
+        clock.now = NOW + 2 * HOUR
+        await scheduler.reschedule("other", NOW + 5 * HOUR)
+        await settle()
+        scheduler.stop()
+    asyncio.run(main())
+    assert ran == [("job", NOW + 2 * HOUR)]
+    assert saved["job"] == NOW + 2 * HOUR + datetime.timedelta(days=1)
@@ -0,0 +1,42 @@
+# Tests for the section store. Run with: python -m pytest -q
+import json
+
+from storage import SectionStore
+
+DEFAULTS = {"users": dict, "tickets": dict, "alerts": dict}
+
+
+def open_store(data_file, splits):
+    def split_legacy(data):
+        splits.append(data)
+        return {"users": data["users"], "tickets": data["tickets"]}
+    return SectionStore(str(data_file), DEFAULTS, split_legacy=split_legacy, legacy_sections=("users", "tickets"))
+
+
+def test_old_single_file_is_read_only_for_the_sections_it_held(tmp_path):
+    data_file = tmp_path / "stock_market_data.json"
+    data_file.write_text(json.dumps({"users": {"1": {"balance": 5}}, "tickets": {}}))
+    splits = []
+    store = open_store(data_file, splits)
+
+    assert store["alerts"] == {}
+    assert splits == [] # a section the old file never had doesn't parse it
+
+    assert store["users"] == {"1": {"balance": 5}}
+    assert store["tickets"] == {}
+    assert len(splits) == 1 # parsed once for every section it held
+    assert store.save() == ["tickets", "users"] # imported sections are written out in the new layout
+
+
+def test_imported_sections_are_read_from_their_own_files_afterwards(tmp_path):
+    data_file = tmp_path / "stock_market_data.json"
+    data_file.write_text(json.dumps({"users": {"1": {"balance": 5}}, "tickets": {}}))
+    store = open_store(data_file, [])
+    store["users"]["1"]["balance"] = 7
+    store.touch("users")
+    store.save()
+
+    splits = []
+    reopened = open_store(data_file, splits)
+    assert reopened["users"] == {"1": {"balance": 7}}
+    assert splits == []
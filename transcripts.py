@@ -0,0 +1,144 @@
+# Ticket transcript archive.
+# When a ticket is closed its channel history is paged through in batches and streamed into a
+# gzip-compressed JSON-lines file (one file per ticket). A small append-only index records who the
+# ticket belonged to and when it was opened/closed, so a transcript can be found by user or date
+# and streamed back out without opening any other archive.
+import asyncio
+import datetime
+import gzip
+import json
+import os
+
+HISTORY_BATCH_SIZE = 100
+INDEX_FILE_NAME = 'index.jsonl'
+
+
+def _message_record(message):
+    return {
+        "id": message.id,
+        "author_id": message.author.id,
+        "author": str(message.author),
+        "created_at": message.created_at.isoformat(),
+        "content": message.content,
+        "attachments": [attachment.url for attachment in message.attachments],
+        "embeds": [
+            {"title": embed.title, "description": embed.description}
+            for embed in message.embeds
+        ]
+    }
+
+
+def _write_lines(fp, records):
+    fp.write("".join(json.dumps(record) + "\n" for record in records))
+
+
+class TranscriptArchive:
+    def __init__(self, archive_dir):
+        self.archive_dir = archive_dir
+        self.index_path = os.path.join(archive_dir, INDEX_FILE_NAME)
+        self._index = None # ticket_id -> entry, loaded lazily from the index file
+        self._by_user = {}
+        self._by_date = {}
+
+    def _ensure_index(self):
+        if self._index is not None:
+            return
+        self._index = {}
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self._add_to_index(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping corrupted line in {self.index_path}.")
+
+    def _add_to_index(self, entry):
+        self._index[entry["ticket_id"]] = entry
+        self._by_user.setdefault(entry["user_id"], []).append(entry["ticket_id"])
+        self._by_date.setdefault(entry["closed_at"][:10], []).append(entry["ticket_id"])
+
+    def transcript_path(self, ticket_id):
+        return os.path.join(self.archive_dir, f"{ticket_id}.jsonl.gz")
+
+    async def archive(self, channel, ticket_id, ticket_info, closed_by=None):
+        # Streams the channel history (oldest first) into <archive_dir>/<ticket_id>.jsonl.gz.
+        # Only one batch of messages is held in memory at a time.
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self._ensure_index()
+        path = self.transcript_path(ticket_id)
+        tmp_path = path + ".tmp"
+
+        header = {
+            "ticket_id": ticket_id,
+            "user_id": ticket_info["user_id"],
+            "issue": ticket_info.get("issue"),
+            "channel_name": channel.name,
+            "created_at": ticket_info.get("created_at"),
+            "closed_at": ticket_info.get("closed_at")
+        }
+        message_count = 0
+        after = None
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as gz:
+            await asyncio.to_thread(_write_lines, gz, [header])
+            while True:
+                batch = [message async for message in channel.history(limit=HISTORY_BATCH_SIZE, after=after, oldest_first=True)]
+                if not batch:
+                    break
+                await asyncio.to_thread(_write_lines, gz, [_message_record(message) for message in batch])
+                message_count += len(batch)
+                after = batch[-1]
+                if len(batch) < HISTORY_BATCH_SIZE:
+                    break
+        os.replace(tmp_path, path)
+
+        entry = {
+            "ticket_id": ticket_id,
+            "user_id": ticket_info["user_id"],
+            "created_at": ticket_info.get("created_at"),
+            "closed_at": ticket_info.get("closed_at") or datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "closed_by": closed_by,
+            "message_count": message_count,
+            "file": os.path.basename(path)
+        }
+        with open(self.index_path, 'a') as f:
+            f.write(json.dumps(entry) + "\n")
+        self._add_to_index(entry)
+        return entry
+
+    def get(self, ticket_id):
+        self._ensure_index()
+        return self._index.get(str(ticket_id))
+
+    def find(self, user_id=None, date=None):
+        # date is a YYYY-MM-DD string matched against the close date.
+        self._ensure_index()
+        if user_id is not None:
+            ticket_ids = self._by_user.get(user_id, [])
+            if date is not None:
+                ticket_ids = [t for t in ticket_ids if self._index[t]["closed_at"].startswith(date)]
+        elif date is not None:
+            ticket_ids = self._by_date.get(date, [])
+        else:
+            ticket_ids = list(self._index)
+        return [self._index[t] for t in ticket_ids]
+
+    def iter_text(self, ticket_id):
+        # Yields a human-readable transcript line by line straight from the compressed archive.
+        with gzip.open(self.transcript_path(ticket_id), 'rt', encoding='utf-8') as gz:
+            header = json.loads(gz.readline())
+            yield (f"Transcript for ticket {header['ticket_id']} (#{header.get('channel_name')})\n"
+                   f"User ID: {header['user_id']}\n"
+                   f"Issue: {header.get('issue')}\n"
+                   f"Opened: {header.get('created_at')}  Closed: {header.get('closed_at')}\n\n")
+            for line in gz:
+                record = json.loads(line)
+                text = record["content"]
+                for embed in record["embeds"]:
+                    text += f"\n    [embed] {embed.get('title') or ''} {embed.get('description') or ''}".rstrip()
+                for url in record["attachments"]:
+                    text += f"\n    [attachment] {url}"
+                yield f"[{record['created_at'][:19].replace('T', ' ')}] {record['author']}: {text}\n"
@@ -0,0 +1,122 @@
+# Verification registry.
+# Keeps every verified member's Roblox username and Project New Campton name with case-normalized
+# indexes in both directions, so "who owns this Roblox name?" and "is this name already claimed?"
+# are dictionary lookups instead of a scan over every user.
+# Records are persisted to an append-only JSON-lines log, so a verification writes one line instead
+# of rewriting the whole user data file. The log is compacted when it accumulates stale lines.
+import json
+import os
+
+COMPACT_MIN_STALE_LINES = 100
+
+
+def normalize_name(name):
+    return " ".join(str(name).split()).casefold()
+
+
+class VerificationRegistry:
+    def __init__(self, path):
+        self.path = path
+        self._records = {} # user_id -> record
+        self._by_roblox = {} # normalized roblox username -> user_id
+        self._by_pnc = {} # normalized PNC full name -> set of user_ids (real names can legitimately repeat)
+        self._log_lines = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping corrupted line in {self.path}.")
+                    continue
+                self._log_lines += 1
+                if record.get("removed"):
+                    self._unindex(record["user_id"])
+                    self._records.pop(record["user_id"], None)
+                else:
+                    self._index(record)
+
+    def migrate_from_users(self, verifications):
+        # One-off import of the verification details stored inside user records before the registry existed.
+        # verifications maps user ID strings to their nested "verification" dicts.
+        migrated = 0
+        for user_id_str, verification in verifications.items():
+            if int(user_id_str) in self._records or not verification.get("roblox_username"):
+                continue
+            self.register(int(user_id_str), verification["roblox_username"], verification.get("pnc_full_name", ""), verification.get("verified_at"))
+            migrated += 1
+        if migrated:
+            print(f"Migrated {migrated} existing verifications into {self.path}.")
+
+    def _index(self, record):
+        user_id = record["user_id"]
+        self._unindex(user_id)
+        self._records[user_id] = record
+        self._by_roblox[normalize_name(record["roblox_username"])] = user_id
+        self._by_pnc.setdefault(normalize_name(record["pnc_full_name"]), set()).add(user_id)
+
+    def _unindex(self, user_id):
+        old = self._records.get(user_id)
+        if old is None:
+            return
+        roblox_key = normalize_name(old["roblox_username"])
+        if self._by_roblox.get(roblox_key) == user_id:
+            del self._by_roblox[roblox_key]
+        pnc_key = normalize_name(old["pnc_full_name"])
+        owners = self._by_pnc.get(pnc_key)
+        if owners:
+            owners.discard(user_id)
+            if not owners:
+                del self._by_pnc[pnc_key]
+
+    def get(self, user_id):
+        return self._records.get(user_id)
+
+    def roblox_owner(self, roblox_username):
+        return self._by_roblox.get(normalize_name(roblox_username))
+
+    def pnc_owners(self, pnc_full_name):
+        return set(self._by_pnc.get(normalize_name(pnc_full_name), ()))
+
+    def register(self, user_id, roblox_username, pnc_full_name, verified_at):
+        record = {
+            "user_id": user_id,
+            "roblox_username": roblox_username,
+            "pnc_full_name": pnc_full_name,
+            "verified_at": verified_at
+        }
+        self._index(record)
+        self._append(record)
+        return record
+
+    def remove(self, user_id):
+        if user_id not in self._records:
+            return False
+        self._unindex(user_id)
+        del self._records[user_id]
+        self._append({"user_id": user_id, "removed": True})
+        return True
+
+    def _append(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
+        self._log_lines += 1
+        if self._log_lines - len(self._records) > max(COMPACT_MIN_STALE_LINES, len(self._records)):
+            self._compact()
+
+    def _compact(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            for record in self._records.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.path)
+        self._log_lines = len(self._records)